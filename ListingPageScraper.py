@@ -1,22 +1,24 @@
-import time
 import json
-import random
-import undetected_chromedriver as uc
+import argparse
 from bs4 import BeautifulSoup
 
-# --- Selenium Imports for Waiting and Interaction ---
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-
-# --- Import Selenium-Stealth ---
-from selenium_stealth import stealth
+# --- Pluggable page fetchers (Selenium or pooled HTTP) ---
+from fetchers import create_fetcher
+from throttle import PolitenessScheduler
+from pipeline import run_pipeline, FETCH_WORKERS
+from page_cache import PageCache
+from block_jsonl import open_writer, block_path
+from history import HistoryStore
+from extraction import extract_cards, CLUTCH_BASE_URL
+from browser_extraction import fetch_cards
+from metrics import METRICS
+from retry import RetryScheduler, DEAD_LETTER_FILE
 
 # --- Configuration ---
-BASE_URL = "https://clutch.co/it-services/india"
+BASE_URL = f"{CLUTCH_BASE_URL}/it-services/india"
 OUTPUT_FILE = 'clutch_listings_data_raw.jsonl' # Saving to a new file for raw data
 PAGES_TO_SCRAPE = 115 # Set how many pages you want to scrape
+FETCH_ENGINE = 'selenium' # 'selenium', 'http' (HTTP with browser fallback) or 'http-only'
 
 def parse_company_card(card_soup):
     """
@@ -31,7 +33,7 @@ def parse_company_card(card_soup):
         href = name_tag['href']
         # Construct the full URL correctly
         if href.startswith('/'):
-            profile_url = "https://clutch.co" + href
+            profile_url = CLUTCH_BASE_URL + href
         else:
             # Handle cases where the link might already be absolute (less common but safe to check)
             profile_url = href
@@ -58,69 +60,97 @@ def parse_company_card(card_soup):
     }
     return company_data
 
+def parse_listing_page(html, page_url=None, fields=None):
+    """Parses every provider card (featured and regular) on a listing page, via CARD_SCHEMA."""
+    return extract_cards(html, fields)
+
+def parse_listing_page_soup(html, page_url=None, features='lxml'):
+    """BeautifulSoup reference for parse_listing_page; both must return the same records."""
+    soup = BeautifulSoup(html, features)
+    return [parse_company_card(card) for card in soup.select('li.provider-list-item')]
+
+def record_history(path, complete):
+    store = HistoryStore()
+    try:
+        store.ingest(path, 'listing', complete=complete)
+    finally:
+        store.close()
+
 def main():
     """Main function to control the entire scraping process."""
-    print("Setting up the Undetected Chrome WebDriver with Stealth...")
-    options = uc.ChromeOptions()
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    driver = uc.Chrome(options=options, use_subprocess=True)
+    parser = argparse.ArgumentParser(description="Scrape clutch.co listing pages.")
+    parser.add_argument('--engine', choices=['selenium', 'selenium-js', 'http', 'http-only'], default=FETCH_ENGINE,
+                        help="page fetch backend; 'selenium-js' extracts inside the browser instead of "
+                             "transferring page_source, 'http' falls back to the browser per URL when needed")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="fetch pages concurrently and parse them in a process pool")
+    parser.add_argument('--workers', type=int, default=FETCH_WORKERS,
+                        help="concurrent page fetchers in --pipeline mode")
+    parser.add_argument('--cache', action='store_true',
+                        help="keep raw HTML snapshots in the page cache and serve fresh ones from it")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve live Prometheus-style metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-log', help="append per-page JSON timing events to this file")
+    parser.add_argument('--compress', action='store_true',
+                        help=f"write {block_path(OUTPUT_FILE)}: block-compressed, with a profile_url index")
+    parser.add_argument('--history', action='store_true',
+                        help="record this crawl's cards in the versioned history store (field-level changes only)")
+    args = parser.parse_args()
+    METRICS.configure(args.metrics_log, args.metrics_port)
+    cache = PageCache() if args.cache else None
+    output_file = block_path(OUTPUT_FILE) if args.compress else OUTPUT_FILE
+
+    page_urls = [BASE_URL if page_num == 0 else f"{BASE_URL}?page={page_num}" for page_num in range(PAGES_TO_SCRAPE)]
+    if args.pipeline:
+        open_writer(output_file, truncate=True).close()
+        snapshot = run_pipeline(page_urls, parse_listing_page, output_file, engine=args.engine,
+                                ready_selector='li.provider-list-item', fetch_workers=args.workers, cache=cache)
+        print(f"\nScraping complete. Total entries (including duplicates) saved to {output_file}: {snapshot['written']}")
+        if args.history:
+            record_history(output_file, complete=False)
+        return
 
-    stealth(driver, languages=["en-US", "en"], vendor="Google Inc.", platform="Win32")
-    print("WebDriver is ready.")
+    print(f"Setting up the '{args.engine}' page fetcher...")
+    # Pacing is handled by the adaptive per-host throttle, not fixed sleeps.
+    fetcher = create_fetcher(args.engine, scheduler=PolitenessScheduler(), cache=cache)
+    print("Fetcher is ready.")
 
-    # Clear the output file before starting
-    with open(OUTPUT_FILE, 'w') as f:
-        pass
+    # Clear the output file before starting; the writer keeps it open for the whole run
+    writer = open_writer(output_file, truncate=True)
         
     total_scraped_companies = 0
-    
-    for page_num in range(PAGES_TO_SCRAPE):
+    page_numbers = {url: page_num for page_num, url in enumerate(page_urls, 1)}
+
+    def scrape_page(current_url):
+        nonlocal total_scraped_companies
         print("-" * 20)
-        current_url = BASE_URL if page_num == 0 else f"{BASE_URL}?page={page_num}"
-        print(f"Scraping listings page #{page_num + 1}: {current_url}")
-        driver.get(current_url)
+        print(f"Scraping listings page #{page_numbers[current_url]}: {current_url}")
 
-        if page_num == 0:
-            print("  - Waiting for initial page load...")
-            time.sleep(10)
-        else:
-            time.sleep(random.uniform(5, 8))
-
-        try:
-            # Wait for any provider card to be present, featured or regular
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'li.provider-list-item'))
-            )
-            print("  - Page content is loaded.")
-            soup = BeautifulSoup(driver.page_source, 'lxml')
-            
-            companies_on_page = []
+        # Wait for any provider card to be present, featured or regular
+        # Scrape all providers, which includes both featured and regular listings
+        companies_on_page = fetch_cards(fetcher, current_url)
+        print("  - Page content is loaded.")
+        print(f"  - Found {len(companies_on_page)} total provider entries on the page.")
 
-            # Scrape all providers, which includes both featured and regular listings
-            all_providers = soup.select('li.provider-list-item')
-            print(f"  - Found {len(all_providers)} total provider entries on the page.")
-            for card in all_providers:
-                companies_on_page.append(parse_company_card(card))
-            
-            # --- PERIODIC SAVE (NO DE-DUPLICATION) ---
-            if companies_on_page:
-                with open(OUTPUT_FILE, 'a', encoding='utf-8') as f:
-                    for entry in companies_on_page:
-                        json.dump(entry, f, ensure_ascii=False)
-                        f.write('\n')
-                total_scraped_companies += len(companies_on_page)
-                print(f"  - Saved {len(companies_on_page)} entries. Total saved so far: {total_scraped_companies}")
-
-        except TimeoutException:
-            print("  - Page timed out or no providers found. Ending scrape.")
-            break
-        except Exception as e:
-            print(f"  - A critical error occurred, ending collection: {e}")
-            break
-
-    driver.quit()
-    print("\nBrowser closed.")
-    print(f"\nScraping complete. Total entries (including duplicates) saved to {OUTPUT_FILE}: {total_scraped_companies}")
+        # --- PERIODIC SAVE (NO DE-DUPLICATION) ---
+        if companies_on_page:
+            writer.write_many(companies_on_page)
+            writer.flush()
+            total_scraped_companies += len(companies_on_page)
+            print(f"  - Saved {len(companies_on_page)} entries. Total saved so far: {total_scraped_companies}")
+
+    # A timed-out or blocked page is retried later instead of ending the whole scrape.
+    summary = RetryScheduler().run(page_urls, scrape_page)
+
+    writer.close()
+    fetcher.close()
+    print("\nFetcher closed.")
+    print(f"\nScraping complete. Total entries (including duplicates) saved to {output_file}: {total_scraped_companies}")
+    print(f"Retried {summary['retried']} page loads; {summary['dead']} pages dead-lettered to {DEAD_LETTER_FILE}.")
+    if args.history:
+        # Only a crawl that got every page may mark missing companies as delisted.
+        record_history(output_file, complete=summary['dead'] == 0)
+    print(f"Metrics: {json.dumps(METRICS.snapshot())}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import tracemalloc
+import multiprocessing
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from ListingPageScraper import parse_company_card, parse_listing_page, parse_listing_page_soup
+from scraper import parse_company_profile, parse_company_profile_soup
+from pipeline import run_pipeline
+from throttle import PolitenessScheduler
+from page_cache import PageCache, read_snapshot
+
+# --- Configuration ---
+CORPUS_DIR = 'bench_corpus'   # holds listing/*.html and profile/*.html pages (a synthetic set is committed)
+OUTPUT_FILE = 'bench_results.json'
+REPEATS = 3   # each timing is the best of this many passes
+PIPELINE_PAGES = 500   # profile fetches in the end-to-end run against the stub server
+REGRESSION_TOLERANCE = 0.15   # fraction of pages/sec that may be lost before a result is flagged
+
+# Selectors behind each extracted field, timed on an already-built soup to
+# show where per-page extraction time goes.
+LISTING_FIELD_SELECTORS = {
+    'name': 'h3.provider__title a',
+    'tagline': '.provider__tagline',
+    'description': '.provider__description p',
+    'location': '.locality',
+    'hourly_rate': '.hourly-rate',
+    'min_project_size': '.min-project-size',
+    'team_size': '.employees-count',
+    'website': 'a.website-link__item',
+}
+PROFILE_FIELD_SELECTORS = {
+    'name': 'h1.profile-header__title',
+    'summary_description': '.profile-summary__text',
+    'website': "ul.profile-short-actions a[title='Visit website']",
+    'summary_details': 'ul.profile-summary__details li.profile-summary__detail, '
+                       'ul.profile-summary__details li.profile-summary__detail-clickable',
+    'languages': '#profile-languages-modal .profile-modal--list li',
+    'locations': '#profile-locations-modal .profile-modal--list li',
+    'pricing_snapshot': '#pricing-snapshot',
+}
+
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    corpus = {'listing': [], 'profile': []}
+    for kind in corpus:
+        kind_dir = os.path.join(corpus_dir, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        for name in sorted(os.listdir(kind_dir)):
+            if name.endswith('.html'):
+                with open(os.path.join(kind_dir, name), 'r', encoding='utf-8') as f:
+                    corpus[kind].append((name, f.read()))
+    return corpus
+
+
+def capture_corpus(cache, corpus_dir=CORPUS_DIR, limit=200):
+    """Copies up to `limit` listing and `limit` profile snapshots out of the page cache."""
+    counts = {'listing': 0, 'profile': 0}
+    for url, path in cache.snapshots():
+        kind = 'profile' if '/profile/' in url else 'listing'
+        if counts[kind] >= limit:
+            continue
+        html = read_snapshot(path)
+        name = url.rstrip('/').rsplit('/', 1)[-1].replace('?', '_').replace('=', '-') or 'index'
+        os.makedirs(os.path.join(corpus_dir, kind), exist_ok=True)
+        with open(os.path.join(corpus_dir, kind, name + '.html'), 'w', encoding='utf-8') as f:
+            f.write(html)
+        counts[kind] += 1
+    print(f"Captured {counts['listing']} listing and {counts['profile']} profile pages into {corpus_dir}.")
+
+
+# --- Parser variants: html -> records ---
+
+def listing_strained(html, url=None):
+    # Only the provider cards are turned into a tree; everything else is skipped by the tokenizer.
+    soup = BeautifulSoup(html, 'lxml', parse_only=SoupStrainer('li', class_='provider-list-item'))
+    return [parse_company_card(card) for card in soup.select('li.provider-list-item')]
+
+
+LISTING_PARSERS = {
+    'lxml': parse_listing_page_soup,
+    'html.parser': partial(parse_listing_page_soup, features='html.parser'),
+    'lxml+strainer': listing_strained,
+    'compiled': parse_listing_page,
+}
+PROFILE_PARSERS = {
+    'lxml': parse_company_profile_soup,
+    'html.parser': partial(parse_company_profile_soup, features='html.parser'),
+    'compiled': parse_company_profile,
+}
+
+
+def time_parser(parse, pages, repeats=REPEATS):
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for name, html in pages:
+            parse(html, name)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def python_heap_peak(parse, pages):
+    """Peak of Python-level allocations only: libxml2's trees and buffers are invisible to tracemalloc."""
+    tracemalloc.start()
+    for name, html in pages:
+        parse(html, name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def _rss_growth_child(parse, pages, conn):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for name, html in pages:
+        parse(html, name)
+    conn.send(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+    conn.close()
+
+
+def peak_rss_growth(parse, pages):
+    """
+    Bytes the process's peak RSS grows by while parsing `pages`, C
+    allocations included. Runs in a forked child per variant, so one
+    variant's high-water mark does not hide the next one's.
+    """
+    ctx = multiprocessing.get_context('fork')
+    receiver, sender = ctx.Pipe(duplex=False)
+    child = ctx.Process(target=_rss_growth_child, args=(parse, pages, sender))
+    child.start()
+    growth = receiver.recv()
+    child.join()
+    return growth * 1024   # ru_maxrss is in KB on Linux
+
+
+def bench_parsers(parsers, pages, repeats=REPEATS):
+    results = {}
+    reference = [parsers['lxml'](html, name) for name, html in pages]
+    for variant, parse in parsers.items():
+        seconds = time_parser(parse, pages, repeats)
+        results[variant] = {
+            'pages_per_sec': round(len(pages) / seconds, 1) if seconds else None,
+            'ms_per_page': round(seconds / len(pages) * 1000, 3),
+            'peak_rss_kb': round(peak_rss_growth(parse, pages) / 1024, 1),
+            'python_heap_peak_kb': round(python_heap_peak(parse, pages) / 1024, 1),
+            'matches_lxml': [parse(html, name) for name, html in pages] == reference,
+        }
+        print(f"  {variant:<15} {results[variant]['pages_per_sec']:>9} pages/s  "
+              f"{results[variant]['peak_rss_kb']:>9} KB peak RSS  "
+              f"{results[variant]['python_heap_peak_kb']:>9} KB Python heap only")
+    return results
+
+
+def bench_field_costs(selectors, pages, repeats=REPEATS):
+    """Microseconds per page spent in each field's selector, on a prebuilt soup."""
+    soups = [BeautifulSoup(html, 'lxml') for _, html in pages]
+    costs = {}
+    for field, selector in selectors.items():
+        best = float('inf')
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for soup in soups:
+                soup.select(selector)
+            best = min(best, time.perf_counter() - started)
+        costs[field] = round(best / len(soups) * 1e6, 1)
+    return costs
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def bench_pipeline(corpus_dir, profile_pages, total_pages=PIPELINE_PAGES):
+    """End-to-end fetch -> parse -> write throughput against a local stub server."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(_QuietHandler, directory=corpus_dir))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/profile/"
+    urls = [f"{base}{profile_pages[i % len(profile_pages)][0]}?n={i}" for i in range(total_pages)]
+    tmp_dir = tempfile.mkdtemp(prefix='bench-')
+    try:
+        # The politeness throttle is opened wide: this measures our own overhead.
+        scheduler = PolitenessScheduler(rate=10000, max_rate=10000, burst=10000)
+        started = time.perf_counter()
+        snapshot = run_pipeline(urls, parse_company_profile, os.path.join(tmp_dir, 'out.jsonl'),
+                                engine='http-only', scheduler=scheduler)
+        seconds = time.perf_counter() - started
+    finally:
+        server.shutdown()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return {
+        'pages': total_pages,
+        'pages_per_sec': round(total_pages / seconds, 1),
+        'stages': snapshot['stages'],
+        'failed': snapshot['failed'],
+    }
+
+
+def find_regressions(results, baseline, tolerance=REGRESSION_TOLERANCE, path=''):
+    """Every pages_per_sec figure that dropped by more than `tolerance` against the baseline."""
+    regressions = []
+    for key, value in results.items():
+        if key not in baseline:
+            continue
+        where = f"{path}.{key}" if path else key
+        if isinstance(value, dict) and isinstance(baseline[key], dict):
+            regressions.extend(find_regressions(value, baseline[key], tolerance, where))
+        elif key == 'pages_per_sec' and value and baseline[key]:
+            if value < baseline[key] * (1 - tolerance):
+                regressions.append({'metric': where, 'baseline': baseline[key], 'current': value})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline parser and pipeline benchmarks.")
+    parser.add_argument('--corpus', default=CORPUS_DIR)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--pipeline-pages', type=int, default=PIPELINE_PAGES,
+                        help="profile fetches in the end-to-end run (0 skips it)")
+    parser.add_argument('--baseline', help="earlier results JSON to compare against; exits 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument('--capture-from-cache', type=int, metavar='N',
+                        help="copy up to N listing and N profile snapshots from the page cache into the corpus")
+    args = parser.parse_args()
+
+    if args.capture_from_cache:
+        capture_corpus(PageCache(), args.corpus, args.capture_from_cache)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus['listing'] and not corpus['profile']:
+        print(f"No pages found under {args.corpus}/listing or {args.corpus}/profile.")
+        sys.exit(2)
+
+    results = {'python': sys.version.split()[0], 'corpus': {k: len(v) for k, v in corpus.items()}}
+    if corpus['listing']:
+        print(f"Listing parsers ({len(corpus['listing'])} pages):")
+        results['listing'] = bench_parsers(LISTING_PARSERS, corpus['listing'], args.repeats)
+        results['listing_field_us'] = bench_field_costs(LISTING_FIELD_SELECTORS, corpus['listing'], args.repeats)
+    if corpus['profile']:
+        print(f"Profile parsers ({len(corpus['profile'])} pages):")
+        results['profile'] = bench_parsers(PROFILE_PARSERS, corpus['profile'], args.repeats)
+        results['profile_field_us'] = bench_field_costs(PROFILE_FIELD_SELECTORS, corpus['profile'], args.repeats)
+        if args.pipeline_pages:
+            print(f"End-to-end pipeline ({args.pipeline_pages} pages against a local stub server)...")
+            results['pipeline'] = bench_pipeline(args.corpus, corpus['profile'], args.pipeline_pages)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['metric']}: {r['baseline']} -> {r['current']} pages/s")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+import os
+import gzip
+import json
+import zlib
+import sqlite3
+import argparse
+import threading
+from functools import lru_cache
+
+from jsonl_writer import JsonlWriter
+
+# --- Configuration ---
+BLOCK_SUFFIX = '.gz'   # output paths ending in this are written block-compressed
+INDEX_SUFFIX = '.idx'   # sidecar index: <file>.gz.idx
+BLOCK_RECORDS = 200   # records per gzip member (one member per writer flush)
+COMPRESS_LEVEL = 6
+READ_CHUNK = 1024 * 1024
+BLOCK_CACHE = 64   # decompressed blocks kept by a reader
+
+# File format: a concatenation of gzip members, each holding a batch of
+# JSONL lines, so the file is still a valid .gz (zcat, gzip.open, pandas
+# and DuckDB read it). The sidecar SQLite index records every member's
+# offset and length and, per record, its profile_url and position, so one
+# company is a seek plus one small decompress instead of a scan.
+
+
+def is_block_file(path):
+    return path.endswith(BLOCK_SUFFIX)
+
+
+def block_path(path):
+    return path if is_block_file(path) else path + BLOCK_SUFFIX
+
+
+def _members(f, offset=0):
+    """
+    Yields (offset, length, payload) for every complete gzip member from
+    `offset` on. Stops at a torn or corrupt member; the caller can read
+    where from the end of the last yielded one.
+    """
+    f.seek(offset)
+    start, consumed, pending = offset, 0, b''
+    decompressor, out = zlib.decompressobj(wbits=31), []
+    while True:
+        chunk = pending or f.read(READ_CHUNK)
+        pending = b''
+        if not chunk:
+            return
+        try:
+            out.append(decompressor.decompress(chunk))
+        except zlib.error:
+            return
+        if not decompressor.eof:
+            consumed += len(chunk)
+            continue
+        length = consumed + len(chunk) - len(decompressor.unused_data)
+        yield start, length, b''.join(out)
+        start, consumed, pending = start + length, 0, decompressor.unused_data
+        decompressor, out = zlib.decompressobj(wbits=31), []
+
+
+def _lines(payload):
+    return payload.split(b'\n')[:-1]
+
+
+class BlockIndex:
+    """The sidecar index of one block file: member offsets, and profile_url -> (member, line)."""
+
+    def __init__(self, path):
+        self.path = path + INDEX_SUFFIX
+        self.data_path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS blocks (
+                offset INTEGER PRIMARY KEY,
+                length INTEGER NOT NULL,
+                records INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS records (
+                profile_url TEXT,
+                offset INTEGER NOT NULL,
+                line INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_url ON records (profile_url);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value
+            );
+        """)
+        self._db.commit()
+
+    def add_block(self, offset, length, urls):
+        with self._lock:
+            added = self._db.execute("INSERT OR IGNORE INTO blocks (offset, length, records) VALUES (?, ?, ?)",
+                                     (offset, length, len(urls))).rowcount
+            if added:
+                self._db.executemany("INSERT INTO records (profile_url, offset, line) VALUES (?, ?, ?)",
+                                     ((url, offset, line) for line, url in enumerate(urls)))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM blocks")
+            self._db.execute("DELETE FROM records")
+            self._db.execute("DELETE FROM meta")
+            self._db.commit()
+
+    def indexed_end(self):
+        """End of the gap-free run of indexed members from offset 0."""
+        end = 0
+        with self._lock:
+            for offset, length in self._db.execute("SELECT offset, length FROM blocks ORDER BY offset"):
+                if offset != end:
+                    break
+                end = offset + length
+        return end
+
+    def sync(self, truncate=True):
+        """
+        Brings the index up to date with its file: members appended without
+        an index entry (a crash between the write and the commit, or a
+        writer without the index) are indexed, a torn last member is cut off
+        when `truncate`, and an index of a replaced file is rebuilt.
+        Returns the number of members indexed.
+        """
+        if not os.path.exists(self.data_path):
+            self.clear()
+            return 0
+        st = os.stat(self.data_path)
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'inode'").fetchone()
+        end = self.indexed_end()
+        if (row and row[0] != st.st_ino) or end > st.st_size:
+            self.clear()
+            end = 0
+        added = 0
+        if end < st.st_size:
+            with open(self.data_path, 'rb') as f:
+                for offset, length, payload in _members(f, end):
+                    self.add_block(offset, length, [_profile_url(line) for line in _lines(payload)])
+                    end = offset + length
+                    added += 1
+            if end < st.st_size and truncate:
+                with open(self.data_path, 'rb+') as f:
+                    f.truncate(end)
+                print(f"Repaired {self.data_path}: dropped a torn {st.st_size - end}-byte last block.")
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('inode', ?)", (st.st_ino,))
+            self._db.commit()
+        return added
+
+    def locate(self, profile_url):
+        """(member offset, member length, line) of the latest record for `profile_url`, or None."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT r.offset, b.length, r.line FROM records r JOIN blocks b ON b.offset = r.offset "
+                "WHERE r.profile_url = ? ORDER BY r.offset DESC, r.line DESC LIMIT 1", (profile_url,)
+            ).fetchone()
+
+    def __contains__(self, profile_url):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM records WHERE profile_url = ? LIMIT 1",
+                                    (profile_url,)).fetchone() is not None
+
+    def urls(self):
+        with self._lock:
+            return [url for (url,) in self._db.execute(
+                "SELECT DISTINCT profile_url FROM records WHERE profile_url IS NOT NULL")]
+
+    def positions(self):
+        """(profile_url, member offset, member length, line) of every record, in file order."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT r.profile_url, r.offset, b.length, r.line FROM records r "
+                "JOIN blocks b ON b.offset = r.offset ORDER BY r.offset, r.line"
+            ).fetchall()
+
+    def counts(self):
+        with self._lock:
+            blocks, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM blocks").fetchone()
+            records, urls = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT profile_url) FROM records").fetchone()
+        return {'blocks': blocks, 'bytes': size, 'records': records, 'profile_urls': urls}
+
+    def close(self):
+        self._db.close()
+
+
+def _profile_url(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record.get('profile_url') if isinstance(record, dict) else None
+
+
+def open_index(path, truncate=False):
+    """The synced index of block file `path`; readers pass truncate=False and never modify the data."""
+    index = BlockIndex(path)
+    index.sync(truncate)
+    return index
+
+
+class BlockJsonlWriter(JsonlWriter):
+    """
+    JsonlWriter for block files: every flush appends one gzip member and
+    indexes its records, under the same file lock, so appends stay cheap and
+    safe to share between threads and processes. A torn last member is
+    dropped on open, and members missing from the index are added.
+    """
+
+    def __init__(self, path, flush_records=BLOCK_RECORDS, truncate=False, compress_level=COMPRESS_LEVEL, **kwargs):
+        self.index = BlockIndex(path)
+        if truncate:
+            self.index.clear()
+        self.compress_level = compress_level
+        super().__init__(path, flush_records=flush_records, truncate=truncate, **kwargs)
+
+    def _repair(self):
+        self.index.sync(truncate=True)
+
+    def _append(self, records):
+        lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        data = gzip.compress(lines.encode('utf-8'), self.compress_level, mtime=0)
+        with self._file_lock():
+            offset = os.lseek(self._fd, 0, os.SEEK_END)
+            self._write_all(data)
+            self.index.add_block(offset, len(data), [record.get('profile_url') for record in records])
+
+    def close(self):
+        super().close()
+        self.index.close()
+
+
+def open_writer(path, **kwargs):
+    """A JsonlWriter, or a BlockJsonlWriter when `path` ends in BLOCK_SUFFIX."""
+    return BlockJsonlWriter(path, **kwargs) if is_block_file(path) else JsonlWriter(path, **kwargs)
+
+
+class _BlockLineWriter:
+    def __init__(self, path):
+        self.writer = BlockJsonlWriter(path, truncate=True)
+
+    def write(self, line):
+        self.writer.write(json.loads(line))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.writer.close()
+
+
+def open_lines_output(path):
+    """A truncated output taking JSONL lines via write(line): a text file, or a block file with its index."""
+    return _BlockLineWriter(path) if is_block_file(path) else open(path, 'w', encoding='utf-8')
+
+
+def iter_lines(path):
+    """Every JSONL line of a plain or block file, newline included; a torn last block is ignored."""
+    if not is_block_file(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from f
+        return
+    with open(path, 'rb') as f:
+        for _, _, payload in _members(f):
+            for line in _lines(payload):
+                yield line.decode('utf-8') + '\n'
+
+
+def iter_records(path):
+    for line in iter_lines(path):
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def latest_records(path):
+    """
+    Each profile_url's last record, in file order. Later lines supersede
+    earlier ones (incremental refreshes append), so a first pass only notes
+    which line is the latest per URL.
+    """
+    latest = {}
+    for line_no, line in enumerate(iter_lines(path)):
+        try:
+            latest[json.loads(line).get('profile_url')] = line_no
+        except ValueError:
+            continue
+    keep = set(latest.values())
+    for line_no, line in enumerate(iter_lines(path)):
+        if line_no in keep:
+            yield json.loads(line)
+
+
+class BlockReader:
+    """Random access to a block file through its index, with the last BLOCK_CACHE members kept decompressed."""
+
+    def __init__(self, path):
+        self.path = path
+        self.index = open_index(path)
+        self._file = open(path, 'rb')
+        self.block = lru_cache(maxsize=BLOCK_CACHE)(self._read_block)
+
+    def _read_block(self, offset, length):
+        self._file.seek(offset)
+        return _lines(gzip.decompress(self._file.read(length)))
+
+    def line(self, offset, length, line):
+        return self.block(offset, length)[line].decode('utf-8') + '\n'
+
+    def get(self, profile_url):
+        """The latest record for `profile_url`, or None."""
+        found = self.index.locate(profile_url)
+        return json.loads(self.line(*found)) if found else None
+
+    def close(self):
+        self._file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def compress_file(input_path, output_path=None, block_records=BLOCK_RECORDS):
+    """Rewrites a plain JSONL file as an indexed block file. Returns the output path."""
+    output_path = output_path or block_path(input_path)
+    with BlockJsonlWriter(output_path, flush_records=block_records, flush_interval=float('inf'),
+                          truncate=True) as writer:
+        for record in iter_records(input_path):
+            writer.write(record)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Block-compressed JSONL files with a profile_url index.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    compress = commands.add_parser('compress', help="convert a plain JSONL file")
+    compress.add_argument('input')
+    compress.add_argument('output', nargs='?', help=f"default: <input>{BLOCK_SUFFIX}")
+    compress.add_argument('--block-records', type=int, default=BLOCK_RECORDS)
+    get = commands.add_parser('get', help="print the latest record of one profile_url")
+    get.add_argument('path')
+    get.add_argument('profile_url')
+    cat = commands.add_parser('cat', help="print every line, like zcat")
+    cat.add_argument('path')
+    reindex = commands.add_parser('reindex', help="rebuild the sidecar index from the data")
+    reindex.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'compress':
+        path = compress_file(args.input, args.output, args.block_records)
+        index = open_index(path)
+        counts = index.counts()
+        index.close()
+        print(f"Wrote {counts['records']} records in {counts['blocks']} blocks to {path} "
+              f"({os.path.getsize(args.input)} -> {os.path.getsize(path)} bytes).")
+    elif args.command == 'get':
+        with BlockReader(args.path) as reader:
+            record = reader.get(args.profile_url)
+        if record is None:
+            raise SystemExit(f"{args.profile_url} is not in {args.path}")
+        print(json.dumps(record, ensure_ascii=False, indent=2))
+    elif args.command == 'cat':
+        for line in iter_lines(args.path):
+            print(line, end='')
+    else:
+        index = BlockIndex(args.path)
+        index.clear()
+        index.sync(truncate=False)
+        print(f"Indexed {args.path}: {index.counts()}")
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import json
+from functools import lru_cache
+
+from extraction import (Field, Pairs, Group, Derived, CARD_SCHEMA, CARD_SELECTOR, PROFILE_SCHEMA, extract_cards,
+                        json_ld_description, description_from_json_ld, chart_breakdown, chart_breakdown_from_data)
+from metrics import METRICS
+
+# Runs a schema plan inside the page and returns the raw values as one JSON
+# string: no page_source transfer and no second parse in Python. Text
+# follows the same BeautifulSoup get_text() rules as extraction.read_text
+# (script/style/template text and comments skipped, Python's whitespace
+# set for strip() and split()), so the Python side only has to apply
+# defaults, fallbacks and post-processors to get an identical record.
+#
+# arguments[0]: plan, a list of specs
+#   ['field', selector, text mode, attr, many, within, fallback source]
+#   ['pairs', selector, key selector, key text mode, value selector, value text mode]
+#   ['group', within, [field specs]]
+#   ['source', name]                      -> a SOURCES value (decoded object)
+# arguments[1]: card selector, or null to run the plan once on the document
+EXTRACT_SCRIPT = r"""
+var plan = arguments[0], cardSelector = arguments[1];
+var TRIM = /^[\t\n\v\f\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+|[\t\n\v\f\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+$/g;
+var SPACES = /[\t\n\v\f\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+/;
+var SKIP = {script: 1, style: 1, template: 1};
+var SOURCES = {
+  chartPie: function () {
+    if (typeof window.chartPie === 'undefined') return null;
+    try { return JSON.parse(JSON.stringify(window.chartPie)); } catch (e) { return null; }
+  },
+  jsonLd: function () {
+    var tag = document.querySelector("script[type='application/ld+json']");
+    return tag ? tag.textContent : null;
+  }
+};
+
+function strings(el, out) {
+  // Adjacent text nodes are one string, as they are after a re-parse of page_source.
+  var pending = null;
+  for (var n = el.firstChild; n; n = n.nextSibling) {
+    if (n.nodeType === 3 || n.nodeType === 4) {
+      pending = pending === null ? n.data : pending + n.data;
+      continue;
+    }
+    if (pending !== null) { out.push(pending); pending = null; }
+    if (n.nodeType === 1 && !SKIP[n.localName]) strings(n, out);
+  }
+  if (pending !== null) out.push(pending);
+  return out;
+}
+function strip(s) { return s.replace(TRIM, ''); }
+function stripped(el) { return strings(el, []).map(strip).filter(function (s) { return s; }); }
+function text(el, mode) {
+  if (mode === 'text') return strip(strings(el, []).join(''));
+  if (mode === 'strip') return stripped(el).join('');
+  if (mode === 'lines') return stripped(el).join('\n');
+  return stripped(el).join('').split(SPACES).filter(function (s) { return s; }).join(' ');
+}
+function field(spec, node) {
+  var read = function (el) { return spec[3] !== null ? el.getAttribute(spec[3]) : text(el, spec[2]); };
+  if (spec[5] !== null) {
+    node = node.querySelector(spec[5]);
+    if (!node) return false;
+  }
+  if (spec[4]) return Array.prototype.map.call(node.querySelectorAll(spec[1]), read);
+  var el = node.querySelector(spec[1]);
+  var value = el ? read(el) : null;
+  if (value === null && spec[6] !== null) return {fallback: SOURCES[spec[6]]()};
+  return value;
+}
+function run(specs, node) {
+  return specs.map(function (spec) {
+    if (spec[0] === 'field') return field(spec, node);
+    if (spec[0] === 'pairs') {
+      return Array.prototype.map.call(node.querySelectorAll(spec[1]), function (item) {
+        var key = item.querySelector(spec[2]), value = item.querySelector(spec[4]);
+        return [key ? text(key, spec[3]) : null, value ? text(value, spec[5]) : null];
+      });
+    }
+    if (spec[0] === 'group') {
+      var scope = node.querySelector(spec[1]);
+      return scope ? run(spec[2], scope) : null;
+    }
+    return SOURCES[spec[1]]();
+  });
+}
+if (cardSelector === null) return JSON.stringify(run(plan, document));
+return JSON.stringify(Array.prototype.map.call(document.querySelectorAll(cardSelector), function (card) {
+  return run(plan, card);
+}));
+"""
+
+# Python callables used by the schemas -> (in-page source, decoder of its value).
+BROWSER_SOURCES = {
+    json_ld_description: ('jsonLd', description_from_json_ld),
+    chart_breakdown: ('chartPie', chart_breakdown_from_data),
+}
+
+
+def _source(func):
+    if func not in BROWSER_SOURCES:
+        raise ValueError(f"{func.__name__} has no in-browser equivalent in BROWSER_SOURCES")
+    return BROWSER_SOURCES[func][0]
+
+
+def _plan(specs):
+    plan = []
+    for spec in specs:
+        if isinstance(spec, Field):
+            plan.append(['field', spec.selector, spec.text, spec.attr, spec.many, spec.within,
+                         _source(spec.fallback) if spec.fallback else None])
+        elif isinstance(spec, Pairs):
+            plan.append(['pairs', spec.selector, spec.key.selector, spec.key.text,
+                         spec.value.selector, spec.value.text])
+        elif isinstance(spec, Group):
+            plan.append(['group', spec.within, _plan(spec.fields)])
+        elif isinstance(spec, Derived):
+            plan.append(['source', _source(spec.compute)])
+        else:
+            raise ValueError(f"cannot run {type(spec).__name__} specs in the browser")
+    return plan
+
+
+@lru_cache(maxsize=None)
+def browser_plan(schema, fields=None):
+    """The specs of `schema` (or of its projection on `fields`) and their JSON plan for EXTRACT_SCRIPT."""
+    if fields is None:
+        wanted, specs = None, schema.specs
+    else:
+        wanted, specs = schema._projection(fields)
+    return wanted, specs, _plan(specs)
+
+
+def _finish_field(spec, value):
+    if spec.many:
+        return value or []
+    if value is False:   # the `within` element is missing
+        return spec.default
+    if isinstance(value, dict):
+        return BROWSER_SOURCES[spec.fallback][1](value['fallback'])
+    if value is None:
+        return spec.default
+    return spec.post(value) if spec.post else value
+
+
+def _finish(specs, values, wanted=None):
+    record = {}
+    for spec, value in zip(specs, values):
+        if isinstance(spec, Field):
+            record[spec.name] = _finish_field(spec, value)
+        elif isinstance(spec, Pairs):
+            record[spec.names[0]] = {k: v for k, v in value if k is not None and v is not None}
+        elif isinstance(spec, Group):
+            record[spec.names[0]] = {} if value is None else _finish(spec.fields, value)
+        else:
+            computed = BROWSER_SOURCES[spec.compute][1](value)
+            record.update((name, computed[name]) for name in spec.names if wanted is None or name in wanted)
+    return record
+
+
+def profile_call(fields=None):
+    """(script, *args) for fetcher.evaluate() that extracts a profile page in the browser."""
+    return EXTRACT_SCRIPT, browser_plan(PROFILE_SCHEMA, fields)[2], None
+
+
+def finish_profile(raw, profile_url, fields=None):
+    """The profile record extract_profile() would build, from the JSON returned by profile_call()."""
+    wanted, specs, _ = browser_plan(PROFILE_SCHEMA, fields)
+    return {'profile_url': profile_url, **_finish(specs, json.loads(raw), wanted)}
+
+
+def cards_call(fields=None):
+    return EXTRACT_SCRIPT, browser_plan(CARD_SCHEMA, fields)[2], CARD_SELECTOR
+
+
+def finish_cards(raw, fields=None):
+    wanted, specs, _ = browser_plan(CARD_SCHEMA, fields)
+    return [_finish(specs, card, wanted) for card in json.loads(raw)]
+
+
+def fetch_cards(fetcher, url, ready_selector=CARD_SELECTOR, fields=None):
+    """
+    Every provider card on a listing page: extracted inside the page when
+    the fetcher supports it (the selenium-js engine), else parsed from the
+    fetched HTML.
+    """
+    if getattr(fetcher, 'extracts_in_browser', False):
+        raw = fetcher.evaluate(url, ready_selector, None, *cards_call(fields))
+        with METRICS.timer('parse', url=url):
+            return finish_cards(raw, fields)
+    html = fetcher.fetch(url, ready_selector)
+    with METRICS.timer('parse', url=url):
+        return extract_cards(html, fields)
@@ -0,0 +1,231 @@
+import json
+import queue
+import argparse
+import threading
+
+from fetchers import create_fetcher
+from throttle import PolitenessScheduler
+from page_cache import PageCache
+from jsonl_writer import JsonlWriter
+from incremental import FingerprintStore, MAX_PROFILE_AGE
+from extraction import PROFILE_SCHEMA, last_page_number
+from metrics import METRICS
+from retry import DEAD_LETTER_FILE
+from browser_extraction import fetch_cards
+from ListingPageScraper import parse_listing_page, OUTPUT_FILE as LISTING_OUTPUT_FILE
+from scraper import START_URL, FETCH_ENGINE, listing_page_urls, fetch_company_profile, mark_saved, retry_scheduler
+from unified_crawl import (COMBINED_OUTPUT_FILE, CHECKPOINT_EVERY, PROFILE_FIELDS, open_combined_state, load_cards,
+                           plan_profiles, join_record, parse_card_filter)
+
+# --- Configuration ---
+GLOBAL_CONCURRENCY = 4   # page loads in flight across all seeds together
+MAX_PAGES = 2000   # sanity cap on a discovered page count
+
+
+def run_pool(urls, work, workers, make_fetcher, state):
+    """
+    Runs `work(fetcher, url)` over `urls` on at most `workers` threads, each
+    with its own fetcher and RetryScheduler pulling from one shared queue.
+    This is the global concurrency budget: every seed's pages compete for
+    the same slots.
+    """
+    feed = queue.Queue()
+    for url in urls:
+        feed.put(url)
+
+    def drain():
+        while True:
+            try:
+                yield feed.get_nowait()
+            except queue.Empty:
+                return
+
+    def worker():
+        try:
+            fetcher = make_fetcher()
+        except Exception as e:
+            print(f"  - Could not start a fetcher: {e}")
+            return
+        try:
+            retry_scheduler(state).run(drain(), lambda url: work(fetcher, url))
+        finally:
+            fetcher.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(min(workers, feed.qsize()))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+class DirectoryCrawl:
+    """
+    Crawls several clutch.co directories (categories, countries, or both)
+    as one job:
+
+    1. discovery: the first page of each seed is fetched, its cards kept,
+       and the real page count read from its pagination;
+    2. listings: every remaining page of every seed, through one shared
+       worker pool;
+    3. profiles: each profile URL once, however many directories list it.
+       A profile belongs to the first seed it was found under; later
+       sightings only count as cross-seed duplicates.
+
+    Records are written to the same files as unified_crawl, with progress in
+    the same state (COMBINED_STATE_DB), and an interrupted job resumes where
+    it stopped.
+    """
+
+    def __init__(self, seeds, engine=FETCH_ENGINE, workers=GLOBAL_CONCURRENCY, cache=None):
+        self.seeds = list(dict.fromkeys(seeds))
+        self.engine = engine
+        self.workers = workers
+        self.cache = cache
+        self.scheduler = PolitenessScheduler()
+        self.state = open_combined_state()
+        self.store = FingerprintStore()
+        self.cards = {}
+        self.sightings = 0
+        self._lock = threading.Lock()
+        self._seed_of = {}
+
+    def make_fetcher(self):
+        return create_fetcher(self.engine, scheduler=self.scheduler, cache=self.cache)
+
+    def _save_page(self, writer, seed, url, cards):
+        page_cards = [card for card in cards if card['profile_url'] != 'N/A']
+        with self._lock:
+            # Cards reach the file before the page counts as done, so a resume can reload them.
+            writer.write_many(page_cards)
+            writer.flush()
+            new = self.state.add((card['profile_url'] for card in page_cards), 'profile', seed)
+            self.state.mark_done(url, 'listing')
+            self.sightings += len(page_cards)
+            for card in page_cards:
+                self.cards.setdefault(card['profile_url'], card)
+            print(f"  - {url}: {len(page_cards)} cards, {new} new profiles, {len(self.cards)} companies so far")
+
+    def _discover(self, writer, fetcher, seed):
+        html = fetcher.fetch(seed, 'li.provider-list-item')
+        pages = min(last_page_number(html), MAX_PAGES - 1) + 1
+        urls = listing_page_urls(seed, pages)
+        with self._lock:
+            self.state.add(urls, 'listing', seed)
+            for url in urls:
+                self._seed_of[url] = seed
+        print(f"  - {seed}: {pages} listing pages.")
+        with METRICS.timer('parse', url=seed):
+            cards = parse_listing_page(html, seed)
+        self._save_page(writer, seed, seed, cards)
+
+    def crawl_listings(self):
+        """Returns the cards of every seed by profile_url."""
+        state = self.state
+        pending = done = 0
+        for seed in self.seeds:
+            pending += len(state.pending('listing', seed))
+            done += state.counts('listing', seed).get('done', 0)
+        fresh_pass = not (pending and done)
+        if fresh_pass:
+            # Page counts change between passes; they are rediscovered.
+            for seed in self.seeds:
+                state.forget('listing', seed)
+        else:
+            self.cards = load_cards()
+        undiscovered = [seed for seed in self.seeds if not state.counts('listing', seed)]
+
+        with JsonlWriter(LISTING_OUTPUT_FILE, truncate=fresh_pass) as writer:
+            if undiscovered:
+                print(f"Discovering the page counts of {len(undiscovered)} directories...")
+                run_pool(undiscovered, lambda fetcher, seed: self._discover(writer, fetcher, seed),
+                         self.workers, self.make_fetcher, state)
+            pages = []
+            for seed in self.seeds:
+                for url in state.pending('listing', seed):
+                    self._seed_of[url] = seed
+                    pages.append(url)
+            print(f"Crawling {len(pages)} listing pages of {len(self.seeds)} directories "
+                  f"with {self.workers} workers...")
+            run_pool(pages, lambda fetcher, url: self._save_page(
+                writer, self._seed_of[url], url, fetch_cards(fetcher, url)),
+                self.workers, self.make_fetcher, state)
+        print(f"Listings done: {self.sightings} cards seen this run, {len(self.cards)} unique companies.")
+        return self.cards
+
+    def crawl_profiles(self, max_age=MAX_PROFILE_AGE, card_filter=None, fields=PROFILE_FIELDS):
+        planned = plan_profiles(self.cards, self.state, self.store, max_age, card_filter)
+        saved = [0]
+
+        with JsonlWriter(COMBINED_OUTPUT_FILE, on_flush=mark_saved(self.state)) as writer:
+            def crawl_profile(fetcher, url):
+                profile = fetch_company_profile(fetcher, url, fields)
+                card = self.cards[url]
+                with self._lock:
+                    self.store.record_profile(profile, card)
+                    writer.write(join_record(card, profile))
+                    saved[0] += 1
+                    print(f"  --> Saved {card.get('name')} ({saved[0]}/{len(planned)})")
+                    if saved[0] % CHECKPOINT_EVERY == 0:
+                        # Fingerprints must never get ahead of the records on disk.
+                        writer.checkpoint()
+                        self.store.save()
+
+            run_pool(planned, crawl_profile, self.workers, self.make_fetcher, self.state)
+        self.store.save()
+        print(f"Saved {saved[0]} of {len(planned)} planned profiles to {COMBINED_OUTPUT_FILE}; "
+              f"failures are listed in {DEAD_LETTER_FILE}.")
+        return saved[0]
+
+    def close(self):
+        self.state.close()
+
+
+def read_seeds(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl several clutch.co directories with one worker budget, fetching each profile once.")
+    parser.add_argument('--seed', action='append', default=[],
+                        help=f"directory listing to crawl; repeatable (default {START_URL})")
+    parser.add_argument('--seeds-file', help="file with one directory URL per line (# comments allowed)")
+    parser.add_argument('--engine', choices=['selenium', 'selenium-js', 'http', 'http-only'], default=FETCH_ENGINE,
+                        help="page fetch backend; 'selenium-js' extracts inside the browser instead of "
+                             "transferring page_source, 'http' falls back to the browser per URL when needed")
+    parser.add_argument('--workers', type=int, default=GLOBAL_CONCURRENCY,
+                        help="page loads in flight across all seeds together")
+    parser.add_argument('--cache', action='store_true',
+                        help="keep raw HTML snapshots in the page cache and serve fresh ones from it")
+    parser.add_argument('--listings-only', action='store_true', help="stop after the listing pages")
+    parser.add_argument('--max-age-days', type=float, default=MAX_PROFILE_AGE / 86400,
+                        help="refetch a profile after this many days even if its card is unchanged")
+    parser.add_argument('--card-filter', action='append', default=[], metavar='FIELD=TEXT',
+                        help="only fetch profiles whose card field contains TEXT, e.g. location=Bengaluru; repeatable")
+    parser.add_argument('--fields', type=lambda s: tuple(s.split(',')), default=PROFILE_FIELDS,
+                        help=f"profile fields to extract (default {','.join(PROFILE_FIELDS)})")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve live Prometheus-style metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-log', help="append per-page JSON timing events to this file")
+    args = parser.parse_args()
+    METRICS.configure(args.metrics_log, args.metrics_port)
+    seeds = args.seed + (read_seeds(args.seeds_file) if args.seeds_file else [])
+    try:
+        PROFILE_SCHEMA.check_fields(args.fields)
+        card_filter = parse_card_filter(args.card_filter) if args.card_filter else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    crawl = DirectoryCrawl(seeds or [START_URL], args.engine, args.workers, PageCache() if args.cache else None)
+    try:
+        crawl.crawl_listings()
+        if not args.listings_only:
+            crawl.crawl_profiles(args.max_age_days * 86400, card_filter, args.fields)
+    finally:
+        crawl.close()
+    print(f"Metrics: {json.dumps(METRICS.snapshot())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+import time
+import sqlite3
+import threading
+
+# --- Configuration ---
+STATE_DB = 'crawl_state.sqlite3'
+MAX_RETRIES = 3   # failed URLs are retried until they have failed this many times
+
+PENDING, DONE, FAILED, DEAD = 'pending', 'done', 'failed', 'dead'
+
+
+class CrawlState:
+    """
+    Persistent per-URL crawl status shared by the listing and profile phases.
+
+    Every URL is stored once with its kind ('listing' or 'profile'), the
+    directory seed it was found under (e.g. https://clutch.co/it-services/india),
+    its status (pending / done / failed / dead), retry count, last fetch time and
+    last error. The database runs in WAL mode, so several worker processes
+    can read while one writes, and a restart only needs an indexed query
+    instead of a rescan of the output files.
+    """
+
+    def __init__(self, path=STATE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                seed TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                retries INTEGER NOT NULL DEFAULT 0,
+                last_fetched REAL,
+                last_error TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS urls_kind_status ON urls (kind, status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS urls_seed ON urls (seed, kind)")
+        self._db.commit()
+
+    def add(self, urls, kind, seed=None):
+        """Registers URLs as pending; already known URLs are left untouched. Returns how many were new."""
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO urls (url, kind, seed) VALUES (?, ?, ?)",
+                ((url, kind, seed) for url in urls),
+            )
+            self._db.commit()
+            return self._db.total_changes - before
+
+    def status(self, url):
+        with self._lock:
+            row = self._db.execute("SELECT status FROM urls WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def is_done(self, url):
+        return self.status(url) == DONE
+
+    def urls(self, kind, seed=None):
+        """All URLs of a kind (optionally for one seed) in discovery order."""
+        query = "SELECT url FROM urls WHERE kind = ?"
+        params = [kind]
+        if seed is not None:
+            query += " AND seed = ?"
+            params.append(seed)
+        with self._lock:
+            return [row[0] for row in self._db.execute(query + " ORDER BY rowid", params)]
+
+    def pending(self, kind, seed=None, max_retries=MAX_RETRIES):
+        """URLs still to fetch: pending ones plus failed ones with retries left."""
+        query = ("SELECT url FROM urls WHERE kind = ? AND "
+                 "(status = 'pending' OR (status = 'failed' AND retries < ?))")
+        params = [kind, max_retries]
+        if seed is not None:
+            query += " AND seed = ?"
+            params.append(seed)
+        with self._lock:
+            return [row[0] for row in self._db.execute(query + " ORDER BY rowid", params)]
+
+    def mark_done(self, url, kind='profile'):
+        self.mark_done_many([url], kind)
+
+    def mark_done_many(self, urls, kind='profile'):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO urls (url, kind, status, last_fetched) VALUES (?, ?, 'done', ?) "
+                "ON CONFLICT(url) DO UPDATE SET status = 'done', last_fetched = excluded.last_fetched, "
+                "last_error = NULL",
+                ((url, kind, now) for url in urls),
+            )
+            self._db.commit()
+
+    def mark_failed(self, url, error=None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE urls SET status = 'failed', retries = retries + 1, last_fetched = ?, last_error = ? "
+                "WHERE url = ?",
+                (time.time(), str(error) if error else None, url),
+            )
+            self._db.commit()
+
+    def mark_dead(self, url, error=None):
+        """Takes a URL out of pending() for good; requeue_dead() or reset() brings it back."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE urls SET status = 'dead', retries = retries + 1, last_fetched = ?, last_error = ? "
+                "WHERE url = ?",
+                (time.time(), str(error) if error else None, url),
+            )
+            self._db.commit()
+
+    def dead_letters(self, kind=None):
+        """(url, kind, last_error) of every dead-lettered URL, oldest first."""
+        query = "SELECT url, kind, last_error FROM urls WHERE status = 'dead'"
+        params = []
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            return self._db.execute(query + " ORDER BY last_fetched", params).fetchall()
+
+    def requeue_dead(self, kind=None):
+        """Marks dead-lettered URLs pending again. Returns how many there were."""
+        query = "UPDATE urls SET status = 'pending', retries = 0 WHERE status = 'dead'"
+        params = []
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            changed = self._db.execute(query, params).rowcount
+            self._db.commit()
+        return changed
+
+    def reset(self, kind, seed=None):
+        """Marks every URL of a kind (optionally for one seed) pending again, to start a fresh pass."""
+        query = "UPDATE urls SET status = 'pending', retries = 0, last_error = NULL WHERE kind = ?"
+        params = [kind]
+        if seed is not None:
+            query += " AND seed = ?"
+            params.append(seed)
+        with self._lock:
+            self._db.execute(query, params)
+            self._db.commit()
+
+    def forget(self, kind, seed=None):
+        """Drops every URL of a kind (optionally for one seed), e.g. listing pages before their count is rediscovered."""
+        query = "DELETE FROM urls WHERE kind = ?"
+        params = [kind]
+        if seed is not None:
+            query += " AND seed = ?"
+            params.append(seed)
+        with self._lock:
+            self._db.execute(query, params)
+            self._db.commit()
+
+    def counts(self, kind, seed=None):
+        query = "SELECT status, COUNT(*) FROM urls WHERE kind = ?"
+        params = [kind]
+        if seed is not None:
+            query += " AND seed = ?"
+            params.append(seed)
+        with self._lock:
+            return dict(self._db.execute(query + " GROUP BY status", params).fetchall())
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,10 +1,69 @@
+import os
 import json
+import heapq
+import shutil
+import argparse
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse, parse_qs, urlunparse
+
+from block_jsonl import is_block_file, iter_lines, open_lines_output, BlockReader
 
 # --- Configuration ---
 # The name of the file generated by your scraper
 INPUT_FILE = 'clutch_listings_data_raw.jsonl'
 # The name of the new file where the clean, unique data will be saved
 OUTPUT_FILE = 'clutch_listings_data_unique.jsonl'
+# Input bytes handled per partition in the external (on-disk) mode; this
+# bounds memory use no matter how large the input grows
+PARTITION_BYTES = 256 * 1024 * 1024
+
+MISSING_VALUES = (None, 'N/A', '', [], {})
+
+
+def normalize_url(url):
+    """
+    Canonical form of a profile URL used as the de-duplication key: redirect
+    wrappers (r.clutch.co/redirect?...&u=...) are unwrapped, the scheme and
+    host are lower-cased, and query string, fragment and trailing slash are
+    dropped.
+    """
+    if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+        return url
+    parsed = urlparse(url.strip())
+    query = parse_qs(parsed.query)
+    target = query.get('u', [None])[0] or query.get('provider_website', [None])[0]
+    if target and target != url:
+        return normalize_url(target)
+    path = parsed.path.rstrip('/') or '/'
+    return urlunparse((parsed.scheme.lower(), parsed.netloc.lower(), path, '', '', ''))
+
+
+# --- Merge policies: (kept_record, new_record) -> record to keep ---
+
+def keep_first(kept, new):
+    return kept
+
+
+def keep_latest(kept, new):
+    return new
+
+
+def merge_fields(kept, new):
+    """Field-wise merge: a later value wins unless it is missing ('N/A', empty)."""
+    merged = dict(kept)
+    for field, value in new.items():
+        if value not in MISSING_VALUES or field not in merged:
+            merged[field] = value
+    return merged
+
+
+MERGE_POLICIES = {
+    'first': keep_first,
+    'latest': keep_latest,
+    'merge': merge_fields,
+}
 
 def deduplicate_jsonl(input_path, output_path):
     """
@@ -19,15 +78,17 @@ def deduplicate_jsonl(input_path, output_path):
     print(f"Starting de-duplication process for '{input_path}'...")
 
     try:
-        with open(input_path, 'r', encoding='utf-8') as infile, open(output_path, 'w', encoding='utf-8') as outfile:
-            for line in infile:
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(input_path)
+        with open_lines_output(output_path) as outfile:
+            for line in iter_lines(input_path):
                 total_lines_read += 1
                 try:
                     # Convert the JSON string from the line into a Python dictionary
                     company_data = json.loads(line)
                     
-                    # Get the profile_url to use as the unique identifier
-                    profile_url = company_data.get('profile_url')
+                    # Get the normalised profile_url to use as the unique identifier
+                    profile_url = normalize_url(company_data.get('profile_url'))
 
                     # If the URL is valid and we haven't seen it before, save it
                     if profile_url and profile_url not in seen_profile_urls:
@@ -51,5 +112,168 @@ def deduplicate_jsonl(input_path, output_path):
         print(f"Error: The input file '{input_path}' was not found.")
         print("Please make sure the raw data file is in the same directory as this script.")
 
+def _partition_input(input_path, tmp_dir, partitions):
+    """
+    Pass 1: streams the input once and appends every record to the partition
+    chosen by a hash of its key, tagged with its input position.
+    """
+    files = [open(os.path.join(tmp_dir, f'part-{i}.jsonl'), 'w', encoding='utf-8') for i in range(partitions)]
+    total_lines_read = 0
+    try:
+        for seq, line in enumerate(iter_lines(input_path)):
+            total_lines_read += 1
+            try:
+                key = normalize_url(json.loads(line).get('profile_url'))
+            except json.JSONDecodeError:
+                print(f"Warning: Could not decode line {total_lines_read}. Skipping: {line.strip()}")
+                continue
+            if not key:
+                continue
+            part = zlib.crc32(key.encode('utf-8')) % partitions
+            files[part].write(f"{seq}\t{key}\t{line.rstrip(chr(10))}\n")
+    finally:
+        for f in files:
+            f.close()
+    return total_lines_read, [f.name for f in files]
+
+
+def _dedupe_partition(args):
+    """
+    Pass 2 (one partition, may run in a worker process): resolves duplicates
+    in memory and writes the survivors sorted by the input position of their
+    first occurrence, so the partitions can be merged back in input order.
+    """
+    part_path, policy = args
+    merge = MERGE_POLICIES[policy]
+    kept = {}
+    with open(part_path, 'r', encoding='utf-8') as f:
+        for row in f:
+            seq, key, line = row.rstrip('\n').split('\t', 2)
+            if key not in kept:
+                kept[key] = (int(seq), line, None)
+            elif policy != 'first':
+                first_seq, kept_line, kept_record = kept[key]
+                if kept_record is None:
+                    kept_record = json.loads(kept_line)
+                kept[key] = (first_seq, None, merge(kept_record, json.loads(line)))
+    out_path = part_path + '.out'
+    with open(out_path, 'w', encoding='utf-8') as f:
+        for seq, line, record in sorted(kept.values(), key=lambda entry: entry[0]):
+            if record is not None:
+                line = json.dumps(record, ensure_ascii=False)
+            f.write(f"{seq}\t{line}\n")
+    os.remove(part_path)
+    return out_path, len(kept)
+
+
+def _read_sorted(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in f:
+            seq, line = row.split('\t', 1)
+            yield int(seq), line
+
+
+def deduplicate_jsonl_external(input_path, output_path, policy='first', partitions=None, workers=1):
+    """
+    De-duplicates arbitrarily large JSONL files with bounded memory.
+
+    Records are hash-partitioned on their normalised profile_url into
+    temporary files (pass 1), each partition is de-duplicated on its own with
+    the chosen merge policy, optionally in parallel (pass 2), and the sorted
+    partition outputs are streamed back together in original input order
+    (pass 3). Peak memory is roughly one partition, i.e. PARTITION_BYTES.
+    """
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy '{policy}', expected one of {sorted(MERGE_POLICIES)}")
+    try:
+        input_size = os.path.getsize(input_path)
+    except FileNotFoundError:
+        print(f"Error: The input file '{input_path}' was not found.")
+        return
+    if partitions is None:
+        partitions = max(1, -(-input_size // PARTITION_BYTES))
+
+    print(f"Starting external de-duplication of '{input_path}' "
+          f"({partitions} partitions, policy '{policy}', {workers} workers)...")
+    tmp_dir = tempfile.mkdtemp(prefix='dedup-', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        total_lines_read, part_paths = _partition_input(input_path, tmp_dir, partitions)
+        jobs = [(path, policy) for path in part_paths]
+        if workers > 1:
+            with ProcessPoolExecutor(workers) as pool:
+                results = list(pool.map(_dedupe_partition, jobs))
+        else:
+            results = [_dedupe_partition(job) for job in jobs]
+
+        unique_entries_count = sum(count for _, count in results)
+        with open_lines_output(output_path) as outfile:
+            streams = [_read_sorted(path) for path, _ in results]
+            for _, line in heapq.merge(*streams, key=lambda entry: entry[0]):
+                outfile.write(line)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print("\nDe-duplication complete!")
+    print(f"  - Total lines read: {total_lines_read}")
+    print(f"  - Unique companies found: {unique_entries_count}")
+    print(f"  - Clean data saved to: '{output_path}'")
+
+
+def deduplicate_indexed(input_path, output_path, policy='first'):
+    """
+    De-duplicates a block file from its profile_url index: the survivors are
+    chosen without decompressing anything, then only their blocks are read.
+    Output order is the input order of each key's first occurrence, as in
+    the other modes. Supports the 'first' and 'latest' policies.
+    """
+    if policy not in ('first', 'latest'):
+        raise ValueError(f"The indexed mode cannot apply the '{policy}' policy; use --external.")
+    if not os.path.exists(input_path):
+        print(f"Error: The input file '{input_path}' was not found.")
+        return
+    print(f"Starting indexed de-duplication of '{input_path}' (policy '{policy}')...")
+    with BlockReader(input_path) as reader:
+        positions = reader.index.positions()
+        survivors = {}
+        for profile_url, *position in positions:
+            key = normalize_url(profile_url)
+            if not key:
+                continue
+            if key not in survivors or policy == 'latest':
+                survivors[key] = position
+        # dict order is first-occurrence order, and a 'latest' survivor keeps its key's slot.
+        with open_lines_output(output_path) as outfile:
+            for position in survivors.values():
+                outfile.write(reader.line(*position))
+
+    print("\nDe-duplication complete!")
+    print(f"  - Total lines read: {len(positions)}")
+    print(f"  - Unique companies found: {len(survivors)}")
+    print(f"  - Clean data saved to: '{output_path}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="De-duplicate scraped JSONL files on profile_url.")
+    parser.add_argument('input', nargs='?', default=INPUT_FILE,
+                        help="plain JSONL, or an indexed block file (*.gz) which is de-duplicated from its index")
+    parser.add_argument('output', nargs='?', default=OUTPUT_FILE,
+                        help="written block-compressed, with an index, when it ends in .gz")
+    parser.add_argument('--policy', choices=sorted(MERGE_POLICIES), default='first',
+                        help="which record survives: the first, the latest, or a field-wise merge of non-'N/A' values")
+    parser.add_argument('--external', action='store_true',
+                        help="spill to disk through hash partitions so memory stays bounded")
+    parser.add_argument('--partitions', type=int,
+                        help="number of on-disk partitions (default: input size / PARTITION_BYTES)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="de-duplicate partitions in parallel processes")
+    args = parser.parse_args()
+
+    if is_block_file(args.input) and args.policy != 'merge' and not (args.external or args.partitions):
+        deduplicate_indexed(args.input, args.output, args.policy)
+    elif args.external or args.policy != 'first' or args.partitions:
+        deduplicate_jsonl_external(args.input, args.output, args.policy, args.partitions, args.workers)
+    else:
+        deduplicate_jsonl(args.input, args.output)
+
 if __name__ == '__main__':
-    deduplicate_jsonl(INPUT_FILE, OUTPUT_FILE)
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,394 @@
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+
+from fetchers import create_fetcher
+from throttle import PolitenessScheduler
+from page_cache import PageCache
+from jsonl_writer import JsonlWriter
+from extraction import PROFILE_SCHEMA
+from metrics import METRICS
+from retry import classify, backoff, RETRY_POLICIES, ERROR
+from scraper import (OUTPUT_FILE, FETCH_ENGINE, open_crawl_state, pending_profiles, mark_saved,
+                     fetch_company_profile)
+
+# --- Configuration ---
+QUEUE_DB = 'crawl_queue.sqlite3'   # the shared queue of the local backend
+BATCH_SIZE = 10   # profile URLs per lease
+LEASE_TTL = 300.0   # seconds a lease stays valid without a heartbeat
+HEARTBEAT_INTERVAL = 60.0   # seconds between lease renewals while a batch is worked on
+MAX_ATTEMPTS = 4   # cap on failed or expired leases per URL, whatever the per-kind retry budget
+POLL_INTERVAL = 5.0   # seconds between queue polls when there is nothing to do
+
+
+# A queue backend is anything with these calls, safe to use from several
+# processes on several machines at once:
+#   enqueue(urls)                          -> how many were new
+#   lease(worker, n, ttl)                  -> (lease_id, urls); no urls when none are free
+#   heartbeat(lease_id, ttl)               -> False once the lease was lost (expired and re-leased)
+#   complete(lease_id, records, failures)  -> stores the records, settles every URL of the lease;
+#                                             failures are (url, kind, error) tuples
+#   results(limit)                         -> [(result_id, record)] not yet merged
+#   ack(result_ids)                        -> marks results as merged into the canonical output
+#   counts()                               -> {status: count} over all URLs
+#   close()
+# SqliteQueue is the local implementation; a network queue only has to
+# implement the same calls and be registered in BACKENDS.
+
+
+class SqliteQueue:
+    """
+    Lease queue in one SQLite file. Every state change runs in a
+    BEGIN IMMEDIATE transaction, so SQLite's file lock serialises the
+    workers and the coordinator. This backend uses WAL, which needs memory
+    shared between the processes: it is for workers on one host. Workers on
+    several hosts use SharedSqliteQueue.
+
+    URLs are pending, leased (with an expiry), done, failed (leased again
+    once their backoff has passed) or dead. An expired lease counts as a
+    failed attempt, so a URL that keeps crashing its browser ends up dead
+    instead of looping.
+    """
+
+    JOURNAL_MODE = 'WAL'
+    SYNCHRONOUS = 'NORMAL'
+
+    def __init__(self, path=QUEUE_DB, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=60, isolation_level=None)
+        self._db.execute(f"PRAGMA journal_mode={self.JOURNAL_MODE}")
+        self._db.execute(f"PRAGMA synchronous={self.SYNCHRONOUS}")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS queue (
+                url TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_id TEXT,
+                lease_expires REAL,
+                worker TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                not_before REAL
+            )
+        """)
+        if 'not_before' not in {row[1] for row in self._db.execute("PRAGMA table_info(queue)")}:
+            self._db.execute("ALTER TABLE queue ADD COLUMN not_before REAL")   # queues created before backoff
+        self._db.execute("CREATE INDEX IF NOT EXISTS queue_status ON queue (status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS queue_lease ON queue (lease_id)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                worker TEXT,
+                record TEXT NOT NULL,
+                merged INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_merged ON results (merged)")
+
+    def _transaction(self, work):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def enqueue(self, urls):
+        def work(db):
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO queue (url) VALUES (?)", ((url,) for url in urls))
+            return db.total_changes - before
+        return self._transaction(work)
+
+    def _fail(self, db, url, attempts, kind, error, now, lease_id=None):
+        """
+        Settles one failed attempt: dead once it is past its kind's retries in
+        RETRY_POLICIES (as in RetryScheduler) or has used max_attempts leases,
+        else failed until its backoff has passed.
+        """
+        retries, base = RETRY_POLICIES.get(kind, RETRY_POLICIES[ERROR])
+        attempts += 1
+        dead = attempts > retries or attempts >= self.max_attempts
+        query = ("UPDATE queue SET status = ?, attempts = ?, lease_id = NULL, last_error = ?, not_before = ? "
+                 "WHERE url = ?")
+        params = ['dead' if dead else 'failed', attempts, error, now + backoff(attempts, base), url]
+        if lease_id is not None:
+            query += " AND lease_id = ?"
+            params.append(lease_id)
+        db.execute(query, params)
+
+    def _expire(self, db, now):
+        expired = db.execute("SELECT url, attempts FROM queue WHERE status = 'leased' AND lease_expires < ?",
+                             (now,)).fetchall()
+        for url, attempts in expired:
+            self._fail(db, url, attempts, ERROR, 'lease expired', now)
+
+    def lease(self, worker, n=BATCH_SIZE, ttl=LEASE_TTL):
+        lease_id = uuid.uuid4().hex
+
+        def work(db):
+            now = time.time()
+            self._expire(db, now)
+            urls = [row[0] for row in db.execute(
+                "SELECT url FROM queue WHERE status = 'pending' OR (status = 'failed' AND COALESCE(not_before, 0) <= ?) "
+                "ORDER BY attempts, rowid LIMIT ?", (now, n))]
+            db.executemany(
+                "UPDATE queue SET status = 'leased', lease_id = ?, lease_expires = ?, worker = ? WHERE url = ?",
+                ((lease_id, now + ttl, worker, url) for url in urls),
+            )
+            return urls
+        return lease_id, self._transaction(work)
+
+    def heartbeat(self, lease_id, ttl=LEASE_TTL):
+        def work(db):
+            now = time.time()
+            # An expired lease is not revived, even if nobody has taken its URLs yet.
+            return db.execute(
+                "UPDATE queue SET lease_expires = ? WHERE lease_id = ? AND status = 'leased' AND lease_expires >= ?",
+                (now + ttl, lease_id, now),
+            ).rowcount > 0
+        return self._transaction(work)
+
+    def complete(self, lease_id, records, failures=()):
+        def work(db):
+            worker = None
+            row = db.execute("SELECT worker FROM queue WHERE lease_id = ?", (lease_id,)).fetchone()
+            if row:
+                worker = row[0]
+            # Records are kept even from a lease that expired meanwhile; the merge drops duplicates.
+            db.executemany(
+                "INSERT INTO results (url, worker, record) VALUES (?, ?, ?)",
+                ((record['profile_url'], worker, json.dumps(record, ensure_ascii=False)) for record in records),
+            )
+            db.executemany(
+                "UPDATE queue SET status = 'done', lease_id = NULL, last_error = NULL WHERE url = ?",
+                ((record['profile_url'],) for record in records),
+            )
+            now = time.time()
+            for url, kind, error in failures:
+                row = db.execute("SELECT attempts FROM queue WHERE url = ? AND lease_id = ?", (url, lease_id)).fetchone()
+                if row:
+                    self._fail(db, url, row[0], kind, f"{kind}: {error}", now, lease_id)
+            # Anything the worker did not get to goes back to the queue as is.
+            db.execute("UPDATE queue SET status = 'pending', lease_id = NULL WHERE lease_id = ? AND status = 'leased'",
+                       (lease_id,))
+        self._transaction(work)
+
+    def results(self, limit=500):
+        with self._lock:
+            rows = self._db.execute("SELECT id, record FROM results WHERE merged = 0 ORDER BY id LIMIT ?",
+                                    (limit,)).fetchall()
+        return [(result_id, json.loads(record)) for result_id, record in rows]
+
+    def ack(self, result_ids):
+        def work(db):
+            db.executemany("UPDATE results SET merged = 1 WHERE id = ?", ((i,) for i in result_ids))
+        self._transaction(work)
+
+    def counts(self):
+        def work(db):
+            self._expire(db, time.time())
+            return dict(db.execute("SELECT status, COUNT(*) FROM queue GROUP BY status").fetchall())
+        return self._transaction(work)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class SharedSqliteQueue(SqliteQueue):
+    """
+    SqliteQueue for a file that workers on several hosts open over a network
+    filesystem with working POSIX locks. A rollback journal replaces WAL,
+    whose shared-memory index only works between processes on one host.
+    """
+
+    JOURNAL_MODE = 'DELETE'
+    SYNCHRONOUS = 'FULL'
+
+
+BACKENDS = {'sqlite': SqliteQueue, 'sqlite-shared': SharedSqliteQueue}
+
+
+def open_queue(spec=QUEUE_DB):
+    """
+    `backend:location` (e.g. sqlite-shared:/mnt/shared/crawl_queue.sqlite3
+    for workers on several hosts) or a bare path for the one-host SQLite backend.
+    """
+    backend, sep, location = spec.partition(':')
+    if sep and backend in BACKENDS:
+        return BACKENDS[backend](location)
+    if '://' in spec:
+        raise ValueError(f"Unknown queue backend: {backend}")
+    return SqliteQueue(spec)
+
+
+class Heartbeat:
+    """Renews a lease every `interval` seconds in a daemon thread until stopped; `lost` is set if renewal fails."""
+
+    def __init__(self, queue, lease_id, interval=HEARTBEAT_INTERVAL, ttl=LEASE_TTL):
+        self.queue = queue
+        self.lease_id = lease_id
+        self.interval = interval
+        self.ttl = ttl
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                alive = self.queue.heartbeat(self.lease_id, self.ttl)
+            except sqlite3.Error as e:
+                print(f"    Heartbeat failed: {e}")
+                continue
+            if not alive:
+                self.lost.set()
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue, worker=None, engine=FETCH_ENGINE, batch_size=BATCH_SIZE, ttl=LEASE_TTL,
+               heartbeat=HEARTBEAT_INTERVAL, fields=None, cache=None, exit_when_idle=True):
+    """
+    Leases batches of profile URLs, scrapes each once and hands the records
+    and classified failures back to the queue. Retries happen by re-leasing,
+    possibly on another machine. Returns the number of records produced.
+    """
+    worker = worker or f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+    fetcher = create_fetcher(engine, scheduler=PolitenessScheduler(), cache=cache)
+    produced = 0
+    print(f"Worker {worker} started.")
+    try:
+        while True:
+            lease_id, urls = queue.lease(worker, batch_size, ttl)
+            if not urls:
+                counts = queue.counts()
+                if exit_when_idle and not counts.get('pending') and not counts.get('failed') and not counts.get('leased'):
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+            print(f"Worker {worker} leased {len(urls)} URLs.")
+            records, failures = [], []
+            with Heartbeat(queue, lease_id, heartbeat, ttl) as beat:
+                for url in urls:
+                    if beat.lost.is_set():
+                        print(f"    Lease {lease_id} lost, returning {len(records)} records early.")
+                        break
+                    try:
+                        records.append(fetch_company_profile(fetcher, url, fields))
+                    except Exception as e:
+                        kind = classify(e)
+                        METRICS.incr(f'failures_{kind}')
+                        print(f"  - {kind} on {url}: {e}")
+                        failures.append((url, kind, str(e)))
+            queue.complete(lease_id, records, failures)
+            produced += len(records)
+    finally:
+        fetcher.close()
+    print(f"Worker {worker} finished. Produced {produced} records.")
+    return produced
+
+
+def run_coordinator(queue, output_file=OUTPUT_FILE, exit_when_done=True):
+    """
+    Queues every profile the crawl state still lacks (profile_urls.json is
+    imported on first use) and merges the workers' records into the
+    canonical OUTPUT_FILE, one copy per profile_url, until the queue is
+    drained. Safe to restart: merged results are acked only after they are
+    on disk, and profiles already done are skipped.
+    """
+    state = open_crawl_state()
+    pending = pending_profiles(state, state.urls('profile'))
+    print(f"Queued {queue.enqueue(pending)} new of {len(pending)} pending profiles.")
+
+    merged = 0
+    with JsonlWriter(output_file, on_flush=mark_saved(state)) as writer:
+        while True:
+            batch = queue.results()
+            if batch:
+                fresh, seen = [], set()
+                for _, record in batch:
+                    url = record['profile_url']
+                    if url not in seen and not state.is_done(url):
+                        seen.add(url)
+                        fresh.append(record)
+                writer.write_many(fresh)
+                writer.flush()
+                queue.ack([result_id for result_id, _ in batch])
+                merged += len(fresh)
+                print(f"  --> Merged {len(fresh)} records ({merged} this run). Queue: {queue.counts()}")
+                continue
+            counts = queue.counts()
+            if exit_when_done and not counts.get('pending') and not counts.get('failed') and not counts.get('leased'):
+                break
+            time.sleep(POLL_INTERVAL)
+    state.close()
+    print(f"Coordinator done. Merged {merged} new profiles into {output_file}. Final queue: {queue.counts()}")
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed profile scraping: one coordinator, many workers.")
+    parser.add_argument('role', choices=['coordinator', 'worker', 'status'])
+    parser.add_argument('--queue', default=QUEUE_DB,
+                        help=f"queue backend: sqlite:PATH for workers on one host, sqlite-shared:PATH for a file "
+                             f"several hosts share over a network filesystem (default {QUEUE_DB})")
+    parser.add_argument('--engine', choices=['selenium', 'selenium-js', 'http', 'http-only'], default=FETCH_ENGINE,
+                        help="page fetch backend of a worker")
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help="profile URLs per lease")
+    parser.add_argument('--lease-ttl', type=float, default=LEASE_TTL,
+                        help="seconds before an unrenewed lease is handed to another worker")
+    parser.add_argument('--worker-id', help="name recorded with the worker's leases (default host-random)")
+    parser.add_argument('--cache', action='store_true',
+                        help="keep raw HTML snapshots in the worker's page cache")
+    parser.add_argument('--fields', type=lambda s: tuple(s.split(',')),
+                        help="comma-separated profile fields the workers extract (default all)")
+    parser.add_argument('--keep-running', action='store_true',
+                        help="keep polling when the queue is empty instead of exiting")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve live Prometheus-style metrics on 127.0.0.1:PORT/metrics")
+    args = parser.parse_args()
+    METRICS.configure(port=args.metrics_port)
+    if args.fields:
+        try:
+            PROFILE_SCHEMA.check_fields(args.fields)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        queue = open_queue(args.queue)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        if args.role == 'coordinator':
+            run_coordinator(queue, exit_when_done=not args.keep_running)
+        elif args.role == 'worker':
+            run_worker(queue, args.worker_id, args.engine, args.batch, args.lease_ttl,
+                       min(HEARTBEAT_INTERVAL, args.lease_ttl / 3), args.fields,
+                       PageCache() if args.cache else None, exit_when_idle=not args.keep_running)
+            print(f"Metrics: {json.dumps(METRICS.snapshot())}")
+        else:
+            print(json.dumps(queue.counts()))
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    main()
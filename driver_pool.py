@@ -0,0 +1,211 @@
+import os
+import queue
+import threading
+
+try:
+    import psutil
+except ImportError:   # falls back to /proc, or no memory checks off Linux
+    psutil = None
+
+from metrics import METRICS
+
+# --- Configuration ---
+RECYCLE_PAGES = 400   # page loads before a browser is replaced
+RECYCLE_RSS_MB = 1500   # resident memory of the whole Chrome process tree before it is replaced
+RSS_CHECK_EVERY = 25   # page loads between memory checks
+WARM_SPARES = 1   # browsers kept started and idle so a swap never waits for Chrome startup
+
+
+def _proc_children():
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # The command name may contain spaces; ppid is the 2nd field after it.
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _proc_rss(pid):
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def process_tree_rss(pid):
+    """Resident bytes of `pid` and all its descendants, or None when it cannot be measured."""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            return sum(p.memory_info().rss for p in [root] + root.children(recursive=True))
+        except psutil.Error:
+            return None
+    if not os.path.isdir('/proc'):
+        return None
+    children = _proc_children()
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += _proc_rss(current)
+        stack.extend(children.get(current, ()))
+    return total
+
+
+def driver_pid(driver):
+    # undetected_chromedriver knows the browser's pid; plain Selenium only the chromedriver's,
+    # whose process tree includes the browser.
+    pid = getattr(driver, 'browser_pid', None)
+    if pid is None:
+        service = getattr(driver, 'service', None)
+        process = getattr(service, 'process', None)
+        pid = getattr(process, 'pid', None)
+    return pid
+
+
+def is_healthy(driver):
+    try:
+        driver.execute_script("return document.readyState;")
+        return True
+    except Exception:
+        return False
+
+
+def quit_quietly(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+class DriverPool:
+    """
+    Hands out browser sessions built by `factory` (normally the stealth
+    create_driver) and keeps `warm` more started in the background, so
+    replacing a recycled or crashed browser costs no wall time. Drivers
+    given back in good health are reused by the next lease; worn-out ones
+    are quit off the calling thread.
+    """
+
+    def __init__(self, factory, warm=WARM_SPARES, max_pages=RECYCLE_PAGES, max_rss_mb=RECYCLE_RSS_MB):
+        self.factory = factory
+        self.warm = warm
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._spares = queue.Queue()
+        self._lock = threading.Lock()
+        self._warming = 0
+        self._closed = False
+
+    def _refill(self):
+        with self._lock:
+            missing = self.warm - self._spares.qsize() - self._warming
+            if self._closed or missing <= 0:
+                return
+            self._warming += missing
+        for _ in range(missing):
+            threading.Thread(target=self._start_spare, daemon=True).start()
+
+    def _start_spare(self):
+        try:
+            driver = self.factory()
+        except Exception as e:
+            print(f"  - Could not pre-warm a browser: {e}")
+            driver = None
+        with self._lock:
+            self._warming -= 1
+            closed = self._closed
+        if driver is not None:
+            if closed:
+                quit_quietly(driver)
+            else:
+                self._spares.put((driver, 0))
+
+    def take(self):
+        """
+        A ready driver and the page loads it has already served: an idle
+        one if there is any, else a freshly started one.
+        """
+        try:
+            driver, pages = self._spares.get_nowait()
+        except queue.Empty:
+            driver, pages = None, 0
+        if driver is not None and not is_healthy(driver):
+            self.retire(driver)
+            driver, pages = None, 0
+        if driver is None:
+            driver = self.factory()
+        self._refill()
+        return driver, pages
+
+    def give_back(self, driver, pages=0):
+        if self._closed or pages >= self.max_pages or not is_healthy(driver):
+            self.retire(driver)
+        else:
+            self._spares.put((driver, pages))
+
+    def retire(self, driver):
+        threading.Thread(target=quit_quietly, args=(driver,), daemon=True).start()
+
+    def lease(self):
+        return DriverLease(self)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                driver, _ = self._spares.get_nowait()
+            except queue.Empty:
+                break
+            quit_quietly(driver)
+
+
+class DriverLease:
+    """
+    One fetcher's use of the pool. The current driver is swapped for a warm
+    spare after max_pages loads, when the browser's memory passes
+    max_rss_mb, or when it stops answering after a failed load.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._driver = None
+        self.pages = 0
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver, self.pages = self.pool.take()
+        return self._driver
+
+    def page_done(self, ok=True):
+        if self._driver is None:
+            return
+        self.pages += 1
+        reason = None
+        if not ok and not is_healthy(self._driver):
+            reason = 'unhealthy'
+        elif self.pages >= self.pool.max_pages:
+            reason = f'{self.pages} pages'
+        elif self.pages % RSS_CHECK_EVERY == 0:
+            pid = driver_pid(self._driver)
+            rss = process_tree_rss(pid) if pid else None
+            if rss is not None and rss > self.pool.max_rss_mb * 1024 ** 2:
+                reason = f'{rss // 1024 ** 2} MB RSS'
+        if reason:
+            print(f"    Recycling browser ({reason}).")
+            METRICS.incr('browser_recycles')
+            self.pool.retire(self._driver)
+            self._driver = None
+
+    def release(self):
+        if self._driver is not None:
+            self.pool.give_back(self._driver, self.pages)
+            self._driver = None
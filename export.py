@@ -0,0 +1,245 @@
+import os
+import re
+import argparse
+from datetime import date, datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # only the export needs it
+    pa = pq = None
+
+from extraction import unwrap_website
+from block_jsonl import latest_records
+from deduplicate import OUTPUT_FILE as LISTING_FILE
+from scraper import OUTPUT_FILE as PROFILE_FILE
+
+# --- Configuration ---
+EXPORT_DIR = 'export'   # <EXPORT_DIR>/<dataset>/crawl_date=YYYY-MM-DD/part-0.parquet
+BATCH_ROWS = 10000   # records converted and written per row group
+MISSING_TEXT = ('N/A', 'Undisclosed', '')
+
+_NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+_REVIEWS = re.compile(r'based on\s+([\d,]+)\s+reviews?', re.IGNORECASE)
+
+
+# --- Value normalisation ---
+
+def text_or_none(value):
+    return None if value is None or value in MISSING_TEXT else value
+
+
+def _number(text):
+    value = float(text.replace(',', ''))
+    return int(value) if value.is_integer() else value
+
+
+def parse_range(text):
+    """
+    "$25 - $49 / hr" -> (25, 49), "< $25 / hr" -> (0, 25), "$10,000+" ->
+    (10000, None), "50 - 249" -> (50, 249), "Freelancer" -> (1, 1).
+    Missing or unrecognised values -> (None, None).
+    """
+    text = text_or_none(text)
+    if text is None:
+        return None, None
+    if text.strip().lower() == 'freelancer':
+        return 1, 1
+    text = _REVIEWS.sub('', text)
+    numbers = [_number(n) for n in _NUMBER.findall(text)]
+    if not numbers:
+        return None, None
+    if text.lstrip().startswith('<'):
+        return 0, numbers[0]
+    if len(numbers) == 1:
+        return (numbers[0], None) if '+' in text else (numbers[0], numbers[0])
+    return numbers[0], numbers[1]
+
+
+def parse_reviews(text):
+    match = _REVIEWS.search(text or '')
+    return int(match.group(1).replace(',', '')) if match else None
+
+
+def parse_share(text):
+    """"Software Development: 40.0%" -> {'name': 'Software Development', 'percent': 40.0}."""
+    name, sep, percent = text.rpartition(': ')
+    if not sep or not percent.endswith('%'):
+        return {'name': text, 'percent': None}
+    try:
+        return {'name': name, 'percent': float(percent[:-1])}
+    except ValueError:
+        return {'name': text, 'percent': None}
+
+
+# --- Arrow schemas ---
+
+def _share_type():
+    return pa.list_(pa.struct([('name', pa.string()), ('percent', pa.float32())]))
+
+
+def listing_schema():
+    return pa.schema([
+        ('profile_url', pa.string()),
+        ('name', pa.string()),
+        ('tagline', pa.string()),
+        ('description', pa.string()),
+        ('location', pa.string()),
+        ('website', pa.string()),
+        ('hourly_rate_min', pa.int32()),
+        ('hourly_rate_max', pa.int32()),
+        ('min_project_size', pa.int64()),
+        ('team_size_min', pa.int32()),
+        ('team_size_max', pa.int32()),
+    ])
+
+
+def profile_schema():
+    return pa.schema([
+        ('profile_url', pa.string()),
+        ('name', pa.string()),
+        ('summary_description', pa.string()),
+        ('website', pa.string()),
+        ('summary_details', pa.map_(pa.string(), pa.string())),
+        ('languages', pa.list_(pa.string())),
+        ('locations', pa.list_(pa.string())),
+        ('service_lines', _share_type()),
+        ('focus_breakdown', pa.list_(pa.struct([('category', pa.string()), ('slices', _share_type())]))),
+        ('industries_focus', _share_type()),
+        ('client_focus', _share_type()),
+        ('common_project_size_min', pa.int64()),
+        ('common_project_size_max', pa.int64()),
+        ('common_project_size_reviews', pa.int32()),
+        ('client_feedback_summary', pa.string()),
+    ])
+
+
+# --- Record -> row ---
+
+def listing_row(card):
+    rate_min, rate_max = parse_range(card.get('hourly_rate'))
+    team_min, team_max = parse_range(card.get('team_size'))
+    website = text_or_none(card.get('website'))
+    return {
+        'profile_url': card.get('profile_url'),
+        'name': text_or_none(card.get('name')),
+        'tagline': text_or_none(card.get('tagline')),
+        'description': text_or_none(card.get('description')),
+        'location': text_or_none(card.get('location')),
+        'website': unwrap_website(website) if website else None,
+        'hourly_rate_min': rate_min,
+        'hourly_rate_max': rate_max,
+        'min_project_size': parse_range(card.get('min_project_size'))[0],
+        'team_size_min': team_min,
+        'team_size_max': team_max,
+    }
+
+
+def profile_row(record):
+    pricing = record.get('pricing_snapshot') or {}
+    size = pricing.get('most_common_project_size')
+    size_min, size_max = parse_range(size)
+    return {
+        'profile_url': record.get('profile_url'),
+        'name': text_or_none(record.get('name')),
+        'summary_description': text_or_none(record.get('summary_description')),
+        'website': text_or_none(record.get('website')),
+        'summary_details': list((record.get('summary_details') or {}).items()),
+        'languages': record.get('languages') or [],
+        'locations': record.get('locations') or [],
+        'service_lines': [parse_share(s) for s in record.get('service_lines') or []],
+        'focus_breakdown': [
+            {'category': category, 'slices': [parse_share(s) for s in slices]}
+            for chart in record.get('focus_breakdown') or []
+            for category, slices in chart.items()
+        ],
+        'industries_focus': [parse_share(s) for s in record.get('industries_focus') or []],
+        'client_focus': [parse_share(s) for s in record.get('client_focus') or []],
+        'common_project_size_min': size_min,
+        'common_project_size_max': size_max,
+        'common_project_size_reviews': parse_reviews(size),
+        'client_feedback_summary': text_or_none(pricing.get('client_feedback_summary')),
+    }
+
+
+DATASETS = {
+    # name: (default input, row builder, schema)
+    'listings': (LISTING_FILE, listing_row, listing_schema),
+    'profiles': (PROFILE_FILE, profile_row, profile_schema),
+}
+
+
+# --- Export ---
+
+def crawl_date_of(path):
+    return date.fromtimestamp(os.path.getmtime(path))
+
+
+def export_dataset(name, input_path=None, export_dir=EXPORT_DIR, crawl_date=None, fmt='parquet',
+                   batch_rows=BATCH_ROWS):
+    """
+    Writes one dataset as a typed columnar file under
+    <export_dir>/<name>/crawl_date=<date>/ (hive-style partitioning, so
+    pyarrow.dataset, DuckDB, Spark or pandas read it as a crawl_date
+    column). Re-exporting the same date replaces that partition. Returns the
+    file path and row count.
+    """
+    if pa is None:
+        raise RuntimeError("The columnar export needs pyarrow (pip install pyarrow).")
+    default_input, build_row, make_schema = DATASETS[name]
+    input_path = input_path or default_input
+    crawl_date = crawl_date or crawl_date_of(input_path)
+    schema = make_schema()
+
+    partition_dir = os.path.join(export_dir, name, f"crawl_date={crawl_date.isoformat()}")
+    os.makedirs(partition_dir, exist_ok=True)
+    path = os.path.join(partition_dir, f"part-0.{'parquet' if fmt == 'parquet' else 'arrow'}")
+    tmp_path = path + '.tmp'
+
+    print(f"Exporting {input_path} -> {path}...")
+    rows = 0
+    batch = []
+    sink = pq.ParquetWriter(tmp_path, schema, compression='zstd') if fmt == 'parquet' \
+        else pa.ipc.new_file(tmp_path, schema)
+    try:
+        for record in latest_records(input_path):
+            batch.append(build_row(record))
+            if len(batch) >= batch_rows:
+                sink.write_table(pa.Table.from_pylist(batch, schema=schema))
+                rows += len(batch)
+                batch = []
+        if batch:
+            sink.write_table(pa.Table.from_pylist(batch, schema=schema))
+            rows += len(batch)
+    finally:
+        sink.close()
+    os.replace(tmp_path, path)
+    print(f"  - Wrote {rows} rows.")
+    return path, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the listing and profile JSONL files as typed Parquet/Arrow, partitioned by crawl date.")
+    parser.add_argument('datasets', nargs='*', metavar='DATASET',
+                        help=f"which files to export: {', '.join(sorted(DATASETS))} (default both)")
+    parser.add_argument('--listings', help=f"listing JSONL, plain or block-compressed, to export (default {LISTING_FILE})")
+    parser.add_argument('--profiles', help=f"profile JSONL, plain or block-compressed, to export (default {PROFILE_FILE})")
+    parser.add_argument('--out', default=EXPORT_DIR, help="export root directory")
+    parser.add_argument('--crawl-date', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        help="partition to write, YYYY-MM-DD (default: the input file's modification date)")
+    parser.add_argument('--format', choices=['parquet', 'arrow'], default='parquet')
+    args = parser.parse_args()
+    if pa is None:
+        parser.error("the columnar export needs pyarrow: pip install pyarrow")
+    for name in args.datasets:
+        if name not in DATASETS:
+            parser.error(f"unknown dataset {name!r}, expected one of {sorted(DATASETS)}")
+
+    inputs = {'listings': args.listings, 'profiles': args.profiles}
+    for name in args.datasets or sorted(DATASETS):
+        export_dataset(name, inputs[name], args.out, args.crawl_date, args.format)
+
+
+if __name__ == '__main__':
+    main()
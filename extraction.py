@@ -0,0 +1,400 @@
+import os
+import re
+import json
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+
+from lxml import etree
+
+# --- Configuration ---
+# Where the site lives; point it at standin_server.py for local load and regression runs
+CLUTCH_BASE_URL = os.environ.get('CLUTCH_BASE_URL', "https://clutch.co").rstrip('/')
+NA = 'N/A'
+
+# How a matched element is turned into text; each mirrors one of the
+# BeautifulSoup idioms the scrapers were written with.
+TEXT = 'text'     # tag.text.strip()
+STRIP = 'strip'   # tag.get_text(strip=True)
+LINES = 'lines'   # tag.get_text(separator="\n", strip=True)
+WORDS = 'words'   # " ".join(tag.get_text(strip=True).split())
+
+# Tags whose text BeautifulSoup leaves out of an ancestor's get_text().
+_SKIPPED_TEXT_TAGS = frozenset(('script', 'style', 'template'))
+
+_PARSER = etree.HTMLParser(recover=True, encoding='utf-8')
+
+
+def parse_html(html):
+    root = etree.fromstring(html.encode('utf-8'), _PARSER)
+    return root if root is not None else etree.Element('html')   # blank document
+
+
+# --- Text, with BeautifulSoup's get_text() rules ---
+
+def _strings(el):
+    if el.text:
+        yield el.text
+    for child in el:
+        if isinstance(child.tag, str) and child.tag not in _SKIPPED_TEXT_TAGS:
+            yield from _strings(child)
+        if child.tail:
+            yield child.tail
+
+
+def stripped_strings(el):
+    return (s for s in (s.strip() for s in _strings(el)) if s)
+
+
+def read_text(el, mode=TEXT):
+    if mode == TEXT:
+        return ''.join(_strings(el)).strip()
+    if mode == STRIP:
+        return ''.join(stripped_strings(el))
+    if mode == LINES:
+        return '\n'.join(stripped_strings(el))
+    if mode == WORDS:
+        return " ".join(''.join(stripped_strings(el)).split())
+    raise ValueError(f"unknown text mode: {mode!r}")
+
+
+# --- CSS selectors compiled to XPath ---
+
+_SELECTOR_SPLIT = re.compile(r",(?![^\[]*\])")
+_COMPOUNDS = re.compile(r"(?:[^\s\[]|\[[^\]]*\])+")
+_COMPOUND = re.compile(r"""([a-zA-Z][\w-]*|\*)?((?:[.#][\w-]+|\[[\w-]+(?:=(?:'[^']*'|"[^"]*"))?\])*)$""")
+_SIMPLE = re.compile(r"""([.#])([\w-]+)|\[([\w-]+)(?:=(?:'([^']*)'|"([^"]*)"))?\]""")
+_ID_ONLY = re.compile(r"#([\w-]+)$")
+
+
+def _has_class(name):
+    # The plain contains() rejects most elements before the exact token test runs.
+    return f"contains(@class, '{name}') and contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _literal(value):
+    return f"'{value}'" if "'" not in value else f'"{value}"'
+
+
+def _step(compound):
+    m = _COMPOUND.match(compound)
+    if not m:
+        raise ValueError(f"unsupported selector: {compound!r}")
+    tests = []
+    for simple in _SIMPLE.finditer(m.group(2)):
+        kind, name, attr = simple.group(1), simple.group(2), simple.group(3)
+        if kind == '.':
+            tests.append(_has_class(name))
+        elif kind == '#':
+            tests.append(f"@id={_literal(name)}")
+        else:
+            value = simple.group(4) if simple.group(4) is not None else simple.group(5)
+            tests.append(f"@{attr}" if value is None else f"@{attr}={_literal(value)}")
+    return (m.group(1) or '*') + ''.join(f"[{test}]" for test in tests)
+
+
+@lru_cache(maxsize=None)
+def compile_selector(css, scoped=False):
+    """
+    Compiles the CSS subset the schemas use (type, .class, #id, [attr] and
+    [attr='v'] compounds, descendant combinators and comma groups) to one
+    XPath that returns matches in document order.
+
+    Ancestor compounds are tested on the ancestor axis, so a scoped lookup
+    behaves like soupsieve's `tag.select('A B')`: only B must lie inside the
+    scope, A may sit above it. Document-level `#id` uses libxml2's id index.
+    """
+    paths = []
+    for group in _SELECTOR_SPLIT.split(css):
+        compounds = _COMPOUNDS.findall(group)
+        if not compounds:
+            raise ValueError(f"empty selector in {css!r}")
+        if not scoped and len(compounds) == 1 and _ID_ONLY.match(compounds[0]):
+            paths.append(f"id({_literal(compounds[0][1:])})")
+            continue
+        chain = None
+        for compound in compounds[:-1]:
+            ancestor = f"ancestor::{_step(compound)}"
+            chain = ancestor if chain is None else f"{ancestor}[{chain}]"
+        path = ('.//' if scoped else '//') + _step(compounds[-1])
+        paths.append(path if chain is None else f"{path}[{chain}]")
+    return etree.XPath(' | '.join(paths))
+
+
+def select(css, node, scoped=True):
+    return compile_selector(css, scoped)(node)
+
+
+def select_one(css, node, scoped=True):
+    found = compile_selector(css, scoped)(node)
+    return found[0] if found else None
+
+
+# --- Schema building blocks ---
+
+class Field:
+    """
+    One output key read from the first element matching `selector` (or a
+    list over all matches when `many`), optionally looked up inside the first
+    `within` match. `attr` reads an attribute instead of text. A missing
+    element or attribute yields `fallback(node)` if given, else `default`;
+    `post` cleans up a value that was found.
+    """
+
+    def __init__(self, name, selector, text=TEXT, attr=None, many=False, within=None,
+                 default=NA, fallback=None, post=None):
+        self.name = name
+        self.names = (name,)
+        self.selector = selector
+        self.text = text
+        self.attr = attr
+        self.many = many
+        self.within = within
+        self.default = default
+        self.fallback = fallback
+        self.post = post
+
+    def read(self, el):
+        return el.get(self.attr) if self.attr else read_text(el, self.text)
+
+    def value(self, node, scoped):
+        if self.within is not None:
+            node = select_one(self.within, node, scoped)
+            scoped = True
+            if node is None:
+                return [] if self.many else self.default
+        if self.many:
+            return [self.read(el) for el in select(self.selector, node, scoped)]
+        el = select_one(self.selector, node, scoped)
+        value = self.read(el) if el is not None else None
+        if value is None:
+            return self.fallback(node) if self.fallback else self.default
+        return self.post(value) if self.post else value
+
+    def extract(self, node, scoped):
+        yield self.name, self.value(node, scoped)
+
+
+class Pairs:
+    """A dict built from repeated items, keyed by one child's text and valued by another's."""
+
+    def __init__(self, name, selector, key, value, key_text=STRIP, value_text=WORDS):
+        self.names = (name,)
+        self.selector = selector
+        self.key = Field(None, key, key_text, default=None)
+        self.value = Field(None, value, value_text, default=None)
+
+    def extract(self, node, scoped):
+        pairs = {}
+        for item in select(self.selector, node, scoped):
+            key, value = self.key.value(item, True), self.value.value(item, True)
+            if key is not None and value is not None:
+                pairs[key] = value
+        yield self.names[0], pairs
+
+
+class Group:
+    """A nested dict of fields read inside the first `within` match; {} when it is missing."""
+
+    def __init__(self, name, within, fields):
+        self.names = (name,)
+        self.within = within
+        self.fields = fields
+
+    def extract(self, node, scoped):
+        scope = select_one(self.within, node, scoped)
+        group = {}
+        if scope is not None:
+            for field in self.fields:
+                group.update(field.extract(scope, True))
+        yield self.names[0], group
+
+
+class Derived:
+    """Several keys computed together by `compute(node) -> dict`, e.g. from one embedded script."""
+
+    def __init__(self, names, compute):
+        self.names = tuple(names)
+        self.compute = compute
+
+    def extract(self, node, scoped):
+        values = self.compute(node)
+        for name in self.names:
+            yield name, values[name]
+
+
+class Schema:
+    """
+    An ordered list of field specs compiled into one extractor. `extract`
+    can be limited to a projection of field names, in which case the specs
+    that produce none of them (and their selectors or script parsing) are
+    skipped entirely.
+    """
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.fields = tuple(name for spec in specs for name in spec.names)
+        self._projections = {}
+
+    def check_fields(self, fields):
+        unknown = set(fields).difference(self.fields)
+        if unknown:
+            raise ValueError(f"unknown fields {sorted(unknown)}; choose from {list(self.fields)}")
+        return tuple(fields)
+
+    def _projection(self, fields):
+        key = frozenset(fields)
+        if key not in self._projections:
+            self.check_fields(key)
+            self._projections[key] = [spec for spec in self.specs if key.intersection(spec.names)]
+        return key, self._projections[key]
+
+    def extract(self, node, fields=None, scoped=False):
+        record = {}
+        if fields is None:
+            for spec in self.specs:
+                record.update(spec.extract(node, scoped))
+            return record
+        wanted, specs = self._projection(fields)
+        for spec in specs:
+            record.update((name, value) for name, value in spec.extract(node, scoped) if name in wanted)
+        return record
+
+
+# --- Post-processors and fallbacks ---
+
+def unwrap_website(href):
+    """The real target of an r.clutch.co redirect link (its `u` or `provider_website` parameter)."""
+    query = parse_qs(urlparse(href).query)
+    return query.get('u', [None])[0] or query.get('provider_website', [None])[0] or href
+
+
+def absolute_url(href):
+    return CLUTCH_BASE_URL + href if href.startswith('/') else href
+
+
+def json_ld_description(node):
+    json_ld_tag = select_one("script[type='application/ld+json']", node, scoped=False)
+    return description_from_json_ld(json_ld_tag.text if json_ld_tag is not None else None)
+
+
+def description_from_json_ld(text):
+    if text is None:
+        return NA
+    try:
+        return json.loads(text.strip()).get('description', NA)
+    except Exception:
+        return NA
+
+
+_CHART_SCRIPT = etree.XPath("//script[contains(text(), 'window.chartPie')]")
+_CHART_RE = re.compile(r'window\.chartPie\s*=\s*({.*?});', re.DOTALL)
+
+
+def _slices(chart):
+    return [f"{s['name']}: {s['percent']*100:.1f}%" for s in chart['slices']]
+
+
+def chart_breakdown(node):
+    """Service, focus, industry and client percentages from the page's window.chartPie script."""
+    scripts = _CHART_SCRIPT(node)
+    m = _CHART_RE.search(scripts[0].text) if scripts else None
+    chart_data = None
+    if m:
+        try:
+            chart_data = json.loads(m.group(1))
+        except Exception:
+            pass
+    return chart_breakdown_from_data(chart_data)
+
+
+def chart_breakdown_from_data(chart_data):
+    """chart_breakdown() from the already decoded window.chartPie object (None when there is none)."""
+    service_lines, focus_areas, industries, clients = [], [], [], []
+    if chart_data is not None:
+        try:
+            if 'service_provided' in chart_data:
+                service_lines = _slices(chart_data['service_provided'])
+            if 'industries' in chart_data:
+                industries = _slices(chart_data['industries'])
+            if 'clients' in chart_data:
+                clients = _slices(chart_data['clients'])
+            if 'focus' in chart_data:
+                for cat, data in chart_data['focus']['charts'].items():
+                    focus_areas.append({data.get('legend_title', cat): _slices(data)})
+        except Exception:
+            pass
+    return {
+        'service_lines': service_lines,
+        'focus_breakdown': focus_areas,
+        'industries_focus': industries,
+        'client_focus': clients
+    }
+
+
+# --- Schemas ---
+
+CARD_SELECTOR = 'li.provider-list-item'   # featured and regular provider cards alike
+CARD_TITLE = 'h3.provider__title a'
+
+CARD_SCHEMA = Schema([
+    Field('name', CARD_TITLE),
+    Field('profile_url', CARD_TITLE, attr='href', post=absolute_url),
+    Field('tagline', '.provider__tagline'),
+    Field('description', '.provider__description p'),
+    Field('location', '.locality'),
+    Field('hourly_rate', '.hourly-rate'),
+    Field('min_project_size', '.min-project-size'),
+    Field('team_size', '.employees-count'),
+    Field('website', 'a.website-link__item', attr='href'),
+])
+
+CHART_FIELDS = ('service_lines', 'focus_breakdown', 'industries_focus', 'client_focus')
+
+PROFILE_SCHEMA = Schema([
+    Field('name', 'h1.profile-header__title', STRIP),
+    Field('summary_description', '.profile-summary__text', LINES, fallback=json_ld_description),
+    Field('website', "ul.profile-short-actions a[title='Visit website']", attr='href', post=unwrap_website),
+    Pairs('summary_details',
+          'ul.profile-summary__details li.profile-summary__detail, '
+          'ul.profile-summary__details li.profile-summary__detail-clickable',
+          key='.profile-summary__detail-label', value='.profile-summary__detail-title'),
+    Field('languages', '.profile-modal--list li', many=True, within='#profile-languages-modal'),
+    Field('locations', '.profile-modal--list li', many=True, within='#profile-locations-modal'),
+    Derived(CHART_FIELDS, chart_breakdown),
+    Group('pricing_snapshot', '#pricing-snapshot', [
+        Field('most_common_project_size', '#common-project-size-value'),
+        Field('client_feedback_summary', '.pricing-snapshot__clients-feedback-description'),
+    ]),
+])
+
+# Everything except the chart breakdown, for cheap refresh runs.
+PROFILE_FIELDS_WITHOUT_CHARTS = tuple(f for f in PROFILE_SCHEMA.fields if f not in CHART_FIELDS)
+
+
+def extract_profile(html, profile_url, fields=None):
+    """A profile record; `fields` limits it to a projection (profile_url is always kept)."""
+    return {'profile_url': profile_url, **PROFILE_SCHEMA.extract(parse_html(html), fields)}
+
+
+def extract_cards(html, fields=None):
+    """Every provider card on a listing page, featured and regular."""
+    root = parse_html(html)
+    return [CARD_SCHEMA.extract(card, fields, scoped=True) for card in select(CARD_SELECTOR, root, scoped=False)]
+
+
+_PAGINATION_LINKS = etree.XPath("//*[contains(@class, 'pagination')]//a")
+
+
+def last_page_number(html):
+    """
+    Highest ?page= number linked from a listing page's pagination; 0 when the
+    directory has a single page. clutch.co numbers pages from zero: the
+    first page has no parameter and the second is ?page=1.
+    """
+    last = 0
+    for link in _PAGINATION_LINKS(parse_html(html)):
+        values = [link.get('data-page')] + parse_qs(urlparse(link.get('href', '')).query).get('page', [])
+        for value in values:
+            if value and value.isdigit():
+                last = max(last, int(value))
+    return last
@@ -0,0 +1,317 @@
+import atexit
+import threading
+import requests
+import undetected_chromedriver as uc
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from selenium_stealth import stealth
+
+from throttle import ThrottledFetcher
+from page_cache import CachingFetcher
+from metrics import METRICS, is_block_page
+from driver_pool import DriverPool
+from retry import BlockedPage, PageNotFound, is_not_found_page
+
+# --- Configuration ---
+HTTP_TIMEOUT = 30   # seconds per request
+HTTP_POOL_SIZE = 10   # keep-alive connections kept open per host
+READY_POLL = 0.25   # seconds between readiness checks in the browser
+HTTP_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+# Requests the parsers never read: images, fonts, media and third-party
+# analytics. Blocked in the browser through the DevTools protocol.
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*.mp4", "*.webm",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*connect.facebook.net*", "*hotjar.com*", "*segment.io*", "*hubspot.com*",
+    "*linkedin.com/px*", "*bat.bing.com*", "*clarity.ms*",
+]
+
+
+def create_driver(block_resources=True):
+    options = uc.ChromeOptions()
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    driver = uc.Chrome(options=options, use_subprocess=True)
+    stealth(driver, languages=["en-US", "en"], vendor="Google Inc.", platform="Win32")
+    if block_resources:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    return driver
+
+
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+
+
+def default_driver_pool():
+    """The process-wide pool of stealth browsers shared by every Selenium fetcher."""
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            _driver_pool = DriverPool(create_driver)
+            atexit.register(_driver_pool.close)
+        return _driver_pool
+
+
+# Every fetcher exposes the same two calls:
+#   fetch(url, ready_selector, ready_js) -> page HTML once `ready_selector` is
+#                                           present and `ready_js` is defined
+#   close()                              -> release the browser / connections
+# and a `last_headers` mapping with the response headers of the last fetch
+# (empty when the backend cannot see them, as with the browser).
+#
+# fetch_if_modified(url, ready_selector, ready_js, etag, last_modified) is the
+# conditional variant: it returns None when the server answers 304 Not
+# Modified. Backends that cannot send conditional requests just fetch.
+# The parsers only ever see the HTML string, so every backend yields
+# identical records for the same page.
+#
+# A fetcher whose `extracts_in_browser` is true also has
+#   evaluate(url, ready_selector, ready_js, script, *args) -> `script`'s result
+# and the callers extract through browser_extraction instead of parsing
+# page_source; the records are the same.
+
+
+class page_ready:
+    """
+    WebDriverWait condition: `ready_selector` is in the DOM and, if given, the
+    `ready_js` global (e.g. window.chartPie) has been defined by its inline
+    script. Pages that never define the global count as ready once the
+    document has finished loading, so they cost no more than a full load.
+    """
+
+    def __init__(self, ready_selector=None, ready_js=None):
+        self.ready_selector = ready_selector
+        self.ready_js = ready_js
+
+    def __call__(self, driver):
+        if self.ready_selector and not driver.find_elements(By.CSS_SELECTOR, self.ready_selector):
+            return False
+        if not self.ready_js:
+            return True
+        return driver.execute_script(
+            f"return typeof {self.ready_js} !== 'undefined' || document.readyState === 'complete';"
+        )
+
+
+class SeleniumFetcher:
+    """
+    Loads pages in a stealth Chrome. With a DriverPool the browser is leased
+    from it and recycled by it (after N pages, on memory growth or when it
+    stops responding); otherwise the fetcher starts its own driver on first
+    use, or uses the one it was given.
+    """
+
+    last_headers = {}
+
+    def __init__(self, driver=None, driver_factory=create_driver, wait_timeout=20, pool=None,
+                 extracts_in_browser=False):
+        self.driver = driver
+        self.extracts_in_browser = extracts_in_browser
+        self.driver_factory = driver_factory
+        self.wait_timeout = wait_timeout
+        self.lease = pool.lease() if pool is not None and driver is None else None
+
+    def _get_driver(self):
+        if self.lease is not None:
+            return self.lease.driver
+        if self.driver is None:
+            self.driver = self.driver_factory()
+        return self.driver
+
+    def _load(self, driver, url, ready_selector, ready_js, trace):
+        try:
+            driver.get(url)
+            trace.lap('navigation')
+            if ready_selector or ready_js:
+                WebDriverWait(driver, self.wait_timeout, poll_frequency=READY_POLL).until(
+                    page_ready(ready_selector, ready_js)
+                )
+            trace.lap('wait')
+        except TimeoutException:
+            # A challenge or 404 page never shows the ready selector; say so instead of timing out.
+            trace.outcome = self._timeout_reason(driver)
+            if trace.outcome == 'blocked':
+                raise BlockedPage(f"challenge page at {url}") from None
+            if trace.outcome == 'not_found':
+                raise PageNotFound(f"not found page at {url}") from None
+            raise
+
+    def fetch(self, url, ready_selector=None, ready_js=None):
+        driver = self._get_driver()
+        ok = False
+        try:
+            with METRICS.trace(url, 'selenium') as trace:
+                self._load(driver, url, ready_selector, ready_js, trace)
+                trace.html = driver.page_source
+                trace.lap('page_source')
+            ok = True
+        finally:
+            if self.lease is not None:
+                self.lease.page_done(ok)
+        return trace.html
+
+    def evaluate(self, url, ready_selector, ready_js, script, *args):
+        """
+        Loads `url` like fetch() but returns `script`'s result, run inside the
+        page, instead of the serialized DOM.
+        """
+        driver = self._get_driver()
+        ok = False
+        try:
+            with METRICS.trace(url, 'selenium-js') as trace:
+                self._load(driver, url, ready_selector, ready_js, trace)
+                result = driver.execute_script(script, *args)
+                trace.html = result if isinstance(result, str) else None
+                trace.lap('extract')
+            ok = True
+        finally:
+            if self.lease is not None:
+                self.lease.page_done(ok)
+        return result
+
+    @staticmethod
+    def _timeout_reason(driver):
+        try:
+            html = driver.page_source
+        except Exception:
+            return 'timeout'
+        if is_block_page(html):
+            return 'blocked'
+        if is_not_found_page(html):
+            return 'not_found'
+        return 'timeout'
+
+    def fetch_if_modified(self, url, ready_selector=None, ready_js=None, etag=None, last_modified=None):
+        return self.fetch(url, ready_selector, ready_js)
+
+    def close(self):
+        if self.lease is not None:
+            self.lease.release()
+        elif self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
+
+class HttpFetcher:
+    """Plain HTTP GETs over a pooled keep-alive session. No browser, a few MB per worker."""
+
+    def __init__(self, headers=None, timeout=HTTP_TIMEOUT, pool_size=HTTP_POOL_SIZE):
+        self.timeout = timeout
+        self.last_headers = {}
+        self.session = requests.Session()
+        self.session.headers.update(headers or HTTP_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, url, ready_selector=None, ready_js=None):
+        return self.fetch_if_modified(url, ready_selector, ready_js)
+
+    def fetch_if_modified(self, url, ready_selector=None, ready_js=None, etag=None, last_modified=None):
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        with METRICS.trace(url, 'http') as trace:
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.Timeout:
+                trace.outcome = 'timeout'
+                raise
+            trace.lap('navigation')
+            self.last_headers = response.headers
+            if response.status_code == 304:
+                trace.outcome = 'not_modified'
+                return None
+            if response.status_code in (404, 410):
+                trace.outcome = 'not_found'
+                raise PageNotFound(f"{response.status_code} for {url}")
+            if response.status_code in (403, 429) or (response.ok and is_block_page(response.text)):
+                trace.outcome = 'blocked'
+                raise BlockedPage(f"{response.status_code} challenge for {url}")
+            response.raise_for_status()
+            trace.html = response.text
+            trace.lap('page_source')
+        return trace.html
+
+    def close(self):
+        self.session.close()
+
+
+def has_selector(html, selector):
+    return BeautifulSoup(html, 'lxml').select_one(selector) is not None
+
+
+class FallbackFetcher:
+    """
+    Tries `primary` (normally HTTP) first and only hands a URL to `fallback`
+    (normally the browser) when the response is a challenge page or is
+    missing `ready_selector`, e.g. a client-side rendered shell. A 404 is
+    final and is not retried in the browser.
+    """
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.last_headers = {}
+
+    def fetch(self, url, ready_selector=None, ready_js=None):
+        return self.fetch_if_modified(url, ready_selector, ready_js)
+
+    def fetch_if_modified(self, url, ready_selector=None, ready_js=None, etag=None, last_modified=None):
+        try:
+            html = self.primary.fetch_if_modified(url, ready_selector, ready_js, etag, last_modified)
+            if html is None or not ready_selector or has_selector(html, ready_selector):
+                self.last_headers = self.primary.last_headers
+                return html
+            print(f"    HTTP response for {url} lacks '{ready_selector}', falling back to browser.")
+        except (requests.RequestException, BlockedPage) as e:
+            print(f"    HTTP fetch failed for {url} ({e}), falling back to browser.")
+        self.last_headers = {}
+        return self.fallback.fetch(url, ready_selector, ready_js)
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+
+def create_fetcher(engine="selenium", driver=None, scheduler=None, cache=None, pool=None):
+    """
+    Builds a fetcher for `engine`: 'selenium', 'selenium-js' (the browser,
+    extracting inside the page), 'http' (HTTP with browser fallback) or
+    'http-only'. Browsers come from `pool` (the shared
+    default_driver_pool() unless a `driver` is passed). When a
+    PolitenessScheduler is passed, every
+    request is rate limited through it; when a PageCache is passed, fresh
+    snapshots are served from it, stale ones are revalidated with a
+    conditional request, and every fetched page is stored in it.
+    """
+    if engine in ("selenium", "selenium-js", "http") and driver is None and pool is None:
+        pool = default_driver_pool()
+    if engine in ("selenium", "selenium-js"):
+        fetcher = SeleniumFetcher(driver=driver, pool=pool, extracts_in_browser=engine == "selenium-js")
+    elif engine == "http":
+        fetcher = FallbackFetcher(HttpFetcher(), SeleniumFetcher(driver=driver, pool=pool))
+    elif engine == "http-only":
+        fetcher = HttpFetcher()
+    else:
+        raise ValueError(f"Unknown fetch engine: {engine}")
+    if scheduler is not None:
+        fetcher = ThrottledFetcher(fetcher, scheduler)
+    if cache is not None:
+        fetcher = CachingFetcher(fetcher, cache)
+    return fetcher
@@ -0,0 +1,286 @@
+import os
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import date, datetime
+
+from extraction import unwrap_website
+from block_jsonl import latest_records
+
+# --- Configuration ---
+HISTORY_DB = 'clutch_history.sqlite3'
+LISTED = '_listed'   # pseudo-field: False once a complete crawl no longer lists the company
+COMMIT_EVERY = 1000   # records per transaction while ingesting
+
+# Storage: one full base record per (kind, profile_url), written the first
+# time the company is seen, then one row per changed top-level field per
+# crawl. A crawl that changes nothing about a company stores nothing for
+# it. `current` holds the latest state so a new crawl is diffed without
+# replaying history; it is a cache of base + deltas, one row per company.
+
+
+def canonical(record):
+    """
+    The record as it is versioned: profile_url dropped (it is the key) and
+    the website reduced to its real target, since the r.clutch.co wrapper
+    carries per-render tracking parameters that change on every crawl.
+    """
+    record = {field: value for field, value in record.items() if field != 'profile_url'}
+    if isinstance(record.get('website'), str):
+        record['website'] = unwrap_website(record['website'])
+    return record
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def _day(value):
+    return value.isoformat() if isinstance(value, date) else date.fromisoformat(value).isoformat()
+
+
+class HistoryStore:
+    """
+    Versioned company records for listing cards and profiles. ingest() adds
+    one crawl; as_of(), diff() and changes() read any point of the history
+    without materialising whole snapshots.
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS crawls (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                crawl_date TEXT NOT NULL,
+                source TEXT,
+                complete INTEGER NOT NULL DEFAULT 0,
+                records INTEGER NOT NULL DEFAULT 0,
+                changed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS bases (
+                kind TEXT NOT NULL,
+                profile_url TEXT NOT NULL,
+                crawl_id INTEGER NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (kind, profile_url)
+            );
+            CREATE TABLE IF NOT EXISTS deltas (
+                kind TEXT NOT NULL,
+                profile_url TEXT NOT NULL,
+                crawl_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,               -- JSON; NULL when the field disappeared
+                PRIMARY KEY (kind, profile_url, crawl_id, field)
+            );
+            CREATE INDEX IF NOT EXISTS deltas_crawl ON deltas (crawl_id);
+            CREATE TABLE IF NOT EXISTS current (
+                kind TEXT NOT NULL,
+                profile_url TEXT NOT NULL,
+                record TEXT NOT NULL,
+                last_seen INTEGER NOT NULL,
+                PRIMARY KEY (kind, profile_url)
+            );
+        """)
+        self._db.commit()
+
+    # --- Writing ---
+
+    def ingest(self, path, kind, crawl_date=None, complete=False):
+        """
+        Records the crawl in `path` (plain or block JSONL; only the last line
+        for a profile_url counts, so each company is diffed once against its
+        state before this crawl). With `complete`, companies the file does
+        not contain are marked as no longer listed. Crawls must be ingested
+        in date order. Returns the crawl's summary.
+        """
+        crawl_date = _day(crawl_date or date.fromtimestamp(os.path.getmtime(path)))
+        with self._lock:
+            latest = self._db.execute("SELECT MAX(crawl_date) FROM crawls WHERE kind = ?", (kind,)).fetchone()[0]
+            if latest is not None and crawl_date < latest:
+                raise ValueError(f"{kind} history already runs to {latest}; cannot insert a crawl of {crawl_date}")
+            crawl_id = self._db.execute("INSERT INTO crawls (kind, crawl_date, source, complete) VALUES (?, ?, ?, ?)",
+                                        (kind, crawl_date, path, int(complete))).lastrowid
+            records = changed = 0
+            for record in latest_records(path):
+                url = record.get('profile_url')
+                if not url or url == 'N/A':
+                    continue
+                changed += self._add(kind, url, canonical(record), crawl_id)
+                records += 1
+                if records % COMMIT_EVERY == 0:
+                    self._db.commit()
+            if complete:
+                gone = self._db.execute(
+                    "SELECT profile_url, record FROM current WHERE kind = ? AND last_seen < ?", (kind, crawl_id)
+                ).fetchall()
+                for url, record in gone:
+                    state = json.loads(record)
+                    if state.get(LISTED, True):
+                        self._add(kind, url, {**state, LISTED: False}, crawl_id, seen=False)
+                        changed += 1
+            self._db.execute("UPDATE crawls SET records = ?, changed = ? WHERE id = ?", (records, changed, crawl_id))
+            self._db.commit()
+        print(f"Recorded {kind} crawl of {crawl_date} from {path}: {records} records, {changed} companies changed.")
+        return {'crawl_id': crawl_id, 'crawl_date': crawl_date, 'records': records, 'changed': changed}
+
+    def _add(self, kind, url, record, crawl_id, seen=True):
+        """Diffs `record` against the company's current state and stores the changed fields. Returns 1 if any."""
+        db = self._db
+        row = db.execute("SELECT record FROM current WHERE kind = ? AND profile_url = ?", (kind, url)).fetchone()
+        last_seen = crawl_id if seen else None
+        if row is None:
+            db.execute("INSERT INTO bases (kind, profile_url, crawl_id, record) VALUES (?, ?, ?, ?)",
+                       (kind, url, crawl_id, _dumps(record)))
+            db.execute("INSERT INTO current (kind, profile_url, record, last_seen) VALUES (?, ?, ?, ?)",
+                       (kind, url, _dumps(record), crawl_id))
+            return 1
+        state = json.loads(row[0])
+        if seen and not state.get(LISTED, True):
+            record = {**record, LISTED: True}   # listed again
+        elif LISTED in state and LISTED not in record:
+            record = {**record, LISTED: state[LISTED]}
+        changes = [(field, _dumps(record[field]) if field in record else None)
+                   for field in state.keys() | record.keys()
+                   if state.get(field, None) != record.get(field, None) or (field in state) != (field in record)]
+        if changes:
+            db.executemany("INSERT OR REPLACE INTO deltas (kind, profile_url, crawl_id, field, value) "
+                           "VALUES (?, ?, ?, ?, ?)", ((kind, url, crawl_id, field, value) for field, value in changes))
+        db.execute("UPDATE current SET record = ?, last_seen = COALESCE(?, last_seen) "
+                   "WHERE kind = ? AND profile_url = ?", (_dumps(record), last_seen, kind, url))
+        return 1 if changes else 0
+
+    # --- Reading ---
+
+    def as_of(self, profile_url, when, kind='profile'):
+        """
+        The company's record as of the end of day `when` (a date or
+        YYYY-MM-DD), or None if it had not been seen yet or was no longer
+        listed then.
+        """
+        when = _day(when)
+        with self._lock:
+            base = self._db.execute(
+                "SELECT b.record FROM bases b JOIN crawls c ON c.id = b.crawl_id "
+                "WHERE b.kind = ? AND b.profile_url = ? AND c.crawl_date <= ?", (kind, profile_url, when)
+            ).fetchone()
+            if base is None:
+                return None
+            record = json.loads(base[0])
+            for field, value in self._db.execute(
+                    "SELECT d.field, d.value FROM deltas d JOIN crawls c ON c.id = d.crawl_id "
+                    "WHERE d.kind = ? AND d.profile_url = ? AND c.crawl_date <= ? ORDER BY c.crawl_date, c.id",
+                    (kind, profile_url, when)):
+                if value is None:
+                    record.pop(field, None)
+                else:
+                    record[field] = json.loads(value)
+        if not record.pop(LISTED, True):
+            return None
+        return {'profile_url': profile_url, **record}
+
+    def changes(self, profile_url, kind='profile'):
+        """The company's timeline: (crawl_date, field, new value) per change, oldest first; base fields excluded."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.crawl_date, d.field, d.value FROM deltas d JOIN crawls c ON c.id = d.crawl_id "
+                "WHERE d.kind = ? AND d.profile_url = ? ORDER BY c.crawl_date, c.id, d.field", (kind, profile_url)
+            ).fetchall()
+        return [(day, field, None if value is None else json.loads(value)) for day, field, value in rows]
+
+    def diff(self, start, end, kind='profile', fields=None):
+        """
+        Yields (profile_url, field, value at `start`, value at `end`) for
+        every field that differs between the two dates, company by company.
+        Only companies with a base or delta in between are looked at, and one
+        company's two states are held at a time. A company added in the range
+        shows its fields against None; one delisted shows them against None
+        on the other side.
+        """
+        start, end = _day(start), _day(end)
+        with self._lock:
+            touched = [url for (url,) in self._db.execute(
+                "SELECT profile_url FROM deltas d JOIN crawls c ON c.id = d.crawl_id "
+                "WHERE d.kind = ? AND c.crawl_date > ? AND c.crawl_date <= ? "
+                "UNION SELECT profile_url FROM bases b JOIN crawls c ON c.id = b.crawl_id "
+                "WHERE b.kind = ? AND c.crawl_date > ? AND c.crawl_date <= ? ORDER BY 1",
+                (kind, start, end, kind, start, end))]
+        for url in touched:
+            before = self.as_of(url, start, kind) or {}
+            after = self.as_of(url, end, kind) or {}
+            for field in sorted((before.keys() | after.keys()) - {'profile_url'}):
+                if fields and field not in fields:
+                    continue
+                if before.get(field) != after.get(field):
+                    yield url, field, before.get(field), after.get(field)
+
+    def crawls(self, kind=None):
+        with self._lock:
+            query = "SELECT id, kind, crawl_date, source, complete, records, changed FROM crawls"
+            rows = self._db.execute(query + (" WHERE kind = ?" if kind else "") + " ORDER BY crawl_date, id",
+                                    (kind,) if kind else ()).fetchall()
+        return [dict(zip(('id', 'kind', 'crawl_date', 'source', 'complete', 'records', 'changed'), row))
+                for row in rows]
+
+    def close(self):
+        self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versioned history of the scraped companies.")
+    parser.add_argument('--db', default=HISTORY_DB)
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="record a crawl's output file")
+    ingest.add_argument('--listings', help="listing JSONL of the crawl, plain or block-compressed")
+    ingest.add_argument('--profiles', help="profile JSONL of the crawl, plain or block-compressed")
+    ingest.add_argument('--date', help="crawl date, YYYY-MM-DD (default: the file's modification date)")
+    ingest.add_argument('--complete', action='store_true',
+                        help="the listing crawl covered every page: companies missing from it are marked delisted")
+    as_of = commands.add_parser('as-of', help="a company's record as of a date")
+    as_of.add_argument('profile_url')
+    as_of.add_argument('date')
+    diff = commands.add_parser('diff', help="field changes between two crawl dates")
+    diff.add_argument('start')
+    diff.add_argument('end')
+    diff.add_argument('--field', action='append', help="only this field; repeatable")
+    log = commands.add_parser('log', help="a company's change timeline")
+    log.add_argument('profile_url')
+    commands.add_parser('crawls', help="list the recorded crawls")
+    for command in (as_of, diff, log):
+        command.add_argument('--kind', choices=['listing', 'profile'], default='profile')
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    try:
+        if args.command == 'ingest':
+            if not (args.listings or args.profiles):
+                parser.error("ingest needs --listings and/or --profiles")
+            crawl_date = datetime.strptime(args.date, '%Y-%m-%d').date() if args.date else None
+            if args.listings:
+                store.ingest(args.listings, 'listing', crawl_date, args.complete)
+            if args.profiles:
+                store.ingest(args.profiles, 'profile', crawl_date)
+        elif args.command == 'as-of':
+            record = store.as_of(args.profile_url, args.date, args.kind)
+            print(json.dumps(record, ensure_ascii=False, indent=2))
+        elif args.command == 'diff':
+            for url, field, before, after in store.diff(args.start, args.end, args.kind, args.field):
+                print(f"{url}\t{field}\t{json.dumps(before, ensure_ascii=False)}\t{json.dumps(after, ensure_ascii=False)}")
+        elif args.command == 'log':
+            for day, field, value in store.changes(args.profile_url, args.kind):
+                print(f"{day}\t{field}\t{json.dumps(value, ensure_ascii=False)}")
+        else:
+            for crawl in store.crawls():
+                print(f"{crawl['crawl_date']}\t{crawl['kind']}\t{crawl['records']} records\t"
+                      f"{crawl['changed']} changed\t{crawl['source']}")
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import hashlib
+
+from extraction import unwrap_website
+
+# --- Configuration ---
+FINGERPRINT_FILE = 'crawl_fingerprints.json'
+MAX_PROFILE_AGE = 30 * 24 * 3600   # seconds before a profile is refreshed even if its card is unchanged
+
+# Card fields that describe the company. 'website' is reduced to the real
+# target URL because the r.clutch.co redirect wrapper carries per-render
+# tracking parameters (trace_id, position, page_number) that change on
+# every crawl without the company changing.
+CARD_FIELDS = ('name', 'tagline', 'description', 'location', 'hourly_rate',
+               'min_project_size', 'team_size', 'website')
+
+
+def fingerprint(record, fields=None):
+    """Stable short hash of `fields` of a record (all fields except profile_url by default)."""
+    if fields is None:
+        fields = sorted(k for k in record if k != 'profile_url')
+    values = {}
+    for field in fields:
+        value = record.get(field)
+        if field == 'website' and isinstance(value, str):
+            value = unwrap_website(value)
+        values[field] = value
+    blob = json.dumps(values, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()[:16]
+
+
+def card_fingerprint(card):
+    return fingerprint(card, CARD_FIELDS)
+
+
+class FingerprintStore:
+    """
+    Remembers, per profile_url, the fingerprint of its listing card, the
+    fingerprint of its last saved profile record and when that profile was
+    last fetched. Saved as one JSON file after each run.
+    """
+
+    def __init__(self, path=FINGERPRINT_FILE):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def needs_refresh(self, card, max_age=MAX_PROFILE_AGE, now=None):
+        entry = self.entries.get(card['profile_url'])
+        if entry is None or entry.get('profile_fetched_at') is None:
+            return True
+        if entry.get('card_fp') != card_fingerprint(card):
+            return True
+        return (now or time.time()) - entry['profile_fetched_at'] > max_age
+
+    def record_profile(self, profile, card=None):
+        """
+        Stores the fingerprints of a freshly fetched profile (and the card that
+        led to it); returns True if the profile differs from the last saved one.
+        The card is only recorded here, so a failed fetch is retried next run.
+        """
+        entry = self.entries.setdefault(profile['profile_url'], {})
+        if card is not None:
+            entry['card_fp'] = card_fingerprint(card)
+        profile_fp = fingerprint(profile)
+        changed = entry.get('profile_fp') != profile_fp
+        entry['profile_fp'] = profile_fp
+        entry['profile_fetched_at'] = time.time()
+        return changed
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def plan_refresh(cards, store, max_age=MAX_PROFILE_AGE):
+    """Profile URLs (deduplicated, in listing order) whose card changed or whose profile is too old."""
+    now = time.time()
+    planned = {}
+    for card in cards:
+        url = card.get('profile_url')
+        if not url or url == 'N/A' or url in planned:
+            continue
+        if store.needs_refresh(card, max_age, now):
+            planned[url] = True
+    return list(planned)
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import threading
+
+from metrics import METRICS
+
+try:
+    import fcntl
+except ImportError:   # Windows: no advisory locks, thread safety only
+    fcntl = None
+
+# --- Configuration ---
+FLUSH_RECORDS = 20   # buffered records that trigger a write
+FLUSH_INTERVAL = 10.0   # seconds after which a write is forced on the next record
+FSYNC_INTERVAL = 60.0   # seconds between fsync checkpoints
+
+
+def repair_jsonl(path):
+    """
+    Fixes a torn last line left by a crash mid-write. A complete JSON object
+    that only lacks its newline gets one; a truncated fragment is cut off.
+    Returns True if the file was changed.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) == b'\n':
+            return False
+        # Walk back to the start of the last line.
+        end = f.tell()
+        pos = end
+        chunk = 64 * 1024
+        while pos > 0:
+            step = min(chunk, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                pos = pos - step + newline + 1
+                break
+            pos -= step
+        f.seek(pos)
+        tail = f.read()
+        try:
+            json.loads(tail.decode('utf-8'))
+            f.seek(end)
+            f.write(b'\n')
+            print(f"Repaired {path}: terminated the last line.")
+        except ValueError:
+            f.truncate(pos)
+            print(f"Repaired {path}: dropped a torn {len(tail)}-byte last line.")
+    return True
+
+
+class JsonlWriter:
+    """
+    Long-lived, batched JSONL appender.
+
+    Records are buffered and written once FLUSH_RECORDS are pending or
+    FLUSH_INTERVAL has passed, each batch as a single append to an O_APPEND
+    descriptor under an exclusive file lock, so several threads or processes
+    can share one output without interleaving lines. The file is fsynced
+    every FSYNC_INTERVAL seconds, on checkpoint() and on close(). A torn last
+    line from an earlier crash is repaired on open.
+
+    `on_flush(records)` is called after each batch reaches the file, which is
+    where crawl progress may safely be recorded as done.
+    """
+
+    def __init__(self, path, flush_records=FLUSH_RECORDS, flush_interval=FLUSH_INTERVAL,
+                 fsync_interval=FSYNC_INTERVAL, truncate=False, on_flush=None):
+        self.path = path
+        self.on_flush = on_flush
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._buffer = []
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+        if truncate:
+            flags |= os.O_TRUNC
+        self._fd = os.open(path, flags, 0o644)
+        with self._file_lock():
+            self._repair()
+        self._last_flush = self._last_fsync = time.monotonic()
+        self.written = 0
+
+    def _file_lock(self):
+        return _FileLock(self._fd)
+
+    def _repair(self):
+        repair_jsonl(self.path)
+
+    def write(self, record):
+        with self._lock:
+            self._buffer.append(record)
+            if (len(self._buffer) >= self.flush_records
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def write_many(self, records):
+        with self._lock:
+            self._buffer.extend(records)
+            if len(self._buffer) >= self.flush_records:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        records = self._buffer
+        started = time.monotonic()
+        self._append(records)
+        METRICS.observe('write', time.monotonic() - started)
+        self.written += len(records)
+        self._buffer = []
+        if self.on_flush is not None:
+            self.on_flush(records)
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._fsync_locked()
+
+    def _append(self, records):
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+        with self._file_lock():
+            self._write_all(data)
+
+    def _write_all(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    def _fsync_locked(self):
+        os.fsync(self._fd)
+        self._last_fsync = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def checkpoint(self):
+        """Writes everything buffered and forces it to disk."""
+        with self._lock:
+            self._flush_locked()
+            self._fsync_locked()
+
+    def close(self):
+        with self._lock:
+            if self._fd is None:
+                return
+            self._flush_locked()
+            self._fsync_locked()
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _FileLock:
+    def __init__(self, fd):
+        self.fd = fd
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
@@ -0,0 +1,232 @@
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# --- Configuration ---
+METRICS_PORT = 9464   # local Prometheus-style endpoint, when enabled
+RATE_WINDOW = 300.0   # seconds of history behind the rolling pages/minute rate
+
+# Substrings that only appear on anti-bot interstitials, never on real
+# clutch.co listing or profile pages.
+BLOCK_MARKERS = (
+    '<title>Just a moment...</title>',
+    'cf_chl_opt',
+    'cf-turnstile',
+    'Attention Required! | Cloudflare',
+    'px-captcha',
+)
+
+# Fetch outcome -> the counter it increments.
+_OUTCOME_COUNTERS = {'ok': 'pages', 'timeout': 'timeouts', 'blocked': 'blocked', 'error': 'fetch_errors'}
+
+
+def is_block_page(html):
+    return any(marker in html for marker in BLOCK_MARKERS)
+
+
+class StageStats:
+    """Running latency totals for one stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 1),
+        }
+
+
+class FetchTrace:
+    """
+    Times the stages of one page load. The fetcher calls lap(stage) after
+    each step, sets `html` (and `outcome` for timeouts or 304s), and the
+    trace reports itself to its Metrics when the with-block ends.
+    """
+
+    def __init__(self, metrics, url, engine):
+        self.metrics = metrics
+        self.url = url
+        self.engine = engine
+        self.timings = {}
+        self.html = None
+        self.outcome = 'ok'
+        self._mark = time.monotonic()
+
+    def lap(self, stage):
+        now = time.monotonic()
+        self.timings[stage] = now - self._mark
+        self._mark = now
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.outcome == 'ok':
+            self.outcome = 'error'
+        self.metrics.record_fetch(self)
+        return False
+
+
+class Metrics:
+    """
+    Process-wide crawl instrumentation: per-stage timings (navigation, wait,
+    page_source, parse, write), event counters (pages, timeouts, blocked,
+    profile_none, ...) and a rolling pages/minute rate.
+
+    Everything is kept in memory and is cheap to record. configure() can
+    additionally append one JSON line per event to a log file and serve the
+    numbers on a local Prometheus text endpoint (/metrics, plus
+    /metrics.json).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self._page_times = deque()
+        self._log = None
+        self._server = None
+        self.started = time.monotonic()
+
+    def configure(self, log_path=None, port=None):
+        if log_path:
+            self._log = open(log_path, 'a', encoding='utf-8')
+        if port is not None:
+            self.serve(port)
+
+    # --- Recording ---
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = StageStats()
+            self.stages[stage].record(seconds)
+
+    def incr(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    @contextmanager
+    def timer(self, stage, **log_fields):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            seconds = time.monotonic() - started
+            self.observe(stage, seconds)
+            if log_fields:
+                self.log(stage, ms=round(seconds * 1000, 1), **log_fields)
+
+    def trace(self, url, engine):
+        return FetchTrace(self, url, engine)
+
+    def record_fetch(self, trace):
+        for stage, seconds in trace.timings.items():
+            self.observe(stage, seconds)
+        if trace.outcome == 'ok' and trace.html is not None and is_block_page(trace.html):
+            trace.outcome = 'blocked'
+        self.incr(_OUTCOME_COUNTERS.get(trace.outcome, trace.outcome))
+        if trace.outcome == 'ok':
+            now = time.monotonic()
+            with self._lock:
+                self._page_times.append(now)
+                while self._page_times and now - self._page_times[0] > RATE_WINDOW:
+                    self._page_times.popleft()
+        self.log('fetch', url=trace.url, engine=trace.engine, outcome=trace.outcome,
+                 bytes=len(trace.html) if trace.html is not None else None,
+                 **{f"{stage}_ms": round(seconds * 1000, 1) for stage, seconds in trace.timings.items()})
+
+    def log(self, event, **fields):
+        if self._log is None:
+            return
+        line = json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, ensure_ascii=False)
+        with self._lock:
+            self._log.write(line + '\n')
+            self._log.flush()
+
+    # --- Reading ---
+
+    def pages_per_minute(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._page_times and now - self._page_times[0] > RATE_WINDOW:
+                self._page_times.popleft()
+            pages = len(self._page_times)
+        window = min(RATE_WINDOW, now - self.started)
+        return round(pages / window * 60, 2) if window > 0 else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: s.as_dict() for name, s in self.stages.items()}
+            counters = dict(self.counters)
+        return {
+            'uptime_s': round(time.monotonic() - self.started, 1),
+            'pages_per_minute': self.pages_per_minute(),
+            'stages': stages,
+            'counters': counters,
+        }
+
+    def render_prometheus(self):
+        with self._lock:
+            stages = {name: (s.count, s.total, s.max) for name, s in self.stages.items()}
+            counters = dict(self.counters)
+        lines = [
+            '# HELP clutch_stage_seconds Time spent per crawl stage.',
+            '# TYPE clutch_stage_seconds summary',
+        ]
+        for name, (count, total, _) in sorted(stages.items()):
+            lines.append(f'clutch_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'clutch_stage_seconds_count{{stage="{name}"}} {count}')
+        lines += ['# HELP clutch_stage_seconds_max Slowest single observation per stage.',
+                  '# TYPE clutch_stage_seconds_max gauge']
+        lines += [f'clutch_stage_seconds_max{{stage="{name}"}} {mx:.6f}' for name, (_, _, mx) in sorted(stages.items())]
+        lines += ['# HELP clutch_events_total Crawl events (pages, timeouts, blocked, profile_none, ...).',
+                  '# TYPE clutch_events_total counter']
+        lines += [f'clutch_events_total{{event="{name}"}} {value}' for name, value in sorted(counters.items())]
+        lines += ['# HELP clutch_pages_per_minute Pages fetched per minute over the rolling window.',
+                  '# TYPE clutch_pages_per_minute gauge',
+                  f'clutch_pages_per_minute {self.pages_per_minute()}']
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port=METRICS_PORT):
+        """Starts the endpoint on 127.0.0.1:`port` in a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = metrics.render_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(metrics.snapshot()), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Metrics on http://127.0.0.1:{self._server.server_address[1]}/metrics")
+        return self._server
+
+
+METRICS = Metrics()
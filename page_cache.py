@@ -0,0 +1,213 @@
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+import threading
+
+from metrics import METRICS
+
+# --- Configuration ---
+CACHE_DIR = 'page_cache'
+CACHE_TTL = 7 * 24 * 3600   # seconds a snapshot is served without re-fetching
+CACHE_MAX_BYTES = 2 * 1024 ** 3   # compressed size kept on disk before LRU eviction
+
+
+def read_snapshot(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return f.read()
+
+
+class PageCache:
+    """
+    On-disk snapshot store for raw page HTML.
+
+    Pages are gzip-compressed and stored content-addressed under
+    blobs/<sha256[:2]>/<sha256>.html.gz, so identical pages are kept once.
+    A small SQLite index maps each URL to its current blob along with the
+    fetch time, ETag / Last-Modified and last access time used for TTL
+    revalidation and LRU eviction.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, 'blobs'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite3'), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_hash ON pages (content_hash)")
+        self._db.commit()
+
+    def blob_path(self, content_hash):
+        return os.path.join(self.cache_dir, 'blobs', content_hash[:2], content_hash + '.html.gz')
+
+    def get_meta(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content_hash, size, fetched_at, etag, last_modified FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ('content_hash', 'size', 'fetched_at', 'etag', 'last_modified')
+        return dict(zip(keys, row))
+
+    def is_fresh(self, meta):
+        return meta is not None and time.time() - meta['fetched_at'] < self.ttl
+
+    def read_blob(self, content_hash):
+        return read_snapshot(self.blob_path(content_hash))
+
+    def get(self, url, allow_stale=False):
+        """Returns the cached HTML for `url`, or None if missing (or expired unless allow_stale)."""
+        meta = self.get_meta(url)
+        if meta is None or (not allow_stale and not self.is_fresh(meta)):
+            return None
+        try:
+            html = self.read_blob(meta['content_hash'])
+        except OSError:
+            return None
+        with self._lock:
+            self._db.execute("UPDATE pages SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        return html
+
+    def put(self, url, html, etag=None, last_modified=None):
+        data = html.encode('utf-8')
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(content_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, content_hash, os.path.getsize(path), now, now, etag, last_modified),
+            )
+            self._db.commit()
+            if old and old[0] != content_hash:
+                self._drop_unreferenced_blob(old[0])
+        return content_hash
+
+    def touch(self, url):
+        """Marks a snapshot as re-validated (e.g. after a 304) without rewriting it."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE pages SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+            self._db.commit()
+
+    def _drop_unreferenced_blob(self, content_hash):
+        in_use = self._db.execute("SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+        if in_use:
+            return False
+        try:
+            os.remove(self.blob_path(content_hash))
+        except OSError:
+            pass
+        return True
+
+    def snapshots(self):
+        """(url, blob path) for every cached page, in URL order."""
+        with self._lock:
+            rows = self._db.execute("SELECT url, content_hash FROM pages ORDER BY url").fetchall()
+        return [(url, self.blob_path(content_hash)) for url, content_hash in rows]
+
+    def urls(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT url FROM pages ORDER BY url")]
+
+    def evict(self, max_age=None):
+        """
+        Drops snapshots older than `max_age` seconds (if given), then removes
+        least recently used entries until the cache fits in max_bytes.
+        Returns the number of URLs evicted.
+        """
+        evicted = 0
+        with self._lock:
+            if max_age is not None:
+                cutoff = time.time() - max_age
+                stale = self._db.execute("SELECT url, content_hash FROM pages WHERE fetched_at < ?", (cutoff,)).fetchall()
+                for url, content_hash in stale:
+                    self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                    self._drop_unreferenced_blob(content_hash)
+                    evicted += 1
+
+            # Blobs shared by several URLs are counted once.
+            total = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT content_hash, size FROM pages)"
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._db.execute("SELECT url, content_hash, size FROM pages ORDER BY last_access").fetchall()
+                for url, content_hash, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                    if self._drop_unreferenced_blob(content_hash):
+                        total -= size
+                    evicted += 1
+            self._db.commit()
+        return evicted
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CachingFetcher:
+    """
+    Serves fresh snapshots from a PageCache and stores everything it fetches.
+    Stale snapshots that carry an ETag or Last-Modified are revalidated with
+    a conditional request, so an unchanged page costs a 304 instead of a
+    full download. Wrap it around the throttled fetcher so cache hits never
+    wait for a token.
+    """
+
+    def __init__(self, fetcher, cache):
+        self.fetcher = fetcher
+        self.cache = cache
+        self.last_headers = {}
+
+    def fetch(self, url, ready_selector=None, ready_js=None):
+        meta = self.cache.get_meta(url)
+        if self.cache.is_fresh(meta):
+            html = self.cache.get(url)
+            if html is not None:
+                self.last_headers = {}
+                METRICS.incr('cache_hits')
+                return html
+        etag = meta['etag'] if meta else None
+        last_modified = meta['last_modified'] if meta else None
+        html = self.fetcher.fetch_if_modified(url, ready_selector, ready_js, etag, last_modified)
+        headers = self.last_headers = self.fetcher.last_headers
+        if html is None:
+            # 304 Not Modified: the snapshot we hold is still current.
+            self.cache.touch(url)
+            html = self.cache.get(url, allow_stale=True)
+            if html is not None:
+                return html
+            html = self.fetcher.fetch(url, ready_selector, ready_js)
+            headers = self.last_headers = self.fetcher.last_headers
+        self.cache.put(url, html, headers.get('ETag'), headers.get('Last-Modified'))
+        return html
+
+    def fetch_if_modified(self, url, ready_selector=None, ready_js=None, etag=None, last_modified=None):
+        return self.fetch(url, ready_selector, ready_js)
+
+    def close(self):
+        self.fetcher.close()
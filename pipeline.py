@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from fetchers import create_fetcher
+from throttle import PolitenessScheduler
+from block_jsonl import open_writer
+from metrics import METRICS, StageStats
+from retry import ParseError
+
+# --- Configuration ---
+FETCH_WORKERS = 4   # concurrent page fetchers (each owns one browser or HTTP session)
+PARSE_WORKERS = os.cpu_count() or 2   # processes running the BeautifulSoup extraction
+QUEUE_SIZE = 32   # max pages / records buffered between two stages
+WRITE_BATCH = 50   # records appended to the output per write
+FLUSH_INTERVAL = 5.0   # seconds before a partial batch is written anyway
+REPORT_INTERVAL = 30.0   # seconds between progress reports
+
+
+class CrawlPipeline:
+    """
+    Fetch -> parse -> write, with each stage running concurrently:
+
+      fetch workers (threads)  --html_queue-->  parse workers (process pool)
+                               --record_queue-->  one batching writer
+
+    Both queues are bounded, so a slow stage applies back-pressure instead of
+    buffering the whole crawl in memory. `parse_func(html, url)` must be a
+    module-level function (it is pickled to the worker processes) returning a
+    record dict, a list of record dicts, or None. Nothing is retried; every
+    failed URL is reported through `on_failure(url, exc)`, with parse
+    failures (and None results) as ParseError.
+    """
+
+    def __init__(self, parse_func, output_file, engine='selenium', ready_selector=None, ready_js=None,
+                 fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS, queue_size=QUEUE_SIZE,
+                 write_batch=WRITE_BATCH, dedup_key=None, skip_keys=None, cache=None, on_flush=None,
+                 on_failure=None, scheduler=None):
+        self.parse_func = parse_func
+        self.output_file = output_file
+        self.engine = engine
+        self.ready_selector = ready_selector
+        self.ready_js = ready_js
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.write_batch = write_batch
+        self.dedup_key = dedup_key
+        self.seen_keys = set(skip_keys or ())
+        self.scheduler = scheduler or PolitenessScheduler()
+        self.cache = cache
+        self.on_flush = on_flush
+        self.on_failure = on_failure
+        self.stats = {'fetch': StageStats(), 'parse': StageStats(), 'write': StageStats()}
+        self.failed = 0
+        self.written = 0
+        self.started = None
+        self.url_queue = self.html_queue = self.record_queue = None
+
+    def snapshot(self):
+        """Queue depths and per-stage latencies, safe to call while the pipeline runs."""
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {
+            'elapsed_s': round(elapsed, 1),
+            'queue_depth': {
+                'urls': self.url_queue.qsize() if self.url_queue else 0,
+                'html': self.html_queue.qsize() if self.html_queue else 0,
+                'records': self.record_queue.qsize() if self.record_queue else 0,
+            },
+            'stages': {name: s.as_dict() for name, s in self.stats.items()},
+            'written': self.written,
+            'failed': self.failed,
+            'host_rates': self.scheduler.rates(),
+        }
+
+    def _failed(self, url, exc):
+        self.failed += 1
+        if self.on_failure is not None:
+            self.on_failure(url, exc)
+
+    async def _fetch_worker(self, thread_pool):
+        loop = asyncio.get_running_loop()
+        fetcher = create_fetcher(self.engine, scheduler=self.scheduler, cache=self.cache)
+        try:
+            while True:
+                try:
+                    url = self.url_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                started = time.monotonic()
+                try:
+                    html = await loop.run_in_executor(
+                        thread_pool, fetcher.fetch, url, self.ready_selector, self.ready_js
+                    )
+                except Exception as e:
+                    print(f"  - Fetch failed for {url}: {e}")
+                    self._failed(url, e)
+                    continue
+                self.stats['fetch'].record(time.monotonic() - started)
+                await self.html_queue.put((url, html))
+        finally:
+            await loop.run_in_executor(thread_pool, fetcher.close)
+
+    async def _parse_worker(self, process_pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.html_queue.get()
+            if item is None:
+                break
+            url, html = item
+            started = time.monotonic()
+            try:
+                result = await loop.run_in_executor(process_pool, self.parse_func, html, url)
+            except Exception as e:
+                print(f"  - Parse failed for {url}: {e}")
+                self._failed(url, ParseError(f"{type(e).__name__}: {e}"))
+                continue
+            self.stats['parse'].record(time.monotonic() - started)
+            METRICS.observe('parse', time.monotonic() - started)
+            if result is None:
+                self._failed(url, ParseError("no record"))
+                continue
+            for record in (result if isinstance(result, list) else [result]):
+                await self.record_queue.put(record)
+
+    def _write_batch(self, writer, batch):
+        started = time.monotonic()
+        writer.write_many(batch)
+        writer.flush()
+        self.stats['write'].record(time.monotonic() - started)
+        self.written += len(batch)
+
+    def _is_new(self, record):
+        key = record.get(self.dedup_key) if self.dedup_key else None
+        if key is None:
+            return True
+        if key in self.seen_keys:
+            return False
+        self.seen_keys.add(key)
+        return True
+
+    async def _writer(self):
+        batch = []
+        with open_writer(self.output_file, flush_records=self.write_batch, on_flush=self.on_flush) as writer:
+            while True:
+                try:
+                    record = await asyncio.wait_for(self.record_queue.get(), FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Nothing arrived for a while; don't sit on a partial batch.
+                    if batch:
+                        self._write_batch(writer, batch)
+                        batch = []
+                    continue
+                if record is None:
+                    break
+                if self._is_new(record):
+                    batch.append(record)
+                if len(batch) >= self.write_batch:
+                    self._write_batch(writer, batch)
+                    batch = []
+            if batch:
+                self._write_batch(writer, batch)
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(REPORT_INTERVAL)
+            print(f"  [pipeline] {json.dumps(self.snapshot())}")
+
+    async def run(self, urls):
+        self.started = time.monotonic()
+        self.url_queue = asyncio.Queue()
+        self.html_queue = asyncio.Queue(self.queue_size)
+        self.record_queue = asyncio.Queue(self.queue_size)
+        for url in urls:
+            self.url_queue.put_nowait(url)
+
+        with ThreadPoolExecutor(self.fetch_workers) as thread_pool, \
+                ProcessPoolExecutor(self.parse_workers) as process_pool:
+            reporter = asyncio.create_task(self._reporter())
+            writer = asyncio.create_task(self._writer())
+            parsers = [asyncio.create_task(self._parse_worker(process_pool)) for _ in range(self.parse_workers)]
+            fetchers = [asyncio.create_task(self._fetch_worker(thread_pool)) for _ in range(self.fetch_workers)]
+            drain = asyncio.create_task(self._drain(fetchers, parsers))
+
+            # A stage that dies (e.g. the writer on a full disk) would leave the others blocked on
+            # full queues; the first failure cancels everything and is re-raised.
+            done, _ = await asyncio.wait([drain, writer], return_when=asyncio.FIRST_EXCEPTION)
+            failure = next((task.exception() for task in done if task.exception()), None)
+            if failure is not None:
+                tasks = [drain, writer, *parsers, *fetchers]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            reporter.cancel()
+            if failure is not None:
+                raise failure
+
+        return self.snapshot()
+
+    async def _drain(self, fetchers, parsers):
+        """Shuts the stages down in order once the fetchers have run out of URLs."""
+        await asyncio.gather(*fetchers)
+        for _ in parsers:
+            await self.html_queue.put(None)
+        await asyncio.gather(*parsers)
+        await self.record_queue.put(None)
+
+
+def run_pipeline(urls, parse_func, output_file, **options):
+    """Runs a CrawlPipeline over `urls` to completion and returns its final snapshot."""
+    pipeline = CrawlPipeline(parse_func, output_file, **options)
+    snapshot = asyncio.run(pipeline.run(urls))
+    print(f"  [pipeline] finished: {json.dumps(snapshot)}")
+    return snapshot
@@ -0,0 +1,328 @@
+import os
+import json
+import hashlib
+import sqlite3
+import argparse
+import threading
+
+from export import parse_range, parse_share, text_or_none
+from deduplicate import OUTPUT_FILE as LISTING_FILE
+from scraper import OUTPUT_FILE as PROFILE_FILE
+
+# --- Configuration ---
+INDEX_DB = 'clutch_index.sqlite3'
+SOURCES = ((LISTING_FILE, 'listing'), (PROFILE_FILE, 'profile'))
+READ_CHUNK = 4 * 1024 * 1024   # bytes of new JSONL ingested per transaction
+FINGERPRINT_BYTES = 64 * 1024   # ingested bytes hashed to notice a source rewritten in place
+DEFAULT_LIMIT = 50
+
+
+class ProfileIndex:
+    """
+    Local query store over the listing and profile JSONL outputs.
+
+    Each company is one row keyed by profile_url, combining its listing card
+    (typed hourly rate and team size ranges, description) with its profile
+    (summary, locations, industry and service shares). Secondary indexes
+    cover the rate band, team size, locations, industries_focus and
+    service_lines; an FTS5 table covers name, summary_description and
+    description.
+
+    update() ingests only what was appended to each source since the last
+    call (tracked as a byte offset per file), so the index follows a running
+    scrape without rebuilds. A source that was truncated, replaced or
+    rewritten in place (same inode, e.g. by deduplicate.py) is re-read from
+    the start: the first and last FINGERPRINT_BYTES before the offset must
+    still hash the same. Later lines for a profile_url overwrite earlier
+    ones, as everywhere else in the crawl.
+    """
+
+    def __init__(self, path=INDEX_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS companies (
+                id INTEGER PRIMARY KEY,
+                profile_url TEXT NOT NULL UNIQUE,
+                name TEXT,
+                website TEXT,
+                hourly_rate_min INTEGER,
+                hourly_rate_max INTEGER,
+                min_project_size INTEGER,
+                team_size_min INTEGER,
+                team_size_max INTEGER,
+                description TEXT,
+                summary_description TEXT,
+                card TEXT,
+                profile TEXT
+            );
+            CREATE INDEX IF NOT EXISTS companies_rate ON companies (hourly_rate_max, hourly_rate_min);
+            CREATE INDEX IF NOT EXISTS companies_team ON companies (team_size_min, team_size_max);
+
+            CREATE TABLE IF NOT EXISTS locations (
+                company_id INTEGER NOT NULL,
+                location TEXT NOT NULL COLLATE NOCASE,
+                country TEXT COLLATE NOCASE
+            );
+            CREATE INDEX IF NOT EXISTS locations_location ON locations (location);
+            CREATE INDEX IF NOT EXISTS locations_country ON locations (country);
+            CREATE INDEX IF NOT EXISTS locations_company ON locations (company_id);
+
+            CREATE TABLE IF NOT EXISTS shares (
+                company_id INTEGER NOT NULL,
+                chart TEXT NOT NULL,
+                name TEXT NOT NULL COLLATE NOCASE,
+                percent REAL
+            );
+            CREATE INDEX IF NOT EXISTS shares_name ON shares (chart, name, percent);
+            CREATE INDEX IF NOT EXISTS shares_company ON shares (company_id);
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts
+                USING fts5(name, summary_description, description, tokenize = 'porter unicode61');
+
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                inode INTEGER,
+                offset INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        columns = {name for _, name, *_ in self._db.execute("PRAGMA table_info(sources)")}
+        for column, kind in (('mtime', 'REAL'), ('fingerprint', 'TEXT')):
+            if column not in columns:   # indexes built before rewrite detection
+                self._db.execute(f"ALTER TABLE sources ADD COLUMN {column} {kind}")
+        self._db.commit()
+
+    # --- Ingest ---
+
+    def update(self, sources=SOURCES):
+        """Ingests every line appended to `sources` since the last update. Returns the number of records."""
+        total = 0
+        for path, kind in sources:
+            if os.path.exists(path):
+                total += self._ingest(path, kind)
+        return total
+
+    @staticmethod
+    def _fingerprint(f, offset):
+        """Hash of the first and last FINGERPRINT_BYTES before `offset`; those end in a newline."""
+        digest = hashlib.sha1()
+        for start in sorted({0, max(0, offset - FINGERPRINT_BYTES)}):
+            f.seek(start)
+            digest.update(f.read(min(FINGERPRINT_BYTES, offset - start)))
+        return digest.hexdigest()
+
+    def _resume_offset(self, f, path, st):
+        """Where ingestion of `path` continues: the stored offset if the ingested prefix is unchanged, else 0."""
+        with self._lock:
+            row = self._db.execute("SELECT inode, offset, mtime, fingerprint FROM sources WHERE path = ?",
+                                   (path,)).fetchone()
+        if not row or row[0] != st.st_ino or row[1] > st.st_size:
+            return 0
+        inode, offset, mtime, fingerprint = row
+        if offset == st.st_size and mtime == st.st_mtime:
+            return offset
+        if offset and self._fingerprint(f, offset) != fingerprint:
+            print(f"{path} was rewritten since the last update; re-indexing it from the start.")
+            return 0
+        return offset
+
+    def _ingest(self, path, kind):
+        st = os.stat(path)
+        ingested = 0
+        with open(path, 'rb') as f:
+            offset = self._resume_offset(f, path, st)
+            if offset == st.st_size:
+                return 0
+            f.seek(offset)
+            while True:
+                chunk = f.read(READ_CHUNK)
+                # Only complete lines; a partly written last line is picked up next time.
+                end = chunk.rfind(b'\n') + 1
+                if not end:
+                    break
+                records = []
+                for line in chunk[:end].splitlines():
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+                offset += end
+                fingerprint = self._fingerprint(f, offset)
+                f.seek(offset)
+                with self._lock:
+                    for record in records:
+                        if record.get('profile_url', 'N/A') != 'N/A':
+                            self._upsert(record, kind)
+                    self._db.execute(
+                        "INSERT INTO sources (path, inode, offset, mtime, fingerprint) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT(path) DO UPDATE SET inode = excluded.inode, offset = excluded.offset, "
+                        "mtime = excluded.mtime, fingerprint = excluded.fingerprint",
+                        (path, st.st_ino, offset, st.st_mtime, fingerprint),
+                    )
+                    self._db.commit()
+                ingested += len(records)
+        if ingested:
+            print(f"Indexed {ingested} {kind} records from {path}.")
+        return ingested
+
+    def _upsert(self, record, kind):
+        db = self._db
+        url = record['profile_url']
+        if kind == 'listing':
+            rate_min, rate_max = parse_range(record.get('hourly_rate'))
+            team_min, team_max = parse_range(record.get('team_size'))
+            db.execute(
+                "INSERT INTO companies (profile_url, name, hourly_rate_min, hourly_rate_max, min_project_size, "
+                "team_size_min, team_size_max, description, card) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(profile_url) DO UPDATE SET name = COALESCE(companies.name, excluded.name), "
+                "hourly_rate_min = excluded.hourly_rate_min, hourly_rate_max = excluded.hourly_rate_max, "
+                "min_project_size = excluded.min_project_size, team_size_min = excluded.team_size_min, "
+                "team_size_max = excluded.team_size_max, description = excluded.description, card = excluded.card",
+                (url, text_or_none(record.get('name')), rate_min, rate_max,
+                 parse_range(record.get('min_project_size'))[0], team_min, team_max,
+                 text_or_none(record.get('description')), json.dumps(record, ensure_ascii=False)),
+            )
+            company_id = db.execute("SELECT id FROM companies WHERE profile_url = ?", (url,)).fetchone()[0]
+        else:
+            db.execute(
+                "INSERT INTO companies (profile_url, name, website, summary_description, profile) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(profile_url) DO UPDATE SET name = COALESCE(excluded.name, companies.name), "
+                "website = excluded.website, summary_description = excluded.summary_description, "
+                "profile = excluded.profile",
+                (url, text_or_none(record.get('name')), text_or_none(record.get('website')),
+                 text_or_none(record.get('summary_description')), json.dumps(record, ensure_ascii=False)),
+            )
+            company_id = db.execute("SELECT id FROM companies WHERE profile_url = ?", (url,)).fetchone()[0]
+            db.execute("DELETE FROM locations WHERE company_id = ?", (company_id,))
+            db.executemany(
+                "INSERT INTO locations (company_id, location, country) VALUES (?, ?, ?)",
+                ((company_id, loc, loc.rpartition(',')[2].strip()) for loc in record.get('locations') or []),
+            )
+            db.execute("DELETE FROM shares WHERE company_id = ?", (company_id,))
+            for chart in ('industries_focus', 'service_lines', 'client_focus'):
+                db.executemany(
+                    "INSERT INTO shares (company_id, chart, name, percent) VALUES (?, ?, ?, ?)",
+                    ((company_id, chart, s['name'], s['percent'])
+                     for s in map(parse_share, record.get(chart) or [])),
+                )
+        name, summary, description = db.execute(
+            "SELECT name, summary_description, description FROM companies WHERE id = ?", (company_id,)).fetchone()
+        db.execute("INSERT OR REPLACE INTO companies_fts (rowid, name, summary_description, description) "
+                   "VALUES (?, ?, ?, ?)", (company_id, name, summary, description))
+
+    # --- Queries ---
+
+    def query(self, max_rate=None, min_rate=None, min_team=None, max_team=None, location=None,
+              industry=None, service=None, min_share=0.0, text=None, limit=DEFAULT_LIMIT):
+        """
+        Companies matching every given filter, best full-text match first
+        when `text` is given (FTS5 syntax: words, "phrases", OR, prefix*).
+        Rates and team sizes compare against the range bounds: max_rate=25
+        means the whole band is at most $25/hr, min_team=250 means at least
+        250 people. `location` matches a location prefix ("Bengaluru") or a
+        country ("India"); `industry` and `service` match a chart slice by
+        name with at least `min_share` percent. Returns combined records
+        (card fields, then profile fields).
+        """
+        joins, where, params = [], [], []
+        if text:
+            joins.append("JOIN companies_fts ON companies_fts.rowid = c.id")
+            where.append("companies_fts MATCH ?")
+            params.append(text)
+        if max_rate is not None:
+            where.append("c.hourly_rate_max <= ?")
+            params.append(max_rate)
+        if min_rate is not None:
+            where.append("c.hourly_rate_min >= ?")
+            params.append(min_rate)
+        if min_team is not None:
+            where.append("c.team_size_min >= ?")
+            params.append(min_team)
+        if max_team is not None:
+            where.append("c.team_size_max <= ?")
+            params.append(max_team)
+        if location:
+            where.append("c.id IN (SELECT company_id FROM locations WHERE location LIKE ? OR country = ?)")
+            params += [location + '%', location]
+        for chart, name in (('industries_focus', industry), ('service_lines', service)):
+            if name:
+                where.append("c.id IN (SELECT company_id FROM shares WHERE chart = ? AND name = ? AND percent >= ?)")
+                params += [chart, name, min_share]
+        sql = "SELECT c.profile_url, c.card, c.profile FROM companies c " + " ".join(joins)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ("bm25(companies_fts)" if text else "c.id") + " LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [self._combine(url, card, profile) for url, card, profile in rows]
+
+    @staticmethod
+    def _combine(url, card, profile):
+        record = {'profile_url': url}
+        for part in (card, profile):
+            if part:
+                record.update((k, v) for k, v in json.loads(part).items() if k != 'profile_url')
+        return record
+
+    def get(self, profile_url):
+        with self._lock:
+            row = self._db.execute("SELECT profile_url, card, profile FROM companies WHERE profile_url = ?",
+                                   (profile_url,)).fetchone()
+        return self._combine(*row) if row else None
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the scraped companies through a local index.")
+    parser.add_argument('--db', default=INDEX_DB, help="index database")
+    parser.add_argument('--max-rate', type=int, help="hourly rate band entirely at or below this many dollars")
+    parser.add_argument('--min-rate', type=int, help="hourly rate band entirely at or above this many dollars")
+    parser.add_argument('--min-team', type=int, help="team size of at least this many people")
+    parser.add_argument('--max-team', type=int, help="team size of at most this many people")
+    parser.add_argument('--location', help="location prefix or country, e.g. Bengaluru or India")
+    parser.add_argument('--industry', help="industry focus slice, e.g. Healthcare")
+    parser.add_argument('--service', help="service line slice, e.g. 'Custom Software Development'")
+    parser.add_argument('--min-share', type=float, default=0.0,
+                        help="minimum percent for --industry / --service")
+    parser.add_argument('--text', help="full-text search over name, summary and description")
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT)
+    parser.add_argument('--json', action='store_true', help="print full records as JSON lines")
+    parser.add_argument('--no-update', action='store_true',
+                        help="query the index as is instead of first ingesting newly appended records")
+    args = parser.parse_args()
+
+    index = ProfileIndex(args.db)
+    try:
+        if not args.no_update:
+            index.update()
+        try:
+            records = index.query(args.max_rate, args.min_rate, args.min_team, args.max_team, args.location,
+                                  args.industry, args.service, args.min_share, args.text, args.limit)
+        except sqlite3.OperationalError as e:
+            parser.error(f"bad --text query: {e}")
+        for record in records:
+            if args.json:
+                print(json.dumps(record, ensure_ascii=False))
+            else:
+                print(f"{record.get('name', 'N/A')}\t{record.get('hourly_rate', 'N/A')}\t"
+                      f"{record.get('team_size', 'N/A')}\t{record['profile_url']}")
+        if not args.json:
+            print(f"{len(records)} of {index.count()} companies matched.")
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
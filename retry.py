@@ -0,0 +1,157 @@
+import re
+import json
+import time
+import heapq
+import random
+
+import requests
+from selenium.common.exceptions import TimeoutException
+
+from metrics import METRICS
+
+# --- Configuration ---
+DEAD_LETTER_FILE = 'dead_letters.jsonl'
+RETRY_BUDGET = 300   # retries allowed per scheduler run across all URLs, so a bad night can't loop forever
+MAX_DELAY = 3600.0   # seconds; cap on a single backoff
+
+# Failure classes
+TIMEOUT = 'timeout'
+BLOCKED = 'blocked'   # captcha / challenge page, HTTP 403 or 429
+NOT_FOUND = 'not_found'   # 404 / 410, i.e. a removed profile
+PARSE_ERROR = 'parse_error'
+ERROR = 'error'   # anything else: connection resets, browser crashes, 5xx
+
+# Failure class -> (retries, base delay in seconds). The delay doubles per
+# attempt. A removed page is never retried; a block page backs off long
+# enough for the challenge to expire.
+RETRY_POLICIES = {
+    TIMEOUT: (3, 30.0),
+    BLOCKED: (3, 300.0),
+    NOT_FOUND: (0, 0.0),
+    PARSE_ERROR: (1, 60.0),
+    ERROR: (3, 30.0),
+}
+
+_NOT_FOUND_TITLE = re.compile(r'<title>[^<]*(?:404|not found)[^<]*</title>', re.IGNORECASE)
+
+
+class BlockedPage(Exception):
+    """The server answered with a captcha / challenge page instead of content."""
+
+
+class PageNotFound(Exception):
+    """The page does not exist (any more)."""
+
+
+class ParseError(Exception):
+    """A page was fetched but could not be turned into a record."""
+
+
+def is_not_found_page(html):
+    return _NOT_FOUND_TITLE.search(html[:5000]) is not None
+
+
+def classify(exc):
+    if isinstance(exc, (TimeoutException, requests.Timeout)):
+        return TIMEOUT
+    if isinstance(exc, BlockedPage):
+        return BLOCKED
+    if isinstance(exc, PageNotFound):
+        return NOT_FOUND
+    if isinstance(exc, ParseError):
+        return PARSE_ERROR
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        if status in (404, 410):
+            return NOT_FOUND
+        if status in (403, 429):
+            return BLOCKED
+    return ERROR
+
+
+def backoff(attempt, base, cap=MAX_DELAY):
+    """Exponential backoff with equal jitter: somewhere in the upper half of base * 2**(attempt-1)."""
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RetryScheduler:
+    """
+    Runs `attempt(url)` over a list of URLs without ever giving up on the
+    whole run. A failure is classified (timeout, blocked, not_found,
+    parse_error, error) and the URL is re-queued after an exponential
+    backoff with jitter, interleaved with first attempts of other URLs.
+    URLs that run out of retries for their class, or that fail once the
+    run's retry budget is spent, go to the dead-letter list: appended to
+    DEAD_LETTER_FILE and reported through `on_dead(url, kind, exc)`.
+    `on_retry(url, kind, exc)` is called for every failure that will be
+    retried.
+    """
+
+    def __init__(self, budget=RETRY_BUDGET, policies=None, on_retry=None, on_dead=None,
+                 dead_letter_file=DEAD_LETTER_FILE, sleep=time.sleep):
+        self.budget = budget
+        self.policies = policies or RETRY_POLICIES
+        self.on_retry = on_retry
+        self.on_dead = on_dead
+        self.dead_letter_file = dead_letter_file
+        self.sleep = sleep
+        self.dead_letters = []
+        self.stats = {'ok': 0, 'retried': 0, 'dead': 0}
+
+    def _failed(self, url, attempt, exc, delayed):
+        kind = classify(exc)
+        METRICS.incr(f'failures_{kind}')
+        retries, base = self.policies.get(kind, self.policies[ERROR])
+        if attempt <= retries and self.budget > 0:
+            self.budget -= 1
+            self.stats['retried'] += 1
+            delay = backoff(attempt, base)
+            print(f"    {kind} on {url} ({exc}); retry {attempt}/{retries} in {delay:.0f}s.")
+            heapq.heappush(delayed, (time.monotonic() + delay, url, attempt + 1))
+            if self.on_retry is not None:
+                self.on_retry(url, kind, exc)
+            return
+        reason = 'retry budget spent' if attempt <= retries else f'{kind} after {attempt} attempts'
+        print(f"    Giving up on {url}: {reason} ({exc}).")
+        self._dead(url, kind, exc, attempt)
+
+    def _dead(self, url, kind, exc, attempts):
+        self.stats['dead'] += 1
+        letter = {'url': url, 'kind': kind, 'error': str(exc), 'attempts': attempts, 'ts': round(time.time(), 3)}
+        self.dead_letters.append(letter)
+        if self.dead_letter_file:
+            with open(self.dead_letter_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(letter, ensure_ascii=False) + '\n')
+        if self.on_dead is not None:
+            self.on_dead(url, kind, exc)
+
+    def run(self, urls, attempt):
+        """
+        `urls` is consumed lazily, so several schedulers (one per worker
+        thread) can share one generator over a common queue.
+        """
+        fresh = iter(urls)
+        delayed = []   # heap of (ready_at, url, attempt number)
+        exhausted = False
+        while True:
+            if delayed and (exhausted or delayed[0][0] <= time.monotonic()):
+                ready_at, url, n = heapq.heappop(delayed)
+                wait = ready_at - time.monotonic()
+                if wait > 0:
+                    # Only retries are left; sleep until the earliest is due.
+                    self.sleep(wait)
+            else:
+                url, n = next(fresh, None), 1
+                if url is None:
+                    exhausted = True
+                    if not delayed:
+                        break
+                    continue
+            try:
+                attempt(url)
+            except Exception as e:
+                self._failed(url, n, e, delayed)
+            else:
+                self.stats['ok'] += 1
+        return self.stats
@@ -1,227 +1,617 @@
-import time
 import json
 import re
 import os
-import random
-import undetected_chromedriver as uc
+import argparse
+import threading
+import queue
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
 
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from selenium_stealth import stealth
+from fetchers import create_fetcher
+from throttle import PolitenessScheduler
+from pipeline import run_pipeline
+from page_cache import PageCache, read_snapshot, CACHE_TTL
+from ListingPageScraper import parse_listing_page, OUTPUT_FILE as LISTING_OUTPUT_FILE
+from incremental import FingerprintStore, plan_refresh, MAX_PROFILE_AGE
+from jsonl_writer import JsonlWriter, repair_jsonl
+from block_jsonl import is_block_file, block_path, open_writer, open_index
+from history import HistoryStore
+from crawl_state import CrawlState
+from extraction import extract_profile, extract_cards, PROFILE_SCHEMA, CLUTCH_BASE_URL
+from browser_extraction import fetch_cards, profile_call, finish_profile
+from metrics import METRICS
+from retry import RetryScheduler, ParseError, classify, NOT_FOUND, PARSE_ERROR, DEAD_LETTER_FILE
 
 # --- Configuration ---
-START_URL = "https://clutch.co/it-services/india"
+START_URL = f"{CLUTCH_BASE_URL}/it-services/india"
 URL_FILE = 'profile_urls.json'
 OUTPUT_FILE = 'clutch_full_profiles_final.jsonl'
 LISTING_PAGES_TO_SCRAPE = 115
-SETTLE_WAIT = 2   # seconds to let a profile page settle
+NUM_WORKERS = 1   # browser workers for profile scraping (1 = sequential)
+PER_HOST_CONCURRENCY = 2   # max simultaneous page loads against one host
+FETCH_ENGINE = 'selenium'   # 'selenium', 'http' (HTTP with browser fallback) or 'http-only'
 
 
-def scrape_company_profile(driver, profile_url):
-    print(f"\n  -> Scraping profile: {profile_url}")
-    company_data = {'profile_url': profile_url}
-
-    try:
-        driver.get(profile_url)
-        time.sleep(SETTLE_WAIT)
-
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, '.profile-header'))
-        )
-        soup = BeautifulSoup(driver.page_source, 'lxml')
-
-        # --- Core fields ---
-        header = soup.select_one('.profile-header')
-        summary_section = soup.select_one('#profile-summary')
-
-        # Name
-        name_tag = soup.select_one('h1.profile-header__title')
-        company_data['name'] = name_tag.get_text(strip=True) if name_tag else 'N/A'
-
-        # Summary
-        # Try normal extraction
-        summary_tag = soup.select_one(".profile-summary__text")
-        if summary_tag:
-            company_data["summary_description"] = summary_tag.get_text(separator="\n", strip=True)
-        else:
-            # Fallback: Check JSON-LD
-            json_ld_tag = soup.find("script", type="application/ld+json")
-            if json_ld_tag:
-                try:
-                    data = json.loads(json_ld_tag.string.strip())
-                    company_data["summary_description"] = data.get("description", "N/A")
-                except Exception:
-                    company_data["summary_description"] = "N/A"
-            else:
-                company_data["summary_description"] = "N/A"
+def parse_company_profile(html, profile_url, fields=None):
+    return extract_profile(html, profile_url, fields)
 
 
-        # Website
-        website_tag = soup.select_one("ul.profile-short-actions a[title='Visit website']")
-        if website_tag and website_tag.has_attr("href"):
-            href = website_tag["href"]
-            # Try to get the real website from the `u` parameter
-            parsed = urlparse(href)
-            query = parse_qs(parsed.query)
-            real_website = query.get("u", [None])[0] or query.get("provider_website", [None])[0]
-            company_data["website"] = real_website if real_website else href
+def parse_company_profile_soup(html, profile_url, features='lxml'):
+    # Reference implementation; PROFILE_SCHEMA must produce exactly this record.
+    company_data = {'profile_url': profile_url}
+    soup = BeautifulSoup(html, features)
+
+    # --- Core fields ---
+    header = soup.select_one('.profile-header')
+    summary_section = soup.select_one('#profile-summary')
+
+    # Name
+    name_tag = soup.select_one('h1.profile-header__title')
+    company_data['name'] = name_tag.get_text(strip=True) if name_tag else 'N/A'
+
+    # Summary
+    # Try normal extraction
+    summary_tag = soup.select_one(".profile-summary__text")
+    if summary_tag:
+        company_data["summary_description"] = summary_tag.get_text(separator="\n", strip=True)
+    else:
+        # Fallback: Check JSON-LD
+        json_ld_tag = soup.find("script", type="application/ld+json")
+        if json_ld_tag:
+            try:
+                data = json.loads(json_ld_tag.string.strip())
+                company_data["summary_description"] = data.get("description", "N/A")
+            except Exception:
+                company_data["summary_description"] = "N/A"
         else:
-            company_data["website"] = "N/A"
-
-
-        # Summary details
-        summary_details = {}
-        details_section = soup.select('ul.profile-summary__details li.profile-summary__detail, ul.profile-summary__details li.profile-summary__detail-clickable')
-        for detail in details_section:
-            label_tag = detail.select_one('.profile-summary__detail-label')
-            title_tag = detail.select_one('.profile-summary__detail-title')
-            if label_tag and title_tag:
-                label = label_tag.get_text(strip=True)
-                title = " ".join(title_tag.get_text(strip=True).split())
-                summary_details[label] = title
-
-        company_data['summary_details'] = summary_details
-
-
-        # Languages
-        languages = []
-        lang_modal = soup.select_one('#profile-languages-modal')
-        if lang_modal:
-            languages = [li.text.strip() for li in lang_modal.select('.profile-modal--list li')]
-        company_data['languages'] = languages
-
-        # Locations
-        locations = []
-        loc_modal = soup.select_one('#profile-locations-modal')
-        if loc_modal:
-            locations = [li.text.strip() for li in loc_modal.select('.profile-modal--list li')]
-        company_data['locations'] = locations
-
-        # Chart data
-        service_lines, focus_areas, industries, clients = [], [], [], []
-        script_tag = soup.find('script', string=lambda t: t and 'window.chartPie' in t)
-        if script_tag:
-            m = re.search(r'window\.chartPie\s*=\s*({.*?});', script_tag.string, re.DOTALL)
-            if m:
-                try:
-                    chart_data = json.loads(m.group(1))
-                    if 'service_provided' in chart_data:
-                        service_lines = [f"{s['name']}: {s['percent']*100:.1f}%" for s in chart_data['service_provided']['slices']]
-                    if 'industries' in chart_data:
-                        industries = [f"{s['name']}: {s['percent']*100:.1f}%" for s in chart_data['industries']['slices']]
-                    if 'clients' in chart_data:
-                        clients = [f"{s['name']}: {s['percent']*100:.1f}%" for s in chart_data['clients']['slices']]
-                    if 'focus' in chart_data:
-                        for cat, data in chart_data['focus']['charts'].items():
-                            focus_areas.append({data.get('legend_title', cat): [f"{s['name']}: {s['percent']*100:.1f}%" for s in data['slices']]})
-                except Exception:
-                    pass
-        company_data.update({
-            'service_lines': service_lines,
-            'focus_breakdown': focus_areas,
-            'industries_focus': industries,
-            'client_focus': clients
-        })
-
-        # Pricing
-        pricing_snapshot = {}
-        pricing = soup.select_one('#pricing-snapshot')
-        if pricing:
-            size = pricing.select_one('#common-project-size-value')
-            fb = pricing.select_one('.pricing-snapshot__clients-feedback-description')
-            pricing_snapshot['most_common_project_size'] = size.text.strip() if size else 'N/A'
-            pricing_snapshot['client_feedback_summary'] = fb.text.strip() if fb else 'N/A'
-        company_data['pricing_snapshot'] = pricing_snapshot
-
-        return company_data
+            company_data["summary_description"] = "N/A"
+
+
+    # Website
+    website_tag = soup.select_one("ul.profile-short-actions a[title='Visit website']")
+    if website_tag and website_tag.has_attr("href"):
+        href = website_tag["href"]
+        # Try to get the real website from the `u` parameter
+        parsed = urlparse(href)
+        query = parse_qs(parsed.query)
+        real_website = query.get("u", [None])[0] or query.get("provider_website", [None])[0]
+        company_data["website"] = real_website if real_website else href
+    else:
+        company_data["website"] = "N/A"
+
+
+    # Summary details
+    summary_details = {}
+    details_section = soup.select('ul.profile-summary__details li.profile-summary__detail, ul.profile-summary__details li.profile-summary__detail-clickable')
+    for detail in details_section:
+        label_tag = detail.select_one('.profile-summary__detail-label')
+        title_tag = detail.select_one('.profile-summary__detail-title')
+        if label_tag and title_tag:
+            label = label_tag.get_text(strip=True)
+            title = " ".join(title_tag.get_text(strip=True).split())
+            summary_details[label] = title
+
+    company_data['summary_details'] = summary_details
+
+
+    # Languages
+    languages = []
+    lang_modal = soup.select_one('#profile-languages-modal')
+    if lang_modal:
+        languages = [li.text.strip() for li in lang_modal.select('.profile-modal--list li')]
+    company_data['languages'] = languages
+
+    # Locations
+    locations = []
+    loc_modal = soup.select_one('#profile-locations-modal')
+    if loc_modal:
+        locations = [li.text.strip() for li in loc_modal.select('.profile-modal--list li')]
+    company_data['locations'] = locations
+
+    # Chart data
+    service_lines, focus_areas, industries, clients = [], [], [], []
+    script_tag = soup.find('script', string=lambda t: t and 'window.chartPie' in t)
+    if script_tag:
+        m = re.search(r'window\.chartPie\s*=\s*({.*?});', script_tag.string, re.DOTALL)
+        if m:
+            try:
+                chart_data = json.loads(m.group(1))
+                if 'service_provided' in chart_data:
+                    service_lines = [f"{s['name']}: {s['percent']*100:.1f}%" for s in chart_data['service_provided']['slices']]
+                if 'industries' in chart_data:
+                    industries = [f"{s['name']}: {s['percent']*100:.1f}%" for s in chart_data['industries']['slices']]
+                if 'clients' in chart_data:
+                    clients = [f"{s['name']}: {s['percent']*100:.1f}%" for s in chart_data['clients']['slices']]
+                if 'focus' in chart_data:
+                    for cat, data in chart_data['focus']['charts'].items():
+                        focus_areas.append({data.get('legend_title', cat): [f"{s['name']}: {s['percent']*100:.1f}%" for s in data['slices']]})
+            except Exception:
+                pass
+    company_data.update({
+        'service_lines': service_lines,
+        'focus_breakdown': focus_areas,
+        'industries_focus': industries,
+        'client_focus': clients
+    })
+
+    # Pricing
+    pricing_snapshot = {}
+    pricing = soup.select_one('#pricing-snapshot')
+    if pricing:
+        size = pricing.select_one('#common-project-size-value')
+        fb = pricing.select_one('.pricing-snapshot__clients-feedback-description')
+        pricing_snapshot['most_common_project_size'] = size.text.strip() if size else 'N/A'
+        pricing_snapshot['client_feedback_summary'] = fb.text.strip() if fb else 'N/A'
+    company_data['pricing_snapshot'] = pricing_snapshot
+
+    return company_data
+
+
+def fetch_company_profile(fetcher, profile_url, fields=None):
+    """Fetches and parses one profile; raises on failure so the caller can classify and retry it."""
+    print(f"\n  -> Scraping profile: {profile_url}")
+    if getattr(fetcher, 'extracts_in_browser', False):
+        raw = fetcher.evaluate(profile_url, '.profile-header', 'window.chartPie', *profile_call(fields))
+        parse = partial(finish_profile, raw)
+    else:
+        html = fetcher.fetch(profile_url, '.profile-header', 'window.chartPie')
+        parse = partial(parse_company_profile, html)
+    with METRICS.timer('parse', url=profile_url):
+        try:
+            return parse(profile_url, fields)
+        except Exception as e:
+            raise ParseError(f"{type(e).__name__}: {e}") from e
+
 
+def scrape_company_profile(fetcher, profile_url, fields=None):
+    try:
+        return fetch_company_profile(fetcher, profile_url, fields)
     except Exception as e:
         print(f"  - Error scraping {profile_url}: {e}")
+        METRICS.incr('profile_none')
         return None
 
 
-def collect_profile_urls(driver):
-    if os.path.exists(URL_FILE):
-        print(f"Found existing {URL_FILE}, loading cached URLs...")
-        with open(URL_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+def parse_profile_links(html):
+    return [card['profile_url'] for card in extract_cards(html, ('profile_url',)) if card['profile_url'] != 'N/A']
 
-    print("Collecting profile URLs from listing pages...")
-    profile_urls = []
 
-    for page_num in range(1, LISTING_PAGES_TO_SCRAPE + 1):
-        url = START_URL if page_num == 1 else f"{START_URL}?page={page_num}"
-        print(f"  - Visiting listing page {page_num}: {url}")
-        driver.get(url)
-        time.sleep(random.uniform(4, 6))
+def listing_page_urls(seed, pages=LISTING_PAGES_TO_SCRAPE):
+    # Zero-based like the site's pagination: the second page is ?page=1.
+    return [seed if page_num == 0 else f"{seed}?page={page_num}" for page_num in range(pages)]
 
-        try:
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'li.provider-list-item h3.provider__title a'))
-            )
-            soup = BeautifulSoup(driver.page_source, 'lxml')
-            links = soup.select('li.provider-list-item h3.provider__title a')
-            new_urls = 0
-            for link in links:
-                if link.has_attr('href'):
-                    full = "https://clutch.co" + link['href'] if link['href'].startswith('/') else link['href']
-                    if full not in profile_urls:
-                        profile_urls.append(full)
-                        new_urls += 1
-            print(f"    Found {new_urls} new URLs. Total: {len(profile_urls)}")
-
-        except TimeoutException:
-            print("    Timeout on this page, skipping further collection.")
-            break
-
-    with open(URL_FILE, 'w', encoding='utf-8') as f:
-        json.dump(profile_urls, f, ensure_ascii=False, indent=2)
-    print(f"Saved {len(profile_urls)} profile URLs to {URL_FILE}")
+
+def collect_profile_urls(fetcher, state, seed=START_URL):
+    state.add(listing_page_urls(seed), 'listing', seed)
+    pending_pages = state.pending('listing', seed)
+    if not pending_pages:
+        profile_urls = state.urls('profile', seed)
+        print(f"All listing pages of {seed} already collected ({len(profile_urls)} profile URLs).")
+        return profile_urls
+
+    print(f"Collecting profile URLs from {len(pending_pages)} listing pages of {seed}...")
+
+    def visit(url):
+        print(f"  - Visiting listing page: {url}")
+        cards = fetch_cards(fetcher, url, 'li.provider-list-item h3.provider__title a', ('profile_url',))
+        links = [card['profile_url'] for card in cards if card['profile_url'] != 'N/A']
+        new_urls = state.add(links, 'profile', seed)
+        state.mark_done(url, 'listing')
+        print(f"    Found {new_urls} new URLs. Total: {sum(state.counts('profile', seed).values())}")
+
+    summary = retry_scheduler(state).run(pending_pages, visit)
+    if summary['dead']:
+        print(f"    {summary['dead']} listing pages dead-lettered; see {DEAD_LETTER_FILE}.")
+
+    profile_urls = state.urls('profile', seed)
+    if seed == START_URL:
+        # Still written for tools that read the flat URL list.
+        with open(URL_FILE, 'w', encoding='utf-8') as f:
+            json.dump(profile_urls, f, ensure_ascii=False, indent=2)
+        print(f"Saved {len(profile_urls)} profile URLs to {URL_FILE}")
     return profile_urls
 
 
-def scrape_all_profiles(driver, profile_urls):
-    print("\nScraping company profiles...")
+def collect_listing_cards(fetcher):
+    print("Crawling listing pages for change detection...")
+    cards = []
+
+    def visit(url):
+        cards.extend(fetch_cards(fetcher, url))
+
+    summary = RetryScheduler().run(listing_page_urls(START_URL), visit)
+    print(f"Collected {len(cards)} listing cards ({summary['dead']} listing pages dead-lettered).")
+    return cards
+
+
+def scrape_profiles_incremental(fetcher, max_age=MAX_PROFILE_AGE):
+    """
+    Re-fetches only profiles whose listing card changed or that are older
+    than `max_age` seconds, and appends a record only when the profile itself
+    changed. Later lines for a profile_url supersede earlier ones.
+    """
+    store = FingerprintStore()
+    cards = collect_listing_cards(fetcher)
+    cards_by_url = {}
+    for card in cards:
+        cards_by_url.setdefault(card['profile_url'], card)
+    refresh = plan_refresh(cards, store, max_age)
+    print(f"\n{len(refresh)} of {len(cards_by_url)} profiles need a refresh.")
+
+    changed = fetched = 0
+    with JsonlWriter(OUTPUT_FILE) as writer:
+        def refresh_profile(url):
+            nonlocal changed, fetched
+            data = fetch_company_profile(fetcher, url)
+            fetched += 1
+            if store.record_profile(data, cards_by_url.get(url)):
+                writer.write(data)
+                changed += 1
+                print(f"  --> Saved changed profile {data.get('name')}")
+            if fetched % 50 == 0:
+                # Fingerprints must never get ahead of the records on disk.
+                writer.checkpoint()
+                store.save()
+
+        RetryScheduler().run(refresh, refresh_profile)
+    store.save()
+    print(f"Incremental refresh complete. {changed} of {len(refresh)} refreshed profiles changed.")
+
+
+def record_history(output_file=OUTPUT_FILE):
+    """Records the profile file, as it stands after this run, in the versioned history store."""
+    store = HistoryStore()
+    try:
+        store.ingest(output_file, 'profile')
+    finally:
+        store.close()
+
+
+def load_scraped_urls(output_file=OUTPUT_FILE):
     scraped_urls = set()
-    if os.path.exists(OUTPUT_FILE):
-        with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
+    if os.path.exists(output_file) and is_block_file(output_file):
+        # The index already lists them; nothing is decompressed.
+        index = open_index(output_file)
+        scraped_urls.update(index.urls())
+        index.close()
+        print(f"Already scraped {len(scraped_urls)} profiles, will skip them.")
+    elif os.path.exists(output_file):
+        repair_jsonl(output_file)
+        with open(output_file, 'r', encoding='utf-8') as f:
             for line in f:
                 try:
                     scraped_urls.add(json.loads(line)['profile_url'])
                 except:
                     pass
         print(f"Already scraped {len(scraped_urls)} profiles, will skip them.")
+    return scraped_urls
+
+
+def open_crawl_state(output_file=OUTPUT_FILE):
+    state = CrawlState()
+    if not state.counts('profile'):
+        # First run with the state store: import what the flat files already record.
+        if os.path.exists(URL_FILE):
+            with open(URL_FILE, 'r', encoding='utf-8') as f:
+                state.add(json.load(f), 'profile', START_URL)
+            state.mark_done_many(listing_page_urls(START_URL), 'listing')
+            print(f"Imported profile URLs from {URL_FILE} into {state.path}.")
+        if os.path.exists(output_file):
+            state.mark_done_many(load_scraped_urls(output_file))
+    print(f"Crawl state: profiles {state.counts('profile')}")
+    return state
+
+
+def mark_saved(state):
+    """JsonlWriter on_flush hook: profiles count as done once their lines are on disk."""
+    return lambda records: state.mark_done_many(record['profile_url'] for record in records)
+
+
+def retry_scheduler(state):
+    """RetryScheduler that records every failure in the crawl state, so an interrupted run picks it up again."""
+    return RetryScheduler(
+        on_retry=lambda url, kind, e: state.mark_failed(url, f"{kind}: {e}"),
+        on_dead=lambda url, kind, e: state.mark_dead(url, f"{kind}: {e}"),
+    )
+
+
+def record_failure(state):
+    """
+    CrawlPipeline on_failure hook. The pipeline does not retry, so failures
+    are classified here: pages that are gone or do not parse are
+    dead-lettered at once, anything else stays failed for the next run.
+    """
+    def failed(url, e):
+        kind = classify(e)
+        METRICS.incr(f'failures_{kind}')
+        if kind in (NOT_FOUND, PARSE_ERROR):
+            state.mark_dead(url, f"{kind}: {e}")
+        else:
+            state.mark_failed(url, f"{kind}: {e}")
+    return failed
+
+
+def pending_profiles(state, profile_urls, output_file=None):
+    """
+    Profiles still to scrape. With a block output file, profiles its index
+    already holds are marked done and dropped too, which covers a crash
+    between a block reaching the file and the crawl state recording it.
+    """
+    pending = set(state.pending('profile'))
+    if output_file and is_block_file(output_file) and os.path.exists(output_file):
+        index = open_index(output_file)
+        saved = [url for url in pending if url in index]
+        index.close()
+        if saved:
+            state.mark_done_many(saved)
+            pending.difference_update(saved)
+            print(f"{len(saved)} pending profiles are already in {output_file}; marked done.")
+    return [url for url in dict.fromkeys(profile_urls) if url in pending]
+
+
+def scrape_all_profiles(fetcher, state, profile_urls, output_file=OUTPUT_FILE):
+    print("\nScraping company profiles...")
+    pending = pending_profiles(state, profile_urls, output_file)
+    print(f"{len(pending)} profiles to scrape.")
 
     new_count = 0
-    for url in profile_urls:
-        if url in scraped_urls:
-            continue
-        data = scrape_company_profile(driver, url)
-        if data:
-            with open(OUTPUT_FILE, 'a', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False)
-                f.write("\n")
-            scraped_urls.add(url)
+    with open_writer(output_file, on_flush=mark_saved(state)) as writer:
+        def scrape(url):
+            nonlocal new_count
+            data = fetch_company_profile(fetcher, url)
+            writer.write(data)
             new_count += 1
             print(f"  --> Saved {data.get('name')}")
-    print(f"Scraping complete. Added {new_count} new profiles.")
 
+        summary = retry_scheduler(state).run(pending, scrape)
+    print(f"Scraping complete. Added {new_count} new profiles "
+          f"({summary['retried']} retries, {summary['dead']} dead-lettered to {DEAD_LETTER_FILE}).")
 
-def main():
-    print("Launching undetected Chrome...")
-    options = uc.ChromeOptions()
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    driver = uc.Chrome(options=options, use_subprocess=True)
-    stealth(driver, languages=["en-US", "en"], vendor="Google Inc.", platform="Win32")
 
-    urls = collect_profile_urls(driver)
-    scrape_all_profiles(driver, urls)
+class HostLimiter:
+    """Caps how many workers may load pages from the same host at once."""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+
+def _profile_worker(worker_id, url_queue, result_queue, limiter, engine, scheduler, cache, state):
+    try:
+        fetcher = create_fetcher(engine, scheduler=scheduler, cache=cache)
+    except Exception as e:
+        print(f"  - Worker {worker_id} could not start its fetcher: {e}")
+        return
+    print(f"  - Worker {worker_id} ready.")
+
+    def drain():
+        while True:
+            try:
+                yield url_queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def attempt(url):
+        with limiter.slot(url):
+            data = fetch_company_profile(fetcher, url)
+        result_queue.put(data)
+
+    try:
+        retry_scheduler(state).run(drain(), attempt)
+    finally:
+        fetcher.close()
+
+
+def _profile_writer(result_queue, state, scraped_urls, counter, output_file=OUTPUT_FILE):
+    # Only this thread checks for duplicates, so the same profile can never be
+    # saved twice; JsonlWriter keeps each record on one complete line.
+    with open_writer(output_file, on_flush=mark_saved(state)) as writer:
+        while True:
+            data = result_queue.get()
+            if data is None:
+                break
+            if data['profile_url'] in scraped_urls:
+                continue
+            writer.write(data)
+            scraped_urls.add(data['profile_url'])
+            counter[0] += 1
+            print(f"  --> Saved {data.get('name')}")
+
 
-    driver.quit()
+def scrape_all_profiles_parallel(state, profile_urls, num_workers=NUM_WORKERS, per_host=PER_HOST_CONCURRENCY,
+                                 engine=FETCH_ENGINE, cache=None, output_file=OUTPUT_FILE):
+    print(f"\nScraping company profiles with {num_workers} {engine} workers (max {per_host} per host)...")
+    pending = pending_profiles(state, profile_urls, output_file)
+    url_queue = queue.Queue()
+    for url in pending:
+        url_queue.put(url)
+    print(f"{len(pending)} profiles queued.")
+
+    result_queue = queue.Queue()
+    counter = [0]
+    writer = threading.Thread(target=_profile_writer, args=(result_queue, state, set(), counter, output_file))
+    writer.start()
+
+    limiter = HostLimiter(per_host)
+    scheduler = PolitenessScheduler()
+    workers = [
+        threading.Thread(target=_profile_worker, args=(i + 1, url_queue, result_queue, limiter, engine, scheduler, cache, state))
+        for i in range(min(num_workers, len(pending)))
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    result_queue.put(None)
+    writer.join()
+    print(f"Scraping complete. Added {counter[0]} new profiles.")
+
+
+def scrape_all_profiles_pipeline(state, profile_urls, fetch_workers=NUM_WORKERS, engine=FETCH_ENGINE, cache=None,
+                                 fields=None, output_file=OUTPUT_FILE):
+    print(f"\nScraping company profiles through the staged pipeline ({fetch_workers} fetchers)...")
+    pending = pending_profiles(state, profile_urls, output_file)
+    print(f"{len(pending)} profiles queued.")
+    parse = partial(parse_company_profile, fields=fields) if fields else parse_company_profile
+    snapshot = run_pipeline(
+        pending, parse, output_file, engine=engine,
+        ready_selector='.profile-header', ready_js='window.chartPie',
+        fetch_workers=fetch_workers, dedup_key='profile_url', cache=cache, on_flush=mark_saved(state),
+        on_failure=record_failure(state),
+    )
+    print(f"Scraping complete. Added {snapshot['written']} new profiles.")
+
+
+def listing_page_number(url):
+    return int(parse_qs(urlparse(url).query).get('page', ['0'])[0])
+
+
+def _reparse_snapshot(job):
+    kind, url, path, fields = job
+    try:
+        html = read_snapshot(path)
+        if kind == 'profile':
+            return [parse_company_profile(html, url, fields)]
+        return parse_listing_page(html, url)
+    except Exception as e:
+        print(f"  - Could not re-parse {url}: {e}")
+        return []
+
+
+def reparse_from_cache(cache, fields=None):
+    """
+    Rebuilds LISTING_OUTPUT_FILE and OUTPUT_FILE from cached snapshots alone,
+    with no network access. Parsing is spread over all cores. `fields`
+    limits profile records to a projection of PROFILE_SCHEMA.
+    """
+    snapshots = cache.snapshots()
+    listing_jobs = sorted(
+        (('listing', url, path, None) for url, path in snapshots if '/profile/' not in url),
+        key=lambda job: listing_page_number(job[1]),
+    )
+    profile_jobs = [('profile', url, path, fields) for url, path in snapshots if '/profile/' in url]
+    print(f"Re-parsing {len(listing_jobs)} listing and {len(profile_jobs)} profile snapshots from {cache.cache_dir}...")
+
+    with ProcessPoolExecutor() as pool:
+        for output_file, jobs in ((LISTING_OUTPUT_FILE, listing_jobs), (OUTPUT_FILE, profile_jobs)):
+            with JsonlWriter(output_file, flush_records=500, truncate=True) as writer:
+                for records in pool.map(_reparse_snapshot, jobs, chunksize=32):
+                    writer.write_many(records)
+            print(f"  - Wrote {writer.written} records to {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape clutch.co company profiles.")
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS,
+                        help="number of parallel browser workers for profile scraping")
+    parser.add_argument('--per-host', type=int, default=PER_HOST_CONCURRENCY,
+                        help="max simultaneous page loads against one host")
+    parser.add_argument('--engine', choices=['selenium', 'selenium-js', 'http', 'http-only'], default=FETCH_ENGINE,
+                        help="page fetch backend; 'selenium-js' extracts inside the browser instead of "
+                             "transferring page_source, 'http' falls back to the browser per URL when needed")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="overlap fetching, parsing (process pool) and writing; --workers sets the fetchers")
+    parser.add_argument('--cache', action='store_true',
+                        help="keep raw HTML snapshots in the page cache and serve fresh ones from it")
+    parser.add_argument('--cache-ttl-days', type=float, default=CACHE_TTL / 86400,
+                        help="serve cached snapshots this long without re-fetching; older ones are revalidated")
+    parser.add_argument('--evict-older-than', type=float, metavar='DAYS',
+                        help="drop cached snapshots fetched more than DAYS ago at startup (by default only "
+                             "the least recently used ones are dropped, once the cache outgrows its size cap)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="re-crawl listings and refresh only changed or stale profiles "
+                             "(the first run records a baseline)")
+    parser.add_argument('--max-age-days', type=float, default=MAX_PROFILE_AGE / 86400,
+                        help="refresh a profile after this many days even if its card is unchanged")
+    parser.add_argument('--seed', action='append',
+                        help=f"directory listing to crawl; repeat for several categories/countries (default {START_URL})")
+    parser.add_argument('--reparse-from-cache', action='store_true',
+                        help="rebuild the listing and profile JSONL files from cached snapshots, offline")
+    parser.add_argument('--fields', type=lambda s: tuple(s.split(',')),
+                        help="comma-separated profile fields to extract with --pipeline or --reparse-from-cache "
+                             f"(default all: {','.join(PROFILE_SCHEMA.fields)}); leaving out the chart fields "
+                             "skips the chartPie parse")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve live Prometheus-style metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-log', help="append per-page JSON timing events to this file")
+    parser.add_argument('--compress', action='store_true',
+                        help=f"write profiles block-compressed to {block_path(OUTPUT_FILE)} with a profile_url "
+                             "index, used for random access, resume and de-duplication")
+    parser.add_argument('--history', action='store_true',
+                        help="record the profile file in the versioned history store after the run")
+    parser.add_argument('--dead-letters', action='store_true',
+                        help="list the URLs that ran out of retries, then exit")
+    parser.add_argument('--requeue-dead', action='store_true',
+                        help="give dead-lettered URLs another try in this run")
+    args = parser.parse_args()
+    METRICS.configure(args.metrics_log, args.metrics_port)
+    if args.dead_letters:
+        state = CrawlState()
+        for url, kind, error in state.dead_letters():
+            print(f"{kind}\t{url}\t{error}")
+        state.close()
+        return
+    if args.fields:
+        try:
+            PROFILE_SCHEMA.check_fields(args.fields)
+        except ValueError as e:
+            parser.error(str(e))
+
+    cache = PageCache(ttl=args.cache_ttl_days * 86400) if args.cache or args.reparse_from_cache else None
+    if args.reparse_from_cache:
+        reparse_from_cache(cache, args.fields)
+        return
+    if cache:
+        # Stale snapshots stay: they are revalidated cheaply and kept for --reparse-from-cache.
+        evicted = cache.evict(max_age=args.evict_older_than * 86400 if args.evict_older_than is not None else None)
+        if evicted:
+            print(f"Evicted {evicted} snapshots from the page cache.")
+
+    if args.engine in ('selenium', 'selenium-js'):
+        print("Launching undetected Chrome...")
+    if args.incremental and cache:
+        # Revalidate every snapshot; unchanged pages come back as cheap 304s.
+        cache.ttl = 0
+    fetcher = create_fetcher(args.engine, scheduler=PolitenessScheduler(), cache=cache)
+
+    if args.incremental:
+        scrape_profiles_incremental(fetcher, args.max_age_days * 86400)
+        fetcher.close()
+        if args.history:
+            record_history(OUTPUT_FILE)
+        return
+
+    output_file = block_path(OUTPUT_FILE) if args.compress else OUTPUT_FILE
+    state = open_crawl_state(output_file)
+    if args.requeue_dead:
+        print(f"Requeued {state.requeue_dead()} dead-lettered URLs.")
+    urls = []
+    for seed in args.seed or [START_URL]:
+        urls.extend(collect_profile_urls(fetcher, state, seed))
+    if args.pipeline:
+        fetcher.close()
+        scrape_all_profiles_pipeline(state, urls, args.workers, args.engine, cache, args.fields, output_file)
+    elif args.workers > 1:
+        fetcher.close()
+        scrape_all_profiles_parallel(state, urls, args.workers, args.per_host, args.engine, cache, output_file)
+    else:
+        scrape_all_profiles(fetcher, state, urls, output_file)
+        fetcher.close()
+    state.close()
+    if args.history:
+        record_history(output_file)
+    print(f"Metrics: {json.dumps(METRICS.snapshot())}")
 
 
 if __name__ == "__main__":
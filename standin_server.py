@@ -0,0 +1,440 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from html import escape
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from benchmark import load_corpus
+
+# --- Configuration ---
+HOST = '127.0.0.1'
+PORT = 8765
+DIRECTORY_PATH = '/it-services/india'   # the listing the scrapers start from (START_URL's path)
+PROFILES = 10000   # synthetic companies
+PER_PAGE = 50   # cards per listing page
+SEED = 1
+HANG_SECONDS = 120   # how long an injected timeout keeps the connection silent
+ATTEMPT_MEMORY = 100000   # recently requested paths whose attempt count is kept for fault draws
+# How synthetic company websites (served under /site/<domain>/) answer
+SITE_OUTCOMES = ((200, 0.75), (301, 0.15), (404, 0.07), (500, 0.03))
+
+# A local stand-in for clutch.co: directory listing pages with working
+# ?page=N pagination and profile pages carrying window.chartPie and JSON-LD,
+# either generated (deterministic, any number of companies, nothing held
+# in memory) or replayed from a captured corpus (benchmark.py --capture).
+# Faults are drawn per (path, attempt), so a run is reproducible and a
+# retried URL can succeed. Point the scrapers at it with
+#   CLUTCH_BASE_URL=http://127.0.0.1:8765 python scraper.py --engine http-only
+# Synthetic companies link (through an r.clutch.co-style redirect with utm
+# parameters) to websites on the stand-in itself, for websites.py verify.
+
+CHALLENGE_PAGE = (
+    "<!DOCTYPE html><html><head><title>Just a moment...</title></head><body>"
+    "<div id=\"challenge\"><script>window._cf_chl_opt={cType:'managed'};</script>"
+    "<div class=\"cf-turnstile\"></div></div></body></html>"
+)
+NOT_FOUND_PAGE = "<!DOCTYPE html><html><head><title>Page not found | Clutch</title></head><body>404</body></html>"
+
+_SYLLABLES = ['ac', 'be', 'co', 'da', 'el', 'fi', 'go', 'hu', 'in', 'jo', 'ka', 'lu', 'mo', 'nex', 'or',
+              'pi', 'qu', 'ra', 'so', 'ta', 'ux', 'vi', 'wo', 'xa', 'ya', 'ze']
+_SUFFIXES = ['Labs', 'Technologies', 'Solutions', 'Digital', 'Systems', 'Infotech', 'Studio', 'Software']
+_CITIES = ['Bengaluru, India', 'Pune, India', 'Hyderabad, India', 'Chennai, India', 'Noida, India',
+           'Mumbai, India', 'Ahmedabad, India', 'Kolkata, India', 'Austin, TX', 'London, United Kingdom']
+_RATES = ['< $25 / hr', '$25 - $49 / hr', '$50 - $99 / hr', '$100 - $149 / hr', 'Undisclosed']
+_PROJECT_SIZES = ['$1,000+', '$5,000+', '$10,000+', '$25,000+', '$50,000+']
+_TEAM_SIZES = ['2 - 9', '10 - 49', '50 - 249', '250 - 999', '1,000 - 9,999', '10,000+']
+_SERVICES = ['Custom Software Development', 'Mobile App Development', 'Web Development', 'IT Managed Services',
+             'AI Development', 'UX/UI Design', 'Cloud Consulting', 'E-Commerce Development']
+_INDUSTRIES = ['Healthcare', 'Financial services', 'Education', 'Retail', 'Information technology', 'Other']
+_CLIENTS = ['Small Business', 'Midmarket', 'Enterprise']
+_LANGUAGES = ['English', 'Hindi', 'Spanish', 'German', 'Tamil']
+
+
+# --- Synthetic companies ---
+
+def _slices(rng, names):
+    chosen = rng.sample(names, rng.randint(1, min(4, len(names))))
+    weights = [rng.randint(1, 10) for _ in chosen]
+    total = sum(weights)
+    return {'slices': [{'name': name, 'percent': round(w / total, 3)} for name, w in zip(chosen, weights)]}
+
+
+def company(i, seed=SEED, base=None):
+    """
+    Company number `i`: the same values on every request and every run with
+    the same seed. With a `base` URL its website is served by the stand-in.
+    """
+    rng = random.Random(seed * 1000003 + i)
+    name = ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+    slug = f"company-{i}"
+    domain = f"{name.lower()}{i}.example"
+    site = f"{base}/site/{domain}/" if base else f"https://{domain}/"
+    return {
+        'slug': slug,
+        'name': f"{name} {rng.choice(_SUFFIXES)}",
+        'tagline': f"{rng.choice(_SERVICES)} for {rng.choice(_INDUSTRIES).lower()}",
+        'description': f"{name} builds software for {rng.randint(5, 500)} clients across {rng.randint(1, 30)} countries.",
+        'location': rng.choice(_CITIES),
+        'locations': rng.sample(_CITIES, rng.randint(1, 3)),
+        'languages': rng.sample(_LANGUAGES, rng.randint(1, 3)),
+        'hourly_rate': rng.choice(_RATES),
+        'min_project_size': rng.choice(_PROJECT_SIZES),
+        'team_size': rng.choice(_TEAM_SIZES),
+        'founded': str(rng.randint(1990, 2024)),
+        'website': f"https://r.clutch.co/redirect?provider_id={i}&u={quote(f'{site}?utm_source=clutch.co&utm_medium=referral', safe='')}",
+        'chart': {
+            'service_provided': _slices(rng, _SERVICES),
+            'industries': _slices(rng, _INDUSTRIES),
+            'clients': _slices(rng, _CLIENTS),
+            'focus': {'charts': {'sd': {'legend_title': 'Software Development', **_slices(rng, _SERVICES[:4])}}},
+        },
+        'common_project_size': f"$10,000 - $49,999 based on {rng.randint(1, 80)} reviews",
+        'feedback': rng.choice(['Clients praise their communication.', 'Delivered on time and on budget.',
+                                'Reviewers note strong technical skills.']),
+    }
+
+
+def company_index(slug):
+    prefix, _, number = slug.partition('-')
+    return int(number) if prefix == 'company' and number.isdigit() else None
+
+
+def render_listing(page, base, profiles=PROFILES, per_page=PER_PAGE, seed=SEED):
+    pages = max(1, -(-profiles // per_page))
+    cards = []
+    for i in range(page * per_page, min(profiles, (page + 1) * per_page)):
+        c = company(i, seed, base)
+        cards.append(
+            f'<li class="provider-list-item"><div class="provider">'
+            f'<h3 class="provider__title"><a href="/profile/{c["slug"]}">{escape(c["name"])}</a></h3>'
+            f'<p class="provider__tagline">{escape(c["tagline"])}</p>'
+            f'<div class="provider__description"><p>{escape(c["description"])}</p></div>'
+            f'<span class="locality">{escape(c["location"])}</span>'
+            f'<div class="hourly-rate">{escape(c["hourly_rate"])}</div>'
+            f'<div class="min-project-size">{escape(c["min_project_size"])}</div>'
+            f'<div class="employees-count">{escape(c["team_size"])}</div>'
+            f'<a class="website-link__item" href="{escape(c["website"])}">Visit Website</a>'
+            f'</div></li>'
+        )
+    links = [f'<a class="page-link" href="?page={n}" data-page="{n}">{n + 1}</a>'
+             for n in sorted({0, max(page - 1, 0), min(page + 1, pages - 1), pages - 1})]
+    return (
+        f'<!DOCTYPE html><html><head><title>Top IT Services Companies - page {page + 1}</title></head><body>'
+        f'<ul class="providers__list">{"".join(cards)}</ul>'
+        f'<nav class="pagination">{"".join(links)}</nav></body></html>'
+    )
+
+
+def render_profile(i, seed=SEED, base=None):
+    c = company(i, seed, base)
+    details = [('Min project size', c['min_project_size']), ('Hourly Rate', c['hourly_rate']),
+               ('Employees', c['team_size']), ('Founded', c['founded'])]
+    json_ld = json.dumps({'@context': 'https://schema.org', '@type': 'Organization', 'name': c['name'],
+                          'description': c['description']})
+    return (
+        f'<!DOCTYPE html><html><head><title>{escape(c["name"])} | Clutch</title>'
+        f'<script type="application/ld+json">{json_ld}</script></head><body>'
+        f'<div class="profile-header"><h1 class="profile-header__title">{escape(c["name"])}</h1>'
+        f'<ul class="profile-short-actions"><li><a title="Visit website" href="{escape(c["website"])}">Visit website</a></li></ul></div>'
+        f'<section id="profile-summary"><div class="profile-summary__text"><p>{escape(c["description"])}</p>'
+        f'<p>{escape(c["tagline"])}.</p></div><ul class="profile-summary__details">'
+        + ''.join(f'<li class="profile-summary__detail"><span class="profile-summary__detail-label">{label}</span>'
+                  f'<span class="profile-summary__detail-title">{escape(value)}</span></li>' for label, value in details)
+        + '</ul></section>'
+        f'<div id="profile-languages-modal"><ul class="profile-modal--list">'
+        + ''.join(f'<li>{escape(language)}</li>' for language in c['languages'])
+        + '</ul></div><div id="profile-locations-modal"><ul class="profile-modal--list">'
+        + ''.join(f'<li>{escape(city)}</li>' for city in c['locations'])
+        + f'</ul></div><script>window.chartPie = {json.dumps(c["chart"])};</script>'
+        f'<div id="pricing-snapshot"><span id="common-project-size-value">{escape(c["common_project_size"])}</span>'
+        f'<p class="pricing-snapshot__clients-feedback-description">{escape(c["feedback"])}</p></div>'
+        '</body></html>'
+    )
+
+
+def write_corpus(corpus_dir, profiles=PROFILES, per_page=PER_PAGE, seed=SEED):
+    """Writes the synthetic directory as a benchmark corpus, named the way benchmark.py --capture names captures."""
+    pages = max(1, -(-profiles // per_page))
+    stem = DIRECTORY_PATH.rsplit('/', 1)[-1]
+    for kind in ('listing', 'profile'):
+        os.makedirs(os.path.join(corpus_dir, kind), exist_ok=True)
+    for page in range(pages):
+        name = f"{stem}_page-{page}" if page else stem
+        with open(os.path.join(corpus_dir, 'listing', name + '.html'), 'w', encoding='utf-8') as f:
+            f.write(render_listing(page, None, profiles, per_page, seed))
+    for i in range(profiles):
+        with open(os.path.join(corpus_dir, 'profile', f"company-{i}.html"), 'w', encoding='utf-8') as f:
+            f.write(render_profile(i, seed))
+    print(f"Wrote {pages} listing and {profiles} profile pages into {corpus_dir}.")
+
+
+# --- Captured pages ---
+
+class Corpus:
+    """
+    Replays a captured corpus (<dir>/listing/*.html, <dir>/profile/*.html).
+    Listing page N is the capture of ?page=N when there is one, else the
+    captures in turn; an uncaptured profile slug gets a capture chosen by
+    its hash, so synthetic-scale crawls work on real markup too. Absolute
+    clutch.co links are rewritten to the stand-in.
+    """
+
+    def __init__(self, corpus_dir):
+        corpus = load_corpus(corpus_dir)
+        if not corpus['listing'] or not corpus['profile']:
+            raise ValueError(f"{corpus_dir} needs listing/*.html and profile/*.html captures")
+        self.listings = [html for _, html in corpus['listing']]
+        self.listing_by_page = {}
+        for name, html in corpus['listing']:
+            page = name[:-len('.html')].rpartition('_page-')[2]
+            self.listing_by_page[int(page) if page.isdigit() else 0] = html
+        self.profiles = {name[:-len('.html')]: html for name, html in corpus['profile']}
+        self._profile_list = list(self.profiles.values())
+
+    def listing(self, page):
+        return self.listing_by_page.get(page) or self.listings[page % len(self.listings)]
+
+    def profile(self, slug):
+        return self.profiles.get(slug) or self._profile_list[zlib.crc32(slug.encode('utf-8')) % len(self._profile_list)]
+
+
+# --- Faults ---
+
+class FaultPlan:
+    """
+    Per-request fault draw. Each rate is a probability; at most one fault
+    applies to a response. Latency (mean `latency_ms`, +-50%) applies to
+    every response. Attempt counts are kept for the last ATTEMPT_MEMORY
+    paths only (LRU), so memory stays flat over a million-profile crawl; a
+    path requested again after falling out starts over at attempt 0.
+    """
+
+    KINDS = ('timeout', 'block', 'malformed', 'truncate')
+
+    def __init__(self, latency_ms=0, timeout_rate=0.0, block_rate=0.0, malformed_rate=0.0, truncate_rate=0.0,
+                 seed=SEED):
+        self.latency_ms = latency_ms
+        self.rates = {'timeout': timeout_rate, 'block': block_rate, 'malformed': malformed_rate,
+                      'truncate': truncate_rate}
+        self.seed = seed
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def draw(self, path):
+        """(latency in seconds, fault kind or None) for this request of `path`."""
+        with self._lock:
+            attempt = self._attempts.pop(path, 0)
+            self._attempts[path] = attempt + 1
+            if len(self._attempts) > ATTEMPT_MEMORY:
+                self._attempts.popitem(last=False)
+        rng = random.Random(f"{self.seed}:{path}:{attempt}")
+        latency = self.latency_ms / 1000 * (0.5 + rng.random())
+        roll = rng.random()
+        for kind in self.KINDS:
+            if roll < self.rates[kind]:
+                return latency, kind
+            roll -= self.rates[kind]
+        return latency, None
+
+
+def malform(html, rng):
+    """Unbalanced markup: closing tags dropped, stray brackets and a cut-out chunk."""
+    html = html.replace('</li>', '', rng.randint(1, 5)).replace('</div>', '<div', rng.randint(1, 3))
+    start = rng.randrange(len(html) // 2, len(html))
+    return html[:start] + '<<p class=">&' + html[start + rng.randint(0, 200):]
+
+
+# --- Server ---
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, like the real site
+    site = None   # set by make_server()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        site = self.site
+        url = urlparse(self.path)
+        if url.path == '/__stats':
+            return self._send(200, json.dumps(site.snapshot()), 'application/json')
+        latency, fault = site.faults.draw(self.path)
+        if latency:
+            time.sleep(latency)
+        if url.path.startswith('/site/'):
+            status, location = site.company_site(url.path)
+            site.count(f"site_{status}")
+            if fault == 'timeout':
+                time.sleep(HANG_SECONDS)
+                self.close_connection = True
+                return
+            if location:
+                self.send_response(status)
+                self.send_header('Location', location)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            return self._send(status, f"<!DOCTYPE html><html><head><title>{status}</title></head><body></body></html>")
+        status, html = site.page(url)
+        site.count(f"status_{status}")
+        if fault is not None and status == 200:
+            site.count(fault)
+            if fault == 'timeout':
+                time.sleep(HANG_SECONDS)
+                self.close_connection = True
+                return
+            if fault == 'block':
+                return self._send(403, CHALLENGE_PAGE)
+            if fault == 'malformed':
+                html = malform(html, random.Random(self.path))
+            if fault == 'truncate':
+                body = html.encode('utf-8')
+                self._send_headers(200, len(body))
+                self.wfile.write(body[:len(body) // 2])
+                self.close_connection = True
+                return
+        self._send(status, html)
+
+    def _send_headers(self, status, length, content_type='text/html; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+    def _send(self, status, text, content_type='text/html; charset=utf-8'):
+        body = text.encode('utf-8')
+        self._send_headers(status, len(body), content_type)
+        self.wfile.write(body)
+
+
+class StandinSite:
+    """What the stand-in serves: synthetic or captured pages, the fault plan and request counters."""
+
+    def __init__(self, base_url, profiles=PROFILES, per_page=PER_PAGE, corpus=None, faults=None, seed=SEED):
+        self.base_url = base_url
+        self.profiles = profiles
+        self.per_page = per_page
+        self.corpus = corpus
+        self.faults = faults or FaultPlan(seed=seed)
+        self.seed = seed
+        self.pages = max(1, -(-profiles // per_page))
+        self.counters = {}
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+        served = sum(v for k, v in counters.items() if k.startswith(('status_', 'site_')))
+        elapsed = time.monotonic() - self.started
+        return {'requests': served, 'requests_per_sec': round(served / elapsed, 1) if elapsed else 0.0,
+                'counters': counters, 'profiles': self.profiles, 'listing_pages': self.pages}
+
+    def page(self, url):
+        """(status, html) for a request path, before faults."""
+        if url.path.rstrip('/') == DIRECTORY_PATH:
+            page = parse_qs(url.query).get('page', ['0'])[0]
+            if not page.isdigit() or int(page) >= self.pages:
+                return 404, NOT_FOUND_PAGE
+            if self.corpus is not None:
+                return 200, self.corpus.listing(int(page)).replace('https://clutch.co/', self.base_url + '/')
+            return 200, render_listing(int(page), self.base_url, self.profiles, self.per_page, self.seed)
+        if url.path.startswith('/profile/'):
+            slug = url.path[len('/profile/'):].strip('/')
+            i = company_index(slug)
+            if self.corpus is not None:
+                return 200, self.corpus.profile(slug).replace('https://clutch.co/', self.base_url + '/')
+            if i is not None and i < self.profiles:
+                return 200, render_profile(i, self.seed, self.base_url)
+        return 404, NOT_FOUND_PAGE
+
+    def company_site(self, path):
+        """(status, redirect location or None) for a synthetic company website under /site/<domain>/."""
+        domain, _, rest = path[len('/site/'):].partition('/')
+        roll = random.Random(f"{self.seed}:{domain}").random()
+        for status, share in SITE_OUTCOMES:
+            if roll < share:
+                break
+            roll -= share
+        if status == 301:
+            return (200, None) if rest == 'home' else (301, f"{self.base_url}/site/{domain}/home")
+        return status, None
+
+
+class StandinHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that give up on a hung or slow response are part of the test, not an error.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(host=HOST, port=PORT, **site_options):
+    """A ThreadingHTTPServer serving a StandinSite; port 0 picks a free one. Call serve_forever() to run it."""
+    server = StandinHTTPServer((host, port), StandinHandler)
+    base_url = f"http://{host}:{server.server_address[1]}"
+    handler = type('Handler', (StandinHandler,), {'site': StandinSite(base_url, **site_options)})
+    server.RequestHandlerClass = handler
+    server.base_url = base_url
+    server.site = handler.site
+    return server
+
+
+def start_server(**options):
+    """Runs a stand-in in a daemon thread; returns the server (stop it with server.shutdown())."""
+    server = make_server(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local clutch.co stand-in for load and regression tests.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--profiles', type=int, default=PROFILES, help="synthetic companies in the directory")
+    parser.add_argument('--per-page', type=int, default=PER_PAGE, help="cards per listing page")
+    parser.add_argument('--corpus', help="replay captured pages from this directory instead of generating them")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--latency-ms', type=float, default=0, help="mean added latency per response")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="share of requests that never answer")
+    parser.add_argument('--block-rate', type=float, default=0.0, help="share answered with a 403 challenge page")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="share served with broken markup")
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help="share cut off halfway through the body")
+    parser.add_argument('--write-corpus', metavar='DIR',
+                        help="write the synthetic pages into DIR as a benchmark corpus instead of serving them")
+    args = parser.parse_args()
+
+    if args.write_corpus:
+        write_corpus(args.write_corpus, args.profiles, args.per_page, args.seed)
+        return
+
+    faults = FaultPlan(args.latency_ms, args.timeout_rate, args.block_rate, args.malformed_rate,
+                       args.truncate_rate, args.seed)
+    server = make_server(args.host, args.port, profiles=args.profiles, per_page=args.per_page,
+                         corpus=Corpus(args.corpus) if args.corpus else None, faults=faults, seed=args.seed)
+    print(f"Serving {server.site.profiles} companies on {server.site.pages} listing pages at "
+          f"{server.base_url}{DIRECTORY_PATH} (stats at {server.base_url}/__stats).")
+    print(f"Point the scrapers at it with CLUTCH_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Stats: {json.dumps(server.site.snapshot())}")
+
+
+if __name__ == '__main__':
+    main()
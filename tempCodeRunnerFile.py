@@ -1,10 +1,8 @@
 import time
 import json
-import re
 import random
 import os
 import undetected_chromedriver as uc
-from bs4 import BeautifulSoup
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -13,6 +11,8 @@ from selenium.common.exceptions import TimeoutException
 
 from selenium_stealth import stealth
 
+from extraction import extract_profile, extract_cards
+
 # --- Configuration ---
 START_URL = "https://clutch.co/it-services/india"
 OUTPUT_FILE = "clutch_full_profiles_final.jsonl"
@@ -43,102 +43,14 @@ def save_json(path, data):
 def scrape_company_profile(driver, profile_url):
     print(f"\n  -> Scraping profile: {profile_url}")
     driver.get(profile_url)
-    company_data = {"profile_url": profile_url}
 
     try:
         time.sleep(SETTLE_WAIT)
 
         wait = WebDriverWait(driver, 20)
         wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".profile-header")))
-        soup = BeautifulSoup(driver.page_source, "lxml")
-
-        # Name
-        name_tag = soup.select_one("h1.profile-header__title")
-        company_data["name"] = name_tag.get_text(strip=True) if name_tag else "N/A"
-
-        # Summary
-        summary_tag = soup.select_one(".profile-summary__text")
-        company_data["summary_description"] = (
-            summary_tag.get_text(separator="\n", strip=True) if summary_tag else "N/A"
-        )
-
-        # Website
-        website_tag = soup.select_one("ul.profile-short-actions a[title='Visit website']")
-        company_data["website"] = (
-            website_tag["href"] if website_tag and website_tag.has_attr("href") else "N/A"
-        )
-
-        # Locations
-        locations = []
-        locations_modal = soup.select_one("#profile-locations-modal")
-        if locations_modal:
-            for loc_item in locations_modal.select(".profile-modal--list li"):
-                locations.append(loc_item.text.strip())
-        company_data["locations"] = locations
-
-        # Languages
-        languages = []
-        language_modal = soup.select_one("#profile-languages-modal")
-        if language_modal:
-            for lang_item in language_modal.select(".profile-modal--list li"):
-                languages.append(lang_item.text.strip())
-        company_data["languages"] = languages
-
-        # Chart Data
-        service_lines, focus_areas, industries, clients = [], [], [], []
-        script_tag = soup.find("script", string=lambda t: t and "window.chartPie" in t)
-        if script_tag:
-            chart_json_match = re.search(r"window\.chartPie\s*=\s*({.*?});", script_tag.string, re.DOTALL)
-            if chart_json_match:
-                try:
-                    chart_data = json.loads(chart_json_match.group(1))
-                    if "service_provided" in chart_data and "slices" in chart_data["service_provided"]:
-                        service_lines = [
-                            f"{s.get('name', '')}: {s.get('percent', 0) * 100:.1f}%"
-                            for s in chart_data["service_provided"]["slices"]
-                        ]
-                    if "industries" in chart_data and "slices" in chart_data["industries"]:
-                        industries = [
-                            f"{s.get('name', '')}: {s.get('percent', 0) * 100:.1f}%"
-                            for s in chart_data["industries"]["slices"]
-                        ]
-                    if "clients" in chart_data and "slices" in chart_data["clients"]:
-                        clients = [
-                            f"{s.get('name', '')}: {s.get('percent', 0) * 100:.1f}%"
-                            for s in chart_data["clients"]["slices"]
-                        ]
-                    if "focus" in chart_data and "charts" in chart_data["focus"]:
-                        for focus_category, focus_data in chart_data["focus"]["charts"].items():
-                            if "slices" in focus_data:
-                                category_name = focus_data.get("legend_title", focus_category)
-                                focus_details = [
-                                    f"{s.get('name', '')}: {s.get('percent', 0) * 100:.1f}%"
-                                    for s in focus_data["slices"]
-                                ]
-                                focus_areas.append({category_name: focus_details})
-                except json.JSONDecodeError:
-                    print("    - Could not parse chart data JSON.")
-
-        company_data["service_lines"] = service_lines
-        company_data["focus_breakdown"] = focus_areas
-        company_data["industries_focus"] = industries
-        company_data["client_focus"] = clients
-
-        # Pricing Snapshot
-        pricing_snapshot = {}
-        pricing_section = soup.select_one("#pricing-snapshot")
-        if pricing_section:
-            common_size_tag = pricing_section.select_one("#common-project-size-value")
-            pricing_snapshot["most_common_project_size"] = (
-                common_size_tag.text.strip() if common_size_tag else "N/A"
-            )
-            feedback_tag = pricing_section.select_one(".pricing-snapshot__clients-feedback-description")
-            pricing_snapshot["client_feedback_summary"] = (
-                feedback_tag.text.strip() if feedback_tag else "N/A"
-            )
-        company_data["pricing_snapshot"] = pricing_snapshot
-
-        return company_data
+        # Same schema (selectors, JSON-LD fallback, website unwrapping) as scraper.py
+        return extract_profile(driver.page_source, profile_url)
 
     except Exception as e:
         print(f"  - Error on profile {profile_url}: {e}")
@@ -161,14 +73,10 @@ def collect_profile_urls(driver, existing_urls):
             WebDriverWait(driver, 20).until(
                 EC.presence_of_all_elements_located((By.CSS_SELECTOR, "li.provider-list-item h3.provider__title a"))
             )
-            soup = BeautifulSoup(driver.page_source, "lxml")
-            links = soup.select("li.provider-list-item h3.provider__title a")
-            for link in links:
-                if link.has_attr("href"):
-                    href = link["href"]
-                    full_url = "https://clutch.co" + href if href.startswith("/") else href
-                    if full_url not in profile_urls:
-                        profile_urls.append(full_url)
+            for card in extract_cards(driver.page_source, ("profile_url",)):
+                full_url = card["profile_url"]
+                if full_url != "N/A" and full_url not in profile_urls:
+                    profile_urls.append(full_url)
 
             # next page
             current_url = driver.current_url
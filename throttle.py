@@ -0,0 +1,134 @@
+import time
+import threading
+from urllib.parse import urlparse
+
+# --- Configuration ---
+START_RATE = 0.25   # requests per second per host when a run starts
+MIN_RATE = 0.05   # never slower than one request every 20s
+MAX_RATE = 2.0   # never faster than two requests per second
+BURST = 2   # tokens a host may save up while idle
+RATE_INCREASE = 0.02   # additive step after each healthy response
+RATE_DECREASE = 0.5   # multiplicative cut after a slow or blocked response
+SLOW_RESPONSE = 10.0   # seconds; anything slower counts as the site pushing back
+# Local stand-ins (standin_server.py) are load-tested, not protected: no pacing
+UNTHROTTLED_HOSTS = ('127.0.0.1', 'localhost')
+UNTHROTTLED_RATE = 1e9
+
+
+class AdaptiveThrottle:
+    """
+    Token bucket whose refill rate follows AIMD: every healthy response adds
+    RATE_INCREASE, every slow or failed response multiplies by RATE_DECREASE.
+    Thread-safe, so one instance can be shared by all workers hitting a host.
+    """
+
+    def __init__(self, rate=START_RATE, burst=BURST, min_rate=MIN_RATE, max_rate=MAX_RATE,
+                 increase=RATE_INCREASE, decrease=RATE_DECREASE, slow_response=SLOW_RESPONSE):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_response = slow_response
+        self.tokens = 1.0
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        """Blocks until a request may be sent; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def record(self, latency, ok=True):
+        with self._lock:
+            if ok and latency < self.slow_response:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            else:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                # Drop any saved-up burst so the slowdown takes effect immediately.
+                self.tokens = min(self.tokens, 0.0)
+
+
+class PolitenessScheduler:
+    """Hands out one AdaptiveThrottle per host."""
+
+    def __init__(self, **throttle_options):
+        self.throttle_options = throttle_options
+        self._lock = threading.Lock()
+        self._throttles = {}
+
+    def for_url(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._throttles:
+                if urlparse(url).hostname in UNTHROTTLED_HOSTS:
+                    wide_open = dict(rate=UNTHROTTLED_RATE, burst=UNTHROTTLED_RATE,
+                                     min_rate=UNTHROTTLED_RATE, max_rate=UNTHROTTLED_RATE)
+                    self._throttles[host] = AdaptiveThrottle(**{**self.throttle_options, **wide_open})
+                else:
+                    self._throttles[host] = AdaptiveThrottle(**self.throttle_options)
+            return self._throttles[host]
+
+    def rates(self):
+        with self._lock:
+            return {host: round(t.rate, 3) for host, t in self._throttles.items()}
+
+
+class ThrottledFetcher:
+    """Wraps any fetcher so every request goes through the politeness scheduler."""
+
+    def __init__(self, fetcher, scheduler=None):
+        self.fetcher = fetcher
+        self.scheduler = scheduler or PolitenessScheduler()
+
+    def fetch(self, url, ready_selector=None, ready_js=None):
+        return self.fetch_if_modified(url, ready_selector, ready_js)
+
+    def fetch_if_modified(self, url, ready_selector=None, ready_js=None, etag=None, last_modified=None):
+        throttle = self.scheduler.for_url(url)
+        throttle.acquire()
+        started = time.monotonic()
+        try:
+            html = self.fetcher.fetch_if_modified(url, ready_selector, ready_js, etag, last_modified)
+        except Exception:
+            throttle.record(time.monotonic() - started, ok=False)
+            raise
+        throttle.record(time.monotonic() - started, ok=True)
+        return html
+
+    def evaluate(self, url, ready_selector, ready_js, script, *args):
+        throttle = self.scheduler.for_url(url)
+        throttle.acquire()
+        started = time.monotonic()
+        try:
+            result = self.fetcher.evaluate(url, ready_selector, ready_js, script, *args)
+        except Exception:
+            throttle.record(time.monotonic() - started, ok=False)
+            raise
+        throttle.record(time.monotonic() - started, ok=True)
+        return result
+
+    @property
+    def extracts_in_browser(self):
+        return getattr(self.fetcher, 'extracts_in_browser', False)
+
+    @property
+    def last_headers(self):
+        return self.fetcher.last_headers
+
+    def close(self):
+        self.fetcher.close()
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import argparse
+
+from fetchers import create_fetcher
+from throttle import PolitenessScheduler
+from page_cache import PageCache
+from jsonl_writer import JsonlWriter, repair_jsonl
+from crawl_state import CrawlState, DONE, DEAD
+from incremental import FingerprintStore, card_fingerprint, MAX_PROFILE_AGE
+from extraction import PROFILE_SCHEMA, unwrap_website
+from metrics import METRICS
+from retry import DEAD_LETTER_FILE
+from browser_extraction import fetch_cards
+from ListingPageScraper import OUTPUT_FILE as LISTING_OUTPUT_FILE
+from scraper import (START_URL, FETCH_ENGINE, listing_page_urls, load_scraped_urls, fetch_company_profile,
+                     mark_saved, retry_scheduler)
+
+# --- Configuration ---
+COMBINED_OUTPUT_FILE = 'clutch_companies_combined.jsonl'
+COMBINED_STATE_DB = 'combined_crawl_state.sqlite3'   # this crawl's progress, kept apart from scraper.py's
+CHECKPOINT_EVERY = 50   # profiles between fingerprint saves
+
+# The card already carries these, so profile pages are not parsed for them.
+CARD_PROVIDED_FIELDS = ('name', 'website')
+PROFILE_FIELDS = tuple(f for f in PROFILE_SCHEMA.fields if f not in CARD_PROVIDED_FIELDS)
+
+# Profile fetch order: never fetched, then changed card, then merely stale.
+NEW, CHANGED, STALE = 0, 1, 2
+
+
+def open_combined_state():
+    """
+    The combined crawl's own CrawlState. A profile done here is one saved to
+    COMBINED_OUTPUT_FILE, which says nothing about scraper.py's output, so
+    the two crawls never skip each other's profiles or listing pages.
+    """
+    state = CrawlState(COMBINED_STATE_DB)
+    if not state.counts('profile') and os.path.exists(COMBINED_OUTPUT_FILE):
+        # First run with a state of its own: import what the combined file already holds.
+        state.mark_done_many(load_scraped_urls(COMBINED_OUTPUT_FILE))
+    print(f"Combined crawl state: profiles {state.counts('profile')}")
+    return state
+
+
+def load_cards(path=LISTING_OUTPUT_FILE):
+    """Cards already saved by an interrupted pass, by profile_url (the first card wins, as in a live pass)."""
+    cards = {}
+    if os.path.exists(path):
+        repair_jsonl(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    card = json.loads(line)
+                except ValueError:
+                    continue
+                cards.setdefault(card.get('profile_url', 'N/A'), card)
+    cards.pop('N/A', None)
+    return cards
+
+
+def crawl_listings(fetcher, state, seeds):
+    """
+    Fetches every pending listing page of every seed once, appends its cards
+    to LISTING_OUTPUT_FILE and registers their profiles as work items.
+    A pass left half done by an interrupted run is resumed; otherwise every
+    listing page is reset and a new pass starts. Returns the cards by
+    profile_url.
+    """
+    pending = done = 0
+    for seed in seeds:
+        state.add(listing_page_urls(seed), 'listing', seed)
+        pending += len(state.pending('listing', seed))
+        done += state.counts('listing', seed).get('done', 0)
+    fresh_pass = not (pending and done)
+    if fresh_pass:
+        for seed in seeds:
+            state.reset('listing', seed)
+    cards = {} if fresh_pass else load_cards()
+
+    with JsonlWriter(LISTING_OUTPUT_FILE, truncate=fresh_pass) as writer:
+        for seed in seeds:
+            pending_pages = state.pending('listing', seed)
+            print(f"Crawling {len(pending_pages)} listing pages of {seed}...")
+
+            def visit(url):
+                page_cards = [card for card in fetch_cards(fetcher, url) if card['profile_url'] != 'N/A']
+                # Cards reach the file before the page counts as done, so a resume can reload them.
+                writer.write_many(page_cards)
+                writer.flush()
+                state.add((card['profile_url'] for card in page_cards), 'profile', seed)
+                state.mark_done(url, 'listing')
+                for card in page_cards:
+                    cards.setdefault(card['profile_url'], card)
+                print(f"  - {url}: {len(page_cards)} cards, {len(cards)} companies so far")
+
+            retry_scheduler(state).run(pending_pages, visit)
+    return cards
+
+
+def plan_profiles(cards, state, store, max_age=MAX_PROFILE_AGE, card_filter=None):
+    """
+    Profile URLs worth fetching, most valuable first: profiles never fetched,
+    then those whose card changed (or was never fingerprinted), then those
+    older than `max_age`. Profiles whose card is unchanged and recent
+    enough, that `card_filter(card)` rejects, or that were dead-lettered
+    (as in CrawlState.pending; see --requeue-dead) are skipped.
+    """
+    now = time.time()
+    tiers = {NEW: [], CHANGED: [], STALE: []}
+    dead = 0
+    for url, card in cards.items():
+        if card_filter is not None and not card_filter(card):
+            continue
+        status = state.status(url)
+        if status == DEAD:
+            dead += 1
+        elif status != DONE:
+            tiers[NEW].append(url)
+        elif store.needs_refresh(card, max_age, now):
+            entry = store.entries.get(url, {})
+            tiers[CHANGED if entry.get('card_fp') != card_fingerprint(card) else STALE].append(url)
+    print(f"Profiles to fetch: {len(tiers[NEW])} new, {len(tiers[CHANGED])} with changed cards, "
+          f"{len(tiers[STALE])} stale; {len(cards) - sum(map(len, tiers.values()))} skipped "
+          f"({dead} dead-lettered).")
+    return tiers[NEW] + tiers[CHANGED] + tiers[STALE]
+
+
+def join_record(card, profile):
+    """One combined record: card fields first (website unwrapped), then the profile's own fields."""
+    record = {'profile_url': card['profile_url']}
+    record.update((k, v) for k, v in card.items() if k != 'profile_url')
+    if record.get('website', 'N/A') != 'N/A':
+        record['website'] = unwrap_website(record['website'])
+    record.update((k, v) for k, v in profile.items() if k != 'profile_url')
+    return record
+
+
+def crawl_unified(fetcher, seeds=(START_URL,), max_age=MAX_PROFILE_AGE, card_filter=None, fields=PROFILE_FIELDS,
+                  requeue_dead=False):
+    """
+    Single pass over the directory: each listing page is fetched once, its
+    cards saved and joined with the profiles fetched afterwards into
+    COMBINED_OUTPUT_FILE, keyed by profile_url.
+    """
+    state = open_combined_state()
+    if requeue_dead:
+        print(f"Requeued {state.requeue_dead('profile')} dead-lettered profiles.")
+    store = FingerprintStore()
+    cards = crawl_listings(fetcher, state, seeds)
+    planned = plan_profiles(cards, state, store, max_age, card_filter)
+
+    saved = 0
+    with JsonlWriter(COMBINED_OUTPUT_FILE, on_flush=mark_saved(state)) as writer:
+        def crawl_profile(url):
+            nonlocal saved
+            profile = fetch_company_profile(fetcher, url, fields)
+            store.record_profile(profile, cards[url])
+            writer.write(join_record(cards[url], profile))
+            saved += 1
+            print(f"  --> Saved {cards[url].get('name')} ({saved}/{len(planned)})")
+            if saved % CHECKPOINT_EVERY == 0:
+                # Fingerprints must never get ahead of the records on disk.
+                writer.checkpoint()
+                store.save()
+
+        summary = retry_scheduler(state).run(planned, crawl_profile)
+    store.save()
+    state.close()
+    print(f"Unified crawl complete. Saved {saved} of {len(planned)} planned profiles to {COMBINED_OUTPUT_FILE} "
+          f"({summary['retried']} retries, {summary['dead']} dead-lettered to {DEAD_LETTER_FILE}).")
+    print(f"Metrics: {json.dumps(METRICS.snapshot())}")
+
+
+def parse_card_filter(specs):
+    """`field=text` terms (case-insensitive substring, all must match) -> card predicate."""
+    terms = []
+    for spec in specs:
+        field, sep, text = spec.partition('=')
+        if not sep:
+            raise ValueError(f"expected field=text, got {spec!r}")
+        terms.append((field, text.lower()))
+    return lambda card: all(text in str(card.get(field, '')).lower() for field, text in terms)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl clutch.co listings and profiles in one pass into one combined JSONL.")
+    parser.add_argument('--engine', choices=['selenium', 'selenium-js', 'http', 'http-only'], default=FETCH_ENGINE,
+                        help="page fetch backend; 'selenium-js' extracts inside the browser instead of "
+                             "transferring page_source, 'http' falls back to the browser per URL when needed")
+    parser.add_argument('--cache', action='store_true',
+                        help="keep raw HTML snapshots in the page cache and serve fresh ones from it")
+    parser.add_argument('--seed', action='append',
+                        help=f"directory listing to crawl; repeat for several categories/countries (default {START_URL})")
+    parser.add_argument('--max-age-days', type=float, default=MAX_PROFILE_AGE / 86400,
+                        help="refetch a profile after this many days even if its card is unchanged")
+    parser.add_argument('--card-filter', action='append', default=[], metavar='FIELD=TEXT',
+                        help="only fetch profiles whose card field contains TEXT, e.g. location=Bengaluru; repeatable")
+    parser.add_argument('--fields', type=lambda s: tuple(s.split(',')), default=PROFILE_FIELDS,
+                        help=f"profile fields to extract (default {','.join(PROFILE_FIELDS)})")
+    parser.add_argument('--requeue-dead', '--retry-dead', action='store_true',
+                        help="give dead-lettered profiles another try in this run")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve live Prometheus-style metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-log', help="append per-page JSON timing events to this file")
+    args = parser.parse_args()
+    METRICS.configure(args.metrics_log, args.metrics_port)
+    try:
+        PROFILE_SCHEMA.check_fields(args.fields)
+        card_filter = parse_card_filter(args.card_filter) if args.card_filter else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    cache = PageCache() if args.cache else None
+    fetcher = create_fetcher(args.engine, scheduler=PolitenessScheduler(), cache=cache)
+    try:
+        crawl_unified(fetcher, args.seed or [START_URL], args.max_age_days * 86400, card_filter, args.fields,
+                      args.requeue_dead)
+    finally:
+        fetcher.close()
+
+
+if __name__ == '__main__':
+    main()
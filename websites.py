@@ -0,0 +1,309 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import argparse
+import threading
+from urllib.parse import urlparse, urlunparse, unquote_plus
+
+try:
+    import aiohttp
+except ImportError:   # only the verifier needs it
+    aiohttp = None
+
+from extraction import unwrap_website, NA
+from block_jsonl import iter_lines, open_lines_output
+from ListingPageScraper import OUTPUT_FILE as LISTING_FILE
+from scraper import OUTPUT_FILE as PROFILE_FILE
+
+# --- Configuration ---
+RESOLVED_SUFFIX = '_resolved'   # clutch_listings_data_raw.jsonl -> clutch_listings_data_raw_resolved.jsonl
+TRACKING_PREFIXES = ('utm_',)   # query parameters dropped from company websites
+TRACKING_PARAMS = ('gclid', 'fbclid', 'msclkid')
+MAX_UNWRAP = 3   # nested redirect wrappers followed before giving up
+
+CHECKS_DB = 'website_checks.sqlite3'
+CONCURRENCY = 200   # requests in flight across all domains (the connection pool size)
+PER_DOMAIN = 4   # requests in flight per company domain
+VERIFY_TIMEOUT = 15.0   # seconds per check, redirects included
+DNS_TTL = 600   # seconds a resolved hostname is reused
+MAX_AGE = 30   # days a cached check is trusted before the site is checked again
+ERROR_MAX_AGE = 1   # days for a check that got no response (DNS failure, timeout, refused)
+COMMIT_EVERY = 500   # results per transaction
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+
+# --- Offline resolution ---
+
+def canonical_website(url):
+    """
+    A company website as it should be stored: r.clutch.co redirect wrappers
+    unwrapped (nested ones too), scheme and host lower-cased, default port,
+    fragment and tracking parameters (utm_*, click ids) dropped, and an empty
+    path written as '/'. Anything that is not an http(s) URL is returned as is.
+    """
+    if not isinstance(url, str):
+        return url
+    url = url.strip()
+    for _ in range(MAX_UNWRAP):
+        target = unwrap_website(url).strip()
+        if target == url:
+            break
+        url = target
+    parsed = urlparse(url)
+    if parsed.scheme.lower() not in ('http', 'https') or not parsed.netloc:
+        return url
+    scheme = parsed.scheme.lower()
+    host = parsed.netloc.lower()
+    if (scheme, host.rpartition(':')[2]) in (('http', '80'), ('https', '443')):
+        host = host.rpartition(':')[0]
+    # Parameters are dropped from the raw query string rather than re-encoded, which would turn
+    # "?q" into "?q=" and "%20" into "+": whatever is kept stays byte for byte.
+    kept = [param for param in parsed.query.split('&') if not _is_tracking(param)]
+    return urlunparse((scheme, host, parsed.path or '/', parsed.params, '&'.join(kept), ''))
+
+
+def _is_tracking(param):
+    key = unquote_plus(param.partition('=')[0]).lower()
+    return key.startswith(TRACKING_PREFIXES) or key in TRACKING_PARAMS
+
+
+def resolved_path(path):
+    """Where resolve_file writes by default: the input name with RESOLVED_SUFFIX before its extensions."""
+    directory, name = os.path.split(path)
+    stem, dot, extensions = name.partition('.')
+    return os.path.join(directory, stem + RESOLVED_SUFFIX + dot + extensions)
+
+
+def resolve_file(input_path, output_path=None):
+    """
+    Streams a listing or profile JSONL file (plain or block-compressed) and
+    writes it with every `website` canonicalised. Lines that are not JSON
+    are copied unchanged. Returns (records, websites rewritten).
+    """
+    output_path = output_path or resolved_path(input_path)
+    records = rewritten = 0
+    with open_lines_output(output_path) as outfile:
+        for line in iter_lines(input_path):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                outfile.write(line)
+                continue
+            records += 1
+            website = canonical_website(record.get('website'))
+            if website != record.get('website'):
+                record['website'] = website
+                rewritten += 1
+                line = json.dumps(record, ensure_ascii=False) + '\n'
+            outfile.write(line)
+    print(f"Resolved '{input_path}' -> '{output_path}': {rewritten} of {records} websites rewritten.")
+    return records, rewritten
+
+
+def websites_in(paths):
+    """The distinct canonical http(s) websites of the given JSONL files, in first-seen order."""
+    seen = {}
+    for path in paths:
+        for line in iter_lines(path):
+            try:
+                website = canonical_website(json.loads(line).get('website'))
+            except ValueError:
+                continue
+            if isinstance(website, str) and website.startswith(('http://', 'https://')):
+                seen.setdefault(website, None)
+    return list(seen)
+
+
+# --- Verification cache ---
+
+class WebsiteChecks:
+    """
+    SQLite cache of website checks: one row per canonical URL with the URL
+    it finally landed on after redirects, the HTTP status (NULL when no
+    response came back), the latency to the response headers and the error.
+    """
+
+    def __init__(self, path=CHECKS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS checks (
+                url TEXT PRIMARY KEY,
+                final_url TEXT,
+                status INTEGER,
+                latency_ms REAL,
+                error TEXT,
+                checked_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+        self._pending = 0
+
+    def fresh(self, max_age=MAX_AGE, error_max_age=ERROR_MAX_AGE):
+        """
+        URLs checked within the last `max_age` days; a check that got no
+        response is only trusted for `error_max_age` days, so a transient
+        outage does not mark a site dead for a month.
+        """
+        now = time.time()
+        with self._lock:
+            return {url for (url,) in self._db.execute(
+                "SELECT url FROM checks WHERE checked_at >= ? AND (error IS NULL OR checked_at >= ?)",
+                (now - max_age * 86400, now - min(error_max_age, max_age) * 86400),
+            )}
+
+    def record(self, url, final_url, status, latency_ms, error=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO checks (url, final_url, status, latency_ms, error, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, final_url, status, latency_ms, error, time.time()),
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._db.commit()
+                self._pending = 0
+
+    def get(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT final_url, status, latency_ms, error, checked_at FROM checks WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('final_url', 'status', 'latency_ms', 'error', 'checked_at'), row), url=url)
+
+    def summary(self):
+        """Check counts by outcome: the status class ('2xx', '4xx', ...) or the error name."""
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT COALESCE(error, (status / 100) || 'xx'), COUNT(*) FROM checks GROUP BY 1 ORDER BY 2 DESC
+            """).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+# --- Async verifier ---
+
+def _domain(url):
+    host = urlparse(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+async def _check(session, url, domain_slots, checks):
+    async with domain_slots[_domain(url)]:
+        started = time.monotonic()
+        try:
+            async with session.get(url, allow_redirects=True) as response:
+                latency_ms = (time.monotonic() - started) * 1000
+                checks.record(url, str(response.url), response.status, round(latency_ms, 1))
+        except asyncio.TimeoutError:
+            checks.record(url, None, None, round((time.monotonic() - started) * 1000, 1), 'timeout')
+        except (aiohttp.ClientError, ValueError) as e:
+            checks.record(url, None, None, round((time.monotonic() - started) * 1000, 1), type(e).__name__)
+
+
+async def _verify(urls, checks, concurrency, per_domain, timeout):
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_domain,
+                                     use_dns_cache=True, ttl_dns_cache=DNS_TTL)
+    domain_slots = {}
+    queue = asyncio.Queue()
+    for url in urls:
+        domain_slots.setdefault(_domain(url), asyncio.Semaphore(per_domain))
+        queue.put_nowait(url)
+
+    async def worker(session):
+        while not queue.empty():
+            await _check(session, queue.get_nowait(), domain_slots, checks)
+
+    async with aiohttp.ClientSession(connector=connector, headers={'User-Agent': USER_AGENT},
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        await asyncio.gather(*(worker(session) for _ in range(min(concurrency, len(urls)))))
+
+
+def verify_websites(urls, checks, concurrency=CONCURRENCY, per_domain=PER_DOMAIN, timeout=VERIFY_TIMEOUT,
+                    max_age=MAX_AGE, error_max_age=ERROR_MAX_AGE):
+    """
+    Checks every URL not verified within `max_age` days (`error_max_age`
+    for checks that got no response) with GET requests
+    that follow redirects, and records the outcome in `checks`. At most
+    `concurrency` requests are in flight over one shared connection pool,
+    at most `per_domain` per company domain, and hostnames are resolved
+    once per DNS_TTL. Returns how many URLs were checked.
+    """
+    if aiohttp is None:
+        raise RuntimeError("Website verification needs aiohttp (pip install aiohttp).")
+    fresh = checks.fresh(max_age, error_max_age)
+    todo = [url for url in dict.fromkeys(urls) if url not in fresh]
+    print(f"Verifying {len(todo)} websites ({len(fresh)} cached, {concurrency} connections, {per_domain} per domain)...")
+    started = time.monotonic()
+    if todo:
+        asyncio.run(_verify(todo, checks, concurrency, per_domain, timeout))
+    elapsed = time.monotonic() - started
+    print(f"Checked {len(todo)} websites in {elapsed:.1f}s ({len(todo) / elapsed if elapsed else 0:.1f}/s).")
+    return len(todo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve and verify the company websites in the scraped JSONL files.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    resolve = sub.add_parser('resolve', help="unwrap redirect links and strip tracking parameters, offline")
+    resolve.add_argument('inputs', nargs='*', default=[LISTING_FILE, PROFILE_FILE],
+                         help=f"JSONL or block files (default: {LISTING_FILE} {PROFILE_FILE})")
+    resolve.add_argument('--output', help=f"output file for a single input (default: <input>{RESOLVED_SUFFIX}.jsonl)")
+
+    verify = sub.add_parser('verify', help="check that the websites answer, and where they land")
+    verify.add_argument('inputs', nargs='*', default=[LISTING_FILE, PROFILE_FILE])
+    verify.add_argument('--cache', default=CHECKS_DB, help="SQLite file the results are kept in")
+    verify.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    verify.add_argument('--per-domain', type=int, default=PER_DOMAIN)
+    verify.add_argument('--timeout', type=float, default=VERIFY_TIMEOUT)
+    verify.add_argument('--max-age', type=float, default=MAX_AGE, help="days before a cached result is re-checked")
+    verify.add_argument('--error-max-age', type=float, default=ERROR_MAX_AGE,
+                        help="days before a cached DNS failure, timeout or connection error is re-checked")
+
+    show = sub.add_parser('show', help="print the cached check of websites (canonicalised first)")
+    show.add_argument('urls', nargs='+')
+    show.add_argument('--cache', default=CHECKS_DB)
+    args = parser.parse_args()
+
+    if args.command == 'resolve':
+        if args.output and len(args.inputs) != 1:
+            parser.error("--output needs exactly one input")
+        for path in args.inputs:
+            if not os.path.exists(path):
+                print(f"Skipping '{path}': not found.")
+                continue
+            resolve_file(path, args.output)
+    elif args.command == 'verify':
+        if aiohttp is None:
+            parser.error("website verification needs aiohttp: pip install aiohttp")
+        urls = websites_in([path for path in args.inputs if os.path.exists(path)])
+        checks = WebsiteChecks(args.cache)
+        try:
+            verify_websites(urls, checks, args.concurrency, args.per_domain, args.timeout, args.max_age,
+                            args.error_max_age)
+            print(f"Results: {json.dumps(checks.summary())}")
+        finally:
+            checks.close()
+    else:
+        checks = WebsiteChecks(args.cache)
+        try:
+            for url in args.urls:
+                print(json.dumps(checks.get(canonical_website(url)) or {'url': canonical_website(url), 'status': NA}))
+        finally:
+            checks.close()
+
+
+if __name__ == '__main__':
+    main()